@@ -1,17 +1,26 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 import csv
-import copy
+import time
+import queue
 import argparse
-import itertools
-from collections import Counter
-from collections import deque
+from collections import namedtuple
 
 import cv2 as cv
 import numpy as np
-import mediapipe as mp
 
-from utils import CvFpsCalc
+from utils import StageProfiler
+from utils import FramePipeline
+from utils.landmark import landmarks_to_array
+from utils.landmark import calc_landmark_points
+from utils.landmark import calc_bounding_rect_points
+from utils.landmark import pre_process_landmark_points
+from utils.hand_tracker import HandTracker
+from utils.gesture_rules import GestureRule
+from utils.gesture_rules import GestureRuleEngine
+from utils.landmark_renderer import LandmarkRenderer
+from utils.landmark_renderer import draw_hand_landmarks
+from utils.point_history import pre_process_point_history_points
 from model import KeyPointClassifier
 from model import PointHistoryClassifier
 
@@ -26,16 +35,147 @@ GESTURE_ID_ROCK = 5
 GESTURE_ID_SCISSORS = 6
 GESTURE_ID_NONE = -1 # 未识别/无特殊手势
 
+# 手勢ID对应的标签文本
+GESTURE_LABELS = {
+    GESTURE_ID_OPEN: "Open",
+    GESTURE_ID_CLOSE: "Close",
+    GESTURE_ID_POINTER: "Pointer",
+    GESTURE_ID_OK: "OK",
+    GESTURE_ID_PAPER: "Paper",
+    GESTURE_ID_ROCK: "Rock",
+    GESTURE_ID_SCISSORS: "Scissors",
+    GESTURE_ID_NONE: ""
+}
+
+# ルールで判定する手勢 (上から順に判定し、最初に一致したものを採用)
+# 指: 親指・人差指・中指・薬指・小指 (True: 伸びている, False: 曲がっている, None: 不問)
+# 距離はピクセル単位 (従来の calc_rps と同じ判定)
+RPS_RULES = (
+    # OKサイン (親指と人差指がくっついている & 他の指が開いている)
+    # 閾値は調整が必要かもしれません
+    GestureRule(GESTURE_ID_OK, (None, None, True, True, True),
+                (((4, 8), 40), )),
+    GestureRule(GESTURE_ID_PAPER, (None, True, True, True, True), ()),
+    GestureRule(GESTURE_ID_SCISSORS, (None, True, True, False, False), ()),
+    GestureRule(GESTURE_ID_ROCK, (None, False, False, False, False), ()),
+)
+RPS_RULE_ENGINE = GestureRuleEngine(RPS_RULES,
+                                    default_id=GESTURE_ID_NONE,
+                                    scale_distances=False)
+
+# 解像度に依存しない版: 距離は手のサイズ (手首〜中指付け根) 単位
+# 0.3 は keypoint.csv で中指・薬指・小指が伸びた (OKサインでない) 手の
+# 約1%だけが下回る値 (40px は 960x540 の標準的な手で約0.7に相当し誤検出が多い)
+RPS_RULES_SCALED = (
+    GestureRule(GESTURE_ID_OK, (None, None, True, True, True),
+                (((4, 8), 0.3), )),
+) + RPS_RULES[1:]
+RPS_RULE_ENGINE_SCALED = GestureRuleEngine(RPS_RULES_SCALED,
+                                           default_id=GESTURE_ID_NONE)
+
+# --rps_rules で選択するルール
+RPS_RULE_ENGINES = {
+    'pixel': RPS_RULE_ENGINE,
+    'scaled': RPS_RULE_ENGINE_SCALED,
+}
+
+# 1手分の認識結果 (フレーム毎に dict を作らないよう namedtuple にする)
+HandResult = namedtuple('HandResult', [
+    'hand_id',
+    'handedness',
+    'brect',
+    'hand_sign_id',
+    'confidence',  # ハンドサインの確率
+    'hand_sign_probs',
+    'rps_id',
+    'finger_gesture_id',
+    'finger_gesture_probs',  # 履歴が揃うまでは None
+    'gesture_id',
+])
+
+
+def load_hands_solution():
+    """
+    Import MediaPipe on first use: it takes seconds (and pulls in
+    TensorFlow when installed), so modules that only import app for
+    its helpers or constants should not pay for it.
+    :return: mediapipe.solutions.hands
+    """
+    import mediapipe as mp
+
+    return mp.solutions.hands
+
 class GestureRecognizer:
     def __init__(self, static_image_mode=False, max_num_hands=1, 
-                 min_detection_confidence=0.7, min_tracking_confidence=0.5):
-        self.hands = mp.solutions.hands.Hands(
+                 min_detection_confidence=0.7, min_tracking_confidence=0.5,
+                 scheduler=None, inference_width=None, inference_height=None,
+                 history_length=16, classifier_backend='tflite',
+                 smoothing_alpha=1.0, min_dwell=1, rps_rules='pixel'):
+        """
+        :param scheduler: Optional AdaptiveScheduler; when given, MediaPipe
+            only runs on frames it selects and the last result is reused
+            for the others
+        :param inference_width: Width of the downscaled copy MediaPipe sees
+            (None: full resolution, or derived from inference_height)
+        :param inference_height: Height of the downscaled copy
+        :param history_length: Length of the per-hand fingertip history
+            used for finger gesture classification
+        :param classifier_backend: 'tflite', 'numpy' or 'onnx'
+        :param smoothing_alpha: EMA weight of the newest hand sign
+            probabilities (default 1.0: no smoothing, per-frame results)
+        :param min_dwell: Frames a new gesture_id must persist before it
+            is reported (default 1: report every change immediately)
+        :param rps_rules: 'pixel' (RPS_RULES, 40px OK threshold) or
+            'scaled' (RPS_RULES_SCALED, independent of resolution)
+        """
+        self.scheduler = scheduler
+        self.inference_width = inference_width
+        self.inference_height = inference_height
+        self.history_length = history_length
+        self.rps_rule_engine = RPS_RULE_ENGINES[rps_rules]
+        self._hands_options = dict(
             static_image_mode=static_image_mode,
             max_num_hands=max_num_hands,
             min_detection_confidence=min_detection_confidence,
             min_tracking_confidence=min_tracking_confidence,
         )
-        self.keypoint_classifier = KeyPointClassifier()
+        self.hands = load_hands_solution().Hands(**self._hands_options)
+        self.keypoint_classifier = KeyPointClassifier(
+            backend=classifier_backend)
+        self.point_history_classifier = PointHistoryClassifier(
+            backend=classifier_backend)
+
+        # 手ごとに座標履歴・ジェスチャー履歴を持つ
+        self.hand_tracker = HandTracker(history_length=history_length,
+                                        smoothing_alpha=smoothing_alpha,
+                                        min_dwell=min_dwell)
+        self._last_hands = []
+
+    def reset(self, tracking=True):
+        """
+        Forget histories, e.g. before a new video file.
+        :param tracking: Also restart MediaPipe so no hand is tracked over
+            from the previous frames
+        """
+        if tracking:
+            self.hands.close()
+            self.hands = load_hands_solution().Hands(**self._hands_options)
+        self.hand_tracker.reset()
+        self._last_hands = []
+        if self.scheduler is not None:
+            self.scheduler.reset()
+
+    def warm_up(self, width=640, height=480):
+        """
+        Run one blank frame through the whole pipeline so MediaPipe's graph
+        and the classifiers are initialized before the first real frame.
+        """
+        self._recognize(np.zeros((height, width, 3), dtype=np.uint8), False)
+        self.keypoint_classifier.classify_batch(
+            np.zeros((1, 42), dtype=np.float32))
+        self.point_history_classifier.classify_batch(
+            np.zeros((1, self.history_length * 2), dtype=np.float32))
+        self.hand_tracker.reset()
 
     def get_gesture(self, image, flip=True):
         """
@@ -44,33 +184,146 @@ class GestureRecognizer:
         :param flip: Whether to flip the image horizontally (mirror mode)
         :return: Gesture ID
         """
+        hands = self.recognize(image, flip=flip)
+        if len(hands) > 0:
+            return hands[0].gesture_id
+        return GESTURE_ID_NONE
+
+    def recognize(self, image, flip=True):
+        """
+        Recognize hand sign, RPS rule and finger gesture of every hand.
+        :param image: OpenCV BGR image
+        :param flip: Whether to flip the image horizontally (mirror mode)
+        :return: List with one HandResult per detected hand. Hand sign
+            probabilities are smoothed over time per hand, the finger
+            gesture is the majority over the history and gesture_id only
+            changes after min_dwell consistent frames.
+        """
+        # 静止している間は前回の結果を再利用する
+        if self.scheduler is not None:
+            if not self.scheduler.should_detect(image):
+                return self._last_hands
+            start_time = time.perf_counter()
+            self._last_hands = self._recognize(image, flip)
+            self.scheduler.record(time.perf_counter() - start_time)
+            return self._last_hands
+
+        return self._recognize(image, flip)
+
+    def _recognize(self, image, flip):
+        image_width, image_height = image.shape[1], image.shape[0]
+
+        # 縮小してから反転・色変換する (ランドマークは正規化座標なので
+        # 元の解像度の座標系にそのまま戻せる)
+        inference_image = resize_for_inference(image, self.inference_width,
+                                                self.inference_height)
         if flip:
-            image = cv.flip(image, 1)
+            inference_image = cv.flip(inference_image, 1)
         
         # 検出実施
-        image_rgb = cv.cvtColor(image, cv.COLOR_BGR2RGB)
+        image_rgb = cv.cvtColor(inference_image, cv.COLOR_BGR2RGB)
         image_rgb.flags.writeable = False
         results = self.hands.process(image_rgb)
-        
-        if results.multi_hand_landmarks is not None:
-            for hand_landmarks in results.multi_hand_landmarks:
-                # ランドマークの計算
-                landmark_list = calc_landmark_list(image, hand_landmarks)
-
-                # 相対座標・正規化座標への変換
-                pre_processed_landmark_list = pre_process_landmark(landmark_list)
-
-                # ハンドサイン分類
-                hand_sign_id = self.keypoint_classifier(pre_processed_landmark_list)
-                
-                # RPS分類
-                rps_result = calc_rps(landmark_list)
 
-                # 优先显示规则识别的特殊手势(OK/RPS)，如果没有则显示模型识别的基础手势
-                current_gesture_id = rps_result if rps_result != GESTURE_ID_NONE else hand_sign_id
-                return current_gesture_id
-                
-        return GESTURE_ID_NONE
+        if results.multi_hand_landmarks is None:
+            self.hand_tracker.update([], [], image_width, image_height)
+            return []
+
+        # ランドマークの計算
+        landmark_points = calc_landmark_points(
+            np.stack([
+                landmarks_to_array(hand_landmarks)
+                for hand_landmarks in results.multi_hand_landmarks
+            ]), image_width, image_height)
+        brects = calc_bounding_rect_points(landmark_points).tolist()
+
+        # 相対座標・正規化座標への変換
+        pre_processed_landmarks = pre_process_landmark_points(landmark_points)
+
+        # ハンドサイン分類
+        _, hand_sign_probs = self.keypoint_classifier.classify_batch(
+            pre_processed_landmarks)
+
+        # 手の対応付け (フレーム間で同じ手に同じIDを振る)
+        handedness_labels = [
+            handedness.classification[0].label
+            for handedness in results.multi_handedness
+        ]
+        tracks = self.hand_tracker.update(handedness_labels, brects,
+                                          image_width, image_height)
+
+        # RPS分類 (全ての手をまとめて)
+        rps_results = self.rps_rule_engine.classify(landmark_points).tolist()
+
+        hands = []
+        for (landmark_list, brect, hand_sign_prob, rps_result,
+             handedness_label, track) in zip(landmark_points.tolist(), brects,
+                                             hand_sign_probs, rps_results,
+                                             handedness_labels, tracks):
+            # ハンドサインは確率の指数移動平均で判定する
+            smoothed_probs = track.hand_sign_filter.update(hand_sign_prob)
+            hand_sign_id = int(np.argmax(smoothed_probs))
+            confidence = float(smoothed_probs[hand_sign_id])
+
+            pre_processed_point_history = track.point_history.pre_process(
+                image_width, image_height)
+            if hand_sign_id == GESTURE_ID_POINTER:  # 指差しサイン
+                track.point_history.append(landmark_list[8])  # 人差指座標
+            else:
+                track.point_history.append([0, 0])
+
+            # フィンガージェスチャー分類
+            finger_gesture_id = 0
+            finger_gesture_probs = None
+            if len(pre_processed_point_history) == (self.history_length * 2):
+                finger_gesture = self.point_history_classifier(
+                    pre_processed_point_history, return_probs=True)
+                finger_gesture_id = int(finger_gesture.index)
+                finger_gesture_probs = finger_gesture.probs
+            # 直近検出の中で最多のフィンガージェスチャー
+            finger_gesture_vote = track.finger_gesture_vote.update(
+                finger_gesture_id)
+
+            # 优先显示规则识别的特殊手势(OK/RPS)，如果没有则显示模型识别的基础手势
+            if rps_result != GESTURE_ID_NONE:
+                current_gesture_id = track.gesture_filter.update(rps_result)
+            else:
+                current_gesture_id = track.gesture_filter.update(
+                    hand_sign_id, confidence)
+
+            hands.append(
+                HandResult(
+                    hand_id=track.hand_id,
+                    handedness=handedness_label,
+                    brect=brect,
+                    hand_sign_id=hand_sign_id,
+                    confidence=confidence,
+                    hand_sign_probs=smoothed_probs.copy(),
+                    rps_id=rps_result,
+                    finger_gesture_id=finger_gesture_vote,
+                    finger_gesture_probs=finger_gesture_probs,
+                    gesture_id=current_gesture_id,
+                ))
+
+        return hands
+
+    def create_pipeline(self, read, flip=True, queue_size=1, drop_frames=True,
+                        method='get_gesture'):
+        """
+        Run get_gesture (or recognize) on a capture -> inference pipeline.
+        :param read: Frame source returning (ret, frame), e.g. cap.read
+        :param flip: Passed through to get_gesture
+        :param method: 'get_gesture' or 'recognize'
+        :return: FramePipeline yielding (frame, gesture_id) pairs, or
+            (frame, hands) with method='recognize'
+        """
+        process = getattr(self, method)
+        return FramePipeline(
+            read,
+            lambda image: process(image, flip=flip),
+            queue_size=queue_size,
+            drop_frames=drop_frames,
+        )
 
 def get_args():
     parser = argparse.ArgumentParser()
@@ -78,6 +331,14 @@ def get_args():
     parser.add_argument("--device", type=int, default=0)
     parser.add_argument("--width", help='cap width', type=int, default=960)
     parser.add_argument("--height", help='cap height', type=int, default=540)
+    parser.add_argument("--inference_width",
+                        help='width of the image passed to MediaPipe',
+                        type=int,
+                        default=None)
+    parser.add_argument("--inference_height",
+                        help='height of the image passed to MediaPipe',
+                        type=int,
+                        default=None)
 
     parser.add_argument('--use_static_image_mode', action='store_true')
     parser.add_argument("--max_num_hands", type=int, default=2)
@@ -89,6 +350,35 @@ def get_args():
                         help='min_tracking_confidence',
                         type=float,
                         default=0.5)
+    parser.add_argument("--classifier_backend",
+                        help='tflite, numpy or onnx (no TensorFlow)',
+                        choices=['tflite', 'numpy', 'onnx'],
+                        default='tflite')
+    parser.add_argument("--smoothing_alpha",
+                        help='EMA weight of the newest hand sign '
+                        'probabilities (1.0: no smoothing)',
+                        type=float,
+                        default=0.5)
+    parser.add_argument("--rps_rules",
+                        help='pixel: 40px OK threshold, scaled: thresholds '
+                        'in hand sizes (independent of resolution)',
+                        choices=['pixel', 'scaled'],
+                        default='pixel')
+
+    parser.add_argument('--show_profile',
+                        help='show per-stage latency on screen',
+                        action='store_true')
+    parser.add_argument("--profile_output",
+                        help='write per-stage latency to .json/.csv on exit',
+                        default=None)
+    parser.add_argument('--no_draw',
+                        help='headless: no window and no rendering '
+                        '(stop with Ctrl+C)',
+                        action='store_true')
+    parser.add_argument('--cache_overlay',
+                        help='keep the hand skeleton on a cached layer that '
+                        'is only redrawn when the landmarks change',
+                        action='store_true')
 
     args = parser.parse_args()
 
@@ -102,12 +392,17 @@ def main():
     cap_device = args.device
     cap_width = args.width
     cap_height = args.height
+    inference_width = args.inference_width
+    inference_height = args.inference_height
 
     use_static_image_mode = args.use_static_image_mode
     min_detection_confidence = args.min_detection_confidence
     min_tracking_confidence = args.min_tracking_confidence
 
     use_brect = True
+    show_profile = args.show_profile
+    profile_output = args.profile_output
+    no_draw = args.no_draw
 
     # カメラ準備 ###############################################################
     cap = cv.VideoCapture(cap_device)
@@ -115,7 +410,7 @@ def main():
     cap.set(cv.CAP_PROP_FRAME_HEIGHT, cap_height)
 
     # モデルロード #############################################################
-    mp_hands = mp.solutions.hands
+    mp_hands = load_hands_solution()
     hands = mp_hands.Hands(
         static_image_mode=args.use_static_image_mode,
         max_num_hands=args.max_num_hands,
@@ -123,9 +418,10 @@ def main():
         min_tracking_confidence=args.min_tracking_confidence,
     )
 
-    keypoint_classifier = KeyPointClassifier()
+    keypoint_classifier = KeyPointClassifier(backend=args.classifier_backend)
 
-    point_history_classifier = PointHistoryClassifier()
+    point_history_classifier = PointHistoryClassifier(
+        backend=args.classifier_backend)
 
     # ラベル読み込み ###########################################################
     with open('model/keypoint_classifier/keypoint_classifier_label.csv',
@@ -142,130 +438,212 @@ def main():
             row[0] for row in point_history_classifier_labels
         ]
 
-    # FPS計測モジュール ########################################################
-    cvFpsCalc = CvFpsCalc(buffer_len=10)
+    # 計測モジュール (ステージ別レイテンシ・FPS) ###############################
+    profiler = StageProfiler(fps_buffer_len=10)
 
-    # 座標履歴 #################################################################
+    # 手ごとの座標履歴・フィンガージェスチャー履歴 ##############################
     history_length = 16
-    point_history = deque(maxlen=history_length)
+    hand_tracker = HandTracker(history_length=history_length,
+                               smoothing_alpha=args.smoothing_alpha)
+
+    # 描画 (骨格はまとめて描画、--cache_overlay で前フレームの描画を再利用)
+    landmark_renderer = LandmarkRenderer(cache=args.cache_overlay)
 
-    # フィンガージェスチャー履歴 ################################################
-    finger_gesture_history = deque(maxlen=history_length)
+    # RPS判定ルール (ピクセル単位 / 手のサイズ単位)
+    rps_rule_engine = RPS_RULE_ENGINES[args.rps_rules]
 
     #  ########################################################################
     mode = 0
 
-    cv.namedWindow('Hand Gesture Recognition')
-
-    # 手勢ID对应的标签文本
-    gesture_labels = {
-        GESTURE_ID_OPEN: "Open",
-        GESTURE_ID_CLOSE: "Close",
-        GESTURE_ID_POINTER: "Pointer",
-        GESTURE_ID_OK: "OK",
-        GESTURE_ID_PAPER: "Paper",
-        GESTURE_ID_ROCK: "Rock",
-        GESTURE_ID_SCISSORS: "Scissors",
-        GESTURE_ID_NONE: ""
-    }
-
-    while True:
-        fps = cvFpsCalc.get()
-
-        # キー処理(ESC：終了) #################################################
-        key = cv.waitKey(10)
-        if key == 27:  # ESC
-            break
-        
-        # 画面右上の×ボタン押下で終了
-        if cv.getWindowProperty('Hand Gesture Recognition', cv.WND_PROP_VISIBLE) < 1:
-            break
+    if not no_draw:
+        cv.namedWindow('Hand Gesture Recognition')
 
-        number, mode = select_mode(key, mode)
+    # 推論ステージ (推論ワーカースレッドで実行) ##################################
+    def inference(image):
+        with profiler.stage('convert'):
+            image = cv.flip(image, 1)  # ミラー表示
 
-        # カメラキャプチャ #####################################################
-        ret, image = cap.read()
-        if not ret:
-            break
-        image = cv.flip(image, 1)  # ミラー表示
-        debug_image = copy.deepcopy(image)
+            # MediaPipeには縮小画像を渡し、座標は表示解像度で計算する
+            inference_image = resize_for_inference(image, inference_width,
+                                                    inference_height)
+            image_rgb = cv.cvtColor(inference_image, cv.COLOR_BGR2RGB)
+            image_rgb.flags.writeable = False
 
         # 検出実施 #############################################################
-        image = cv.cvtColor(image, cv.COLOR_BGR2RGB)
-
-        image.flags.writeable = False
-        results = hands.process(image)
-        image.flags.writeable = True
+        with profiler.stage('hands'):
+            results = hands.process(image_rgb)
 
         #  ####################################################################
+        hand_results = []
+        landmark_points = np.empty((0, 21, 2), dtype=np.int64)
+        image_width, image_height = image.shape[1], image.shape[0]
         if results.multi_hand_landmarks is not None:
-            for hand_landmarks, handedness in zip(results.multi_hand_landmarks,
-                                                  results.multi_handedness):
+
+            with profiler.stage('preprocess'):
+                # ランドマークの計算 (全ての手をまとめて (N, 21, 2) で処理)
+                landmark_points = calc_landmark_points(
+                    np.stack([
+                        landmarks_to_array(hand_landmarks)
+                        for hand_landmarks in results.multi_hand_landmarks
+                    ]), image_width, image_height)
                 # 外接矩形の計算
-                brect = calc_bounding_rect(debug_image, hand_landmarks)
-                # ランドマークの計算
-                landmark_list = calc_landmark_list(debug_image, hand_landmarks)
+                brects = calc_bounding_rect_points(landmark_points).tolist()
+                landmark_lists = landmark_points.tolist()
 
                 # 相対座標・正規化座標への変換
-                pre_processed_landmark_list = pre_process_landmark(
-                    landmark_list)
-                pre_processed_point_history_list = pre_process_point_history(
-                    debug_image, point_history)
-                # 学習データ保存
-                logging_csv(number, mode, pre_processed_landmark_list,
-                            pre_processed_point_history_list)
+                pre_processed_landmarks = pre_process_landmark_points(
+                    landmark_points)
 
-                # ハンドサイン分類
-                hand_sign_id = keypoint_classifier(pre_processed_landmark_list)
-                if hand_sign_id == 2:  # 指差しサイン
-                    point_history.append(landmark_list[8])  # 人差指座標
-                else:
-                    point_history.append([0, 0])
-                
                 # RPS分類
-                rps_result = calc_rps(landmark_list)
+                rps_results = rps_rule_engine.classify(landmark_points)
+                pre_processed_landmark_lists = pre_processed_landmarks.tolist()
+
+                # 手の対応付け
+                tracks = hand_tracker.update([
+                    handedness.classification[0].label
+                    for handedness in results.multi_handedness
+                ], brects, image_width, image_height)
+
+            # ハンドサイン分類 (検出された全ての手を1回の推論で)
+            with profiler.stage('keypoint'):
+                _, hand_sign_probs = keypoint_classifier.classify_batch(
+                    pre_processed_landmarks)
+
+            for (brect, landmark_list, pre_processed_landmark_list,
+                 hand_sign_prob, rps_result, handedness, track) in zip(
+                     brects, landmark_lists, pre_processed_landmark_lists,
+                     hand_sign_probs, rps_results.tolist(),
+                     results.multi_handedness, tracks):
+                # ハンドサインは確率の指数移動平均で判定する
+                hand_sign_id = int(
+                    np.argmax(track.hand_sign_filter.update(hand_sign_prob)))
+
+                # リングバッファ上で正規化 (コピー無し)
+                pre_processed_point_history = track.point_history.pre_process(
+                    image_width, image_height)
 
-                # 打印手势ID
-                # 优先显示规则识别的特殊手势(OK/RPS)，如果没有则显示模型识别的基础手势
-                # current_gesture_id = rps_result if rps_result != GESTURE_ID_NONE else hand_sign_id
-                # print(f"Gesture ID: {current_gesture_id}")
+                if hand_sign_id == 2:  # 指差しサイン
+                    track.point_history.append(landmark_list[8])  # 人差指座標
+                else:
+                    track.point_history.append([0, 0])
 
                 # フィンガージェスチャー分類
                 finger_gesture_id = 0
-                point_history_len = len(pre_processed_point_history_list)
+                point_history_len = len(pre_processed_point_history)
                 if point_history_len == (history_length * 2):
-                    finger_gesture_id = point_history_classifier(
-                        pre_processed_point_history_list)
+                    with profiler.stage('point_history'):
+                        finger_gesture_id = point_history_classifier(
+                            pre_processed_point_history)
 
                 # 直近検出の中で最多のジェスチャーIDを算出
-                finger_gesture_history.append(finger_gesture_id)
-                most_common_fg_id = Counter(
-                    finger_gesture_history).most_common()
+                finger_gesture_vote = track.finger_gesture_vote.update(
+                    finger_gesture_id)
+
+                hand_results.append(
+                    (brect, landmark_list, handedness, hand_sign_id,
+                     rps_result, finger_gesture_vote,
+                     pre_processed_landmark_list,
+                     pre_processed_point_history.tolist()))
+        else:
+            hand_tracker.update([], [], image_width, image_height)
+
+        return (image, hand_results, landmark_points,
+                hand_tracker.point_histories())
+
+    # キャプチャ → 推論 → 描画 のパイプライン ###################################
+    pipeline = FramePipeline(cap.read, inference, queue_size=1,
+                             profiler=profiler)
+    pipeline.start()
+
+    # 推論結果の待ち時間の上限 (カメラが止まってもキー・ウィンドウ操作を受け付ける)
+    result_timeout = 0.1
+
+    if no_draw:
+        # ヘッドレス: 描画・表示を一切行わない ###################################
+        try:
+            last_report = time.perf_counter()
+            while True:
+                try:
+                    item = pipeline.get(timeout=result_timeout)
+                except queue.Empty:
+                    if not pipeline.running:
+                        break
+                    continue
+                if item is None:
+                    break
+                fps = profiler.tick()
+                if time.perf_counter() - last_report >= 1.0:
+                    last_report = time.perf_counter()
+                    print(f"\rFPS:{fps}", end="", flush=True)
+        except KeyboardInterrupt:
+            pass
+        print()
+
+    while not no_draw:
+        # キー処理(ESC：終了) #################################################
+        key = cv.waitKey(1)
+        if key == 27:  # ESC
+            break
+        
+        # 画面右上の×ボタン押下で終了
+        if cv.getWindowProperty('Hand Gesture Recognition', cv.WND_PROP_VISIBLE) < 1:
+            break
+
+        number, mode = select_mode(key, mode)
+
+        # 推論結果取得 #########################################################
+        try:
+            item = pipeline.get(timeout=result_timeout)
+        except queue.Empty:
+            # 結果が届かなくても waitKey を呼び続ける (ワーカー停止時は終了)
+            if not pipeline.running:
+                break
+            continue
+        if item is None:
+            break
+        fps = profiler.tick()
+        _, (debug_image, hand_results, landmark_points,
+            point_histories) = item
+
+        with profiler.stage('draw'):
+            for (brect, _, _, _, _, _, pre_processed_landmark_list,
+                 pre_processed_point_history_list) in hand_results:
+                # 学習データ保存
+                logging_csv(number, mode, pre_processed_landmark_list,
+                            pre_processed_point_history_list)
 
                 # 描画
                 debug_image = draw_bounding_rect(use_brect, debug_image, brect)
-                debug_image = draw_landmarks(debug_image, landmark_list)
-                
+
+            # 全ての手の骨格を一度に描画
+            debug_image = landmark_renderer.draw(debug_image, landmark_points)
+
+            for (brect, _, handedness, hand_sign_id, rps_result,
+                 finger_gesture_id, _, _) in hand_results:
                 info_text = keypoint_classifier_labels[hand_sign_id]
                 if rps_result != GESTURE_ID_NONE:
-                     info_text += ":" + gesture_labels.get(rps_result, "")
+                     info_text += ":" + GESTURE_LABELS.get(rps_result, "")
 
                 debug_image = draw_info_text(
                     debug_image,
                     brect,
                     handedness,
                     info_text,
-                    point_history_classifier_labels[most_common_fg_id[0][0]],
+                    point_history_classifier_labels[finger_gesture_id],
                 )
-        else:
-            point_history.append([0, 0])
 
-        debug_image = draw_point_history(debug_image, point_history)
-        debug_image = draw_info(debug_image, fps, mode, number)
+            for point_history in point_histories:
+                debug_image = draw_point_history(debug_image, point_history)
+            debug_image = draw_info(debug_image, fps, mode, number,
+                                    profiler if show_profile else None)
 
         # 画面反映 #############################################################
-        cv.imshow('Hand Gesture Recognition', debug_image)
+        with profiler.stage('imshow'):
+            cv.imshow('Hand Gesture Recognition', debug_image)
 
+    pipeline.stop()
+    if profile_output is not None:
+        profiler.dump(profile_output)
     cap.release()
     cv.destroyAllWindows()
 
@@ -283,88 +661,56 @@ def select_mode(key, mode):
     return number, mode
 
 
-def calc_bounding_rect(image, landmarks):
+def resize_for_inference(image, inference_width=None, inference_height=None):
     image_width, image_height = image.shape[1], image.shape[0]
+    if inference_width is None and inference_height is None:
+        return image
+
+    # 片方のみ指定された場合はアスペクト比を維持
+    if inference_width is None:
+        inference_width = round(image_width * inference_height / image_height)
+    if inference_height is None:
+        inference_height = round(image_height * inference_width / image_width)
 
-    landmark_array = np.empty((0, 2), int)
+    # 拡大はしない
+    if inference_width >= image_width and inference_height >= image_height:
+        return image
 
-    for _, landmark in enumerate(landmarks.landmark):
-        landmark_x = min(int(landmark.x * image_width), image_width - 1)
-        landmark_y = min(int(landmark.y * image_height), image_height - 1)
+    return cv.resize(image, (inference_width, inference_height),
+                     interpolation=cv.INTER_AREA)
 
-        landmark_point = [np.array((landmark_x, landmark_y))]
 
-        landmark_array = np.append(landmark_array, landmark_point, axis=0)
+def calc_bounding_rect(image, landmarks):
+    image_width, image_height = image.shape[1], image.shape[0]
 
-    x, y, w, h = cv.boundingRect(landmark_array)
+    landmark_points = calc_landmark_points(landmarks_to_array(landmarks),
+                                           image_width, image_height)
 
-    return [x, y, x + w, y + h]
+    return calc_bounding_rect_points(landmark_points).tolist()
 
 
 def calc_landmark_list(image, landmarks):
     image_width, image_height = image.shape[1], image.shape[0]
 
-    landmark_point = []
-
     # キーポイント
-    for _, landmark in enumerate(landmarks.landmark):
-        landmark_x = min(int(landmark.x * image_width), image_width - 1)
-        landmark_y = min(int(landmark.y * image_height), image_height - 1)
-        # landmark_z = landmark.z
-
-        landmark_point.append([landmark_x, landmark_y])
+    landmark_points = calc_landmark_points(landmarks_to_array(landmarks),
+                                           image_width, image_height)
 
-    return landmark_point
+    return landmark_points.tolist()
 
 
 def pre_process_landmark(landmark_list):
-    temp_landmark_list = copy.deepcopy(landmark_list)
-
-    # 相対座標に変換
-    base_x, base_y = 0, 0
-    for index, landmark_point in enumerate(temp_landmark_list):
-        if index == 0:
-            base_x, base_y = landmark_point[0], landmark_point[1]
-
-        temp_landmark_list[index][0] = temp_landmark_list[index][0] - base_x
-        temp_landmark_list[index][1] = temp_landmark_list[index][1] - base_y
-
-    # 1次元リストに変換
-    temp_landmark_list = list(
-        itertools.chain.from_iterable(temp_landmark_list))
-
-    # 正規化
-    max_value = max(list(map(abs, temp_landmark_list)))
-
-    def normalize_(n):
-        return n / max_value
-
-    temp_landmark_list = list(map(normalize_, temp_landmark_list))
-
-    return temp_landmark_list
+    # 相対座標に変換・1次元に変換・正規化
+    return pre_process_landmark_points(landmark_list).tolist()
 
 
 def pre_process_point_history(image, point_history):
     image_width, image_height = image.shape[1], image.shape[0]
 
-    temp_point_history = copy.deepcopy(point_history)
-
-    # 相対座標に変換
-    base_x, base_y = 0, 0
-    for index, point in enumerate(temp_point_history):
-        if index == 0:
-            base_x, base_y = point[0], point[1]
-
-        temp_point_history[index][0] = (temp_point_history[index][0] -
-                                        base_x) / image_width
-        temp_point_history[index][1] = (temp_point_history[index][1] -
-                                        base_y) / image_height
-
-    # 1次元リストに変換
-    temp_point_history = list(
-        itertools.chain.from_iterable(temp_point_history))
-
-    return temp_point_history
+    # 相対座標に変換・1次元に変換
+    return pre_process_point_history_points(
+        np.array(point_history, dtype=np.int64).reshape(-1, 2), image_width,
+        image_height).tolist()
 
 
 def logging_csv(number, mode, landmark_list, point_history_list):
@@ -384,192 +730,11 @@ def logging_csv(number, mode, landmark_list, point_history_list):
 
 
 def draw_landmarks(image, landmark_point):
-    # 接続線
-    if len(landmark_point) > 0:
-        # 親指
-        cv.line(image, tuple(landmark_point[2]), tuple(landmark_point[3]),
-                (0, 0, 0), 6)
-        cv.line(image, tuple(landmark_point[2]), tuple(landmark_point[3]),
-                (255, 255, 255), 2)
-        cv.line(image, tuple(landmark_point[3]), tuple(landmark_point[4]),
-                (0, 0, 0), 6)
-        cv.line(image, tuple(landmark_point[3]), tuple(landmark_point[4]),
-                (255, 255, 255), 2)
-
-        # 人差指
-        cv.line(image, tuple(landmark_point[5]), tuple(landmark_point[6]),
-                (0, 0, 0), 6)
-        cv.line(image, tuple(landmark_point[5]), tuple(landmark_point[6]),
-                (255, 255, 255), 2)
-        cv.line(image, tuple(landmark_point[6]), tuple(landmark_point[7]),
-                (0, 0, 0), 6)
-        cv.line(image, tuple(landmark_point[6]), tuple(landmark_point[7]),
-                (255, 255, 255), 2)
-        cv.line(image, tuple(landmark_point[7]), tuple(landmark_point[8]),
-                (0, 0, 0), 6)
-        cv.line(image, tuple(landmark_point[7]), tuple(landmark_point[8]),
-                (255, 255, 255), 2)
-
-        # 中指
-        cv.line(image, tuple(landmark_point[9]), tuple(landmark_point[10]),
-                (0, 0, 0), 6)
-        cv.line(image, tuple(landmark_point[9]), tuple(landmark_point[10]),
-                (255, 255, 255), 2)
-        cv.line(image, tuple(landmark_point[10]), tuple(landmark_point[11]),
-                (0, 0, 0), 6)
-        cv.line(image, tuple(landmark_point[10]), tuple(landmark_point[11]),
-                (255, 255, 255), 2)
-        cv.line(image, tuple(landmark_point[11]), tuple(landmark_point[12]),
-                (0, 0, 0), 6)
-        cv.line(image, tuple(landmark_point[11]), tuple(landmark_point[12]),
-                (255, 255, 255), 2)
-
-        # 薬指
-        cv.line(image, tuple(landmark_point[13]), tuple(landmark_point[14]),
-                (0, 0, 0), 6)
-        cv.line(image, tuple(landmark_point[13]), tuple(landmark_point[14]),
-                (255, 255, 255), 2)
-        cv.line(image, tuple(landmark_point[14]), tuple(landmark_point[15]),
-                (0, 0, 0), 6)
-        cv.line(image, tuple(landmark_point[14]), tuple(landmark_point[15]),
-                (255, 255, 255), 2)
-        cv.line(image, tuple(landmark_point[15]), tuple(landmark_point[16]),
-                (0, 0, 0), 6)
-        cv.line(image, tuple(landmark_point[15]), tuple(landmark_point[16]),
-                (255, 255, 255), 2)
-
-        # 小指
-        cv.line(image, tuple(landmark_point[17]), tuple(landmark_point[18]),
-                (0, 0, 0), 6)
-        cv.line(image, tuple(landmark_point[17]), tuple(landmark_point[18]),
-                (255, 255, 255), 2)
-        cv.line(image, tuple(landmark_point[18]), tuple(landmark_point[19]),
-                (0, 0, 0), 6)
-        cv.line(image, tuple(landmark_point[18]), tuple(landmark_point[19]),
-                (255, 255, 255), 2)
-        cv.line(image, tuple(landmark_point[19]), tuple(landmark_point[20]),
-                (0, 0, 0), 6)
-        cv.line(image, tuple(landmark_point[19]), tuple(landmark_point[20]),
-                (255, 255, 255), 2)
-
-        # 手の平
-        cv.line(image, tuple(landmark_point[0]), tuple(landmark_point[1]),
-                (0, 0, 0), 6)
-        cv.line(image, tuple(landmark_point[0]), tuple(landmark_point[1]),
-                (255, 255, 255), 2)
-        cv.line(image, tuple(landmark_point[1]), tuple(landmark_point[2]),
-                (0, 0, 0), 6)
-        cv.line(image, tuple(landmark_point[1]), tuple(landmark_point[2]),
-                (255, 255, 255), 2)
-        cv.line(image, tuple(landmark_point[2]), tuple(landmark_point[5]),
-                (0, 0, 0), 6)
-        cv.line(image, tuple(landmark_point[2]), tuple(landmark_point[5]),
-                (255, 255, 255), 2)
-        cv.line(image, tuple(landmark_point[5]), tuple(landmark_point[9]),
-                (0, 0, 0), 6)
-        cv.line(image, tuple(landmark_point[5]), tuple(landmark_point[9]),
-                (255, 255, 255), 2)
-        cv.line(image, tuple(landmark_point[9]), tuple(landmark_point[13]),
-                (0, 0, 0), 6)
-        cv.line(image, tuple(landmark_point[9]), tuple(landmark_point[13]),
-                (255, 255, 255), 2)
-        cv.line(image, tuple(landmark_point[13]), tuple(landmark_point[17]),
-                (0, 0, 0), 6)
-        cv.line(image, tuple(landmark_point[13]), tuple(landmark_point[17]),
-                (255, 255, 255), 2)
-        cv.line(image, tuple(landmark_point[17]), tuple(landmark_point[0]),
-                (0, 0, 0), 6)
-        cv.line(image, tuple(landmark_point[17]), tuple(landmark_point[0]),
-                (255, 255, 255), 2)
-
-    # キーポイント
-    for index, landmark in enumerate(landmark_point):
-        if index == 0:  # 手首1
-            cv.circle(image, (landmark[0], landmark[1]), 5, (255, 255, 255),
-                      -1)
-            cv.circle(image, (landmark[0], landmark[1]), 5, (0, 0, 0), 1)
-        if index == 1:  # 手首2
-            cv.circle(image, (landmark[0], landmark[1]), 5, (255, 255, 255),
-                      -1)
-            cv.circle(image, (landmark[0], landmark[1]), 5, (0, 0, 0), 1)
-        if index == 2:  # 親指：付け根
-            cv.circle(image, (landmark[0], landmark[1]), 5, (255, 255, 255),
-                      -1)
-            cv.circle(image, (landmark[0], landmark[1]), 5, (0, 0, 0), 1)
-        if index == 3:  # 親指：第1関節
-            cv.circle(image, (landmark[0], landmark[1]), 5, (255, 255, 255),
-                      -1)
-            cv.circle(image, (landmark[0], landmark[1]), 5, (0, 0, 0), 1)
-        if index == 4:  # 親指：指先
-            cv.circle(image, (landmark[0], landmark[1]), 8, (255, 255, 255),
-                      -1)
-            cv.circle(image, (landmark[0], landmark[1]), 8, (0, 0, 0), 1)
-        if index == 5:  # 人差指：付け根
-            cv.circle(image, (landmark[0], landmark[1]), 5, (255, 255, 255),
-                      -1)
-            cv.circle(image, (landmark[0], landmark[1]), 5, (0, 0, 0), 1)
-        if index == 6:  # 人差指：第2関節
-            cv.circle(image, (landmark[0], landmark[1]), 5, (255, 255, 255),
-                      -1)
-            cv.circle(image, (landmark[0], landmark[1]), 5, (0, 0, 0), 1)
-        if index == 7:  # 人差指：第1関節
-            cv.circle(image, (landmark[0], landmark[1]), 5, (255, 255, 255),
-                      -1)
-            cv.circle(image, (landmark[0], landmark[1]), 5, (0, 0, 0), 1)
-        if index == 8:  # 人差指：指先
-            cv.circle(image, (landmark[0], landmark[1]), 8, (255, 255, 255),
-                      -1)
-            cv.circle(image, (landmark[0], landmark[1]), 8, (0, 0, 0), 1)
-        if index == 9:  # 中指：付け根
-            cv.circle(image, (landmark[0], landmark[1]), 5, (255, 255, 255),
-                      -1)
-            cv.circle(image, (landmark[0], landmark[1]), 5, (0, 0, 0), 1)
-        if index == 10:  # 中指：第2関節
-            cv.circle(image, (landmark[0], landmark[1]), 5, (255, 255, 255),
-                      -1)
-            cv.circle(image, (landmark[0], landmark[1]), 5, (0, 0, 0), 1)
-        if index == 11:  # 中指：第1関節
-            cv.circle(image, (landmark[0], landmark[1]), 5, (255, 255, 255),
-                      -1)
-            cv.circle(image, (landmark[0], landmark[1]), 5, (0, 0, 0), 1)
-        if index == 12:  # 中指：指先
-            cv.circle(image, (landmark[0], landmark[1]), 8, (255, 255, 255),
-                      -1)
-            cv.circle(image, (landmark[0], landmark[1]), 8, (0, 0, 0), 1)
-        if index == 13:  # 薬指：付け根
-            cv.circle(image, (landmark[0], landmark[1]), 5, (255, 255, 255),
-                      -1)
-            cv.circle(image, (landmark[0], landmark[1]), 5, (0, 0, 0), 1)
-        if index == 14:  # 薬指：第2関節
-            cv.circle(image, (landmark[0], landmark[1]), 5, (255, 255, 255),
-                      -1)
-            cv.circle(image, (landmark[0], landmark[1]), 5, (0, 0, 0), 1)
-        if index == 15:  # 薬指：第1関節
-            cv.circle(image, (landmark[0], landmark[1]), 5, (255, 255, 255),
-                      -1)
-            cv.circle(image, (landmark[0], landmark[1]), 5, (0, 0, 0), 1)
-        if index == 16:  # 薬指：指先
-            cv.circle(image, (landmark[0], landmark[1]), 8, (255, 255, 255),
-                      -1)
-            cv.circle(image, (landmark[0], landmark[1]), 8, (0, 0, 0), 1)
-        if index == 17:  # 小指：付け根
-            cv.circle(image, (landmark[0], landmark[1]), 5, (255, 255, 255),
-                      -1)
-            cv.circle(image, (landmark[0], landmark[1]), 5, (0, 0, 0), 1)
-        if index == 18:  # 小指：第2関節
-            cv.circle(image, (landmark[0], landmark[1]), 5, (255, 255, 255),
-                      -1)
-            cv.circle(image, (landmark[0], landmark[1]), 5, (0, 0, 0), 1)
-        if index == 19:  # 小指：第1関節
-            cv.circle(image, (landmark[0], landmark[1]), 5, (255, 255, 255),
-                      -1)
-            cv.circle(image, (landmark[0], landmark[1]), 5, (0, 0, 0), 1)
-        if index == 20:  # 小指：指先
-            cv.circle(image, (landmark[0], landmark[1]), 8, (255, 255, 255),
-                      -1)
-            cv.circle(image, (landmark[0], landmark[1]), 8, (0, 0, 0), 1)
-
-    return image
+    """
+    Draw one hand's skeleton (see utils.landmark_renderer).
+    :param landmark_point: 21 [x, y] landmark coordinates
+    """
+    return draw_hand_landmarks(image, landmark_point)
 
 
 def draw_bounding_rect(use_brect, image, brect):
@@ -582,45 +747,12 @@ def draw_bounding_rect(use_brect, image, brect):
 
 
 def calc_rps(landmark_list):
-    # 手首の座標
-    wrist = np.array(landmark_list[0])
-    
-    # 指先と第2関節（親指は第1関節）の座標
-    thumb_tip = np.array(landmark_list[4])
-    thumb_ip = np.array(landmark_list[2]) # MCP
-    
-    index_tip = np.array(landmark_list[8])
-    index_pip = np.array(landmark_list[6])
-    
-    middle_tip = np.array(landmark_list[12])
-    middle_pip = np.array(landmark_list[10])
-    
-    ring_tip = np.array(landmark_list[16])
-    ring_pip = np.array(landmark_list[14])
-    
-    pinky_tip = np.array(landmark_list[20])
-    pinky_pip = np.array(landmark_list[18])
-    
-    # 指が伸びているか判定 (手首からの距離で比較)
-    thumb_open = np.linalg.norm(thumb_tip - wrist) > np.linalg.norm(thumb_ip - wrist)
-    index_open = np.linalg.norm(index_tip - wrist) > np.linalg.norm(index_pip - wrist)
-    middle_open = np.linalg.norm(middle_tip - wrist) > np.linalg.norm(middle_pip - wrist)
-    ring_open = np.linalg.norm(ring_tip - wrist) > np.linalg.norm(ring_pip - wrist)
-    pinky_open = np.linalg.norm(pinky_tip - wrist) > np.linalg.norm(pinky_pip - wrist)
-    
-    # OKサイン判定 (親指と人差指がくっついている & 他の指が開いている)
-    thumb_index_dist = np.linalg.norm(thumb_tip - index_tip)
-    if thumb_index_dist < 40 and middle_open and ring_open and pinky_open: # 閾値は調整が必要かもしれません
-        return GESTURE_ID_OK
-
-    if index_open and middle_open and ring_open and pinky_open:
-        return GESTURE_ID_PAPER
-    elif index_open and middle_open and not ring_open and not pinky_open:
-        return GESTURE_ID_SCISSORS
-    elif not index_open and not middle_open and not ring_open and not pinky_open:
-        return GESTURE_ID_ROCK
-    else:
-        return GESTURE_ID_NONE
+    """
+    Rule-based OK / rock / paper / scissors of one hand (RPS_RULES).
+    :param landmark_list: 21 [x, y] landmark pixel coordinates
+    :return: Gesture ID (GESTURE_ID_NONE when no rule matches)
+    """
+    return RPS_RULE_ENGINE.classify(landmark_list)
 
 def draw_info_text(image, brect, handedness, hand_sign_text,
                    finger_gesture_text):
@@ -654,12 +786,25 @@ def draw_point_history(image, point_history):
     return image
 
 
-def draw_info(image, fps, mode, number):
+def draw_info(image, fps, mode, number, profiler=None):
     cv.putText(image, "FPS:" + str(fps), (10, 30), cv.FONT_HERSHEY_SIMPLEX,
                1.0, (0, 0, 0), 4, cv.LINE_AA)
     cv.putText(image, "FPS:" + str(fps), (10, 30), cv.FONT_HERSHEY_SIMPLEX,
                1.0, (255, 255, 255), 2, cv.LINE_AA)
 
+    # ステージ別レイテンシ (p50/p95/p99 ms) を左下に表示
+    if profiler is not None:
+        summary = profiler.summary()
+        y = image.shape[0] - 10 - 18 * (len(summary) - 1)
+        for name, values in summary.items():
+            text = "{}: {:.1f}/{:.1f}/{:.1f}ms".format(
+                name, values['p50_ms'], values['p95_ms'], values['p99_ms'])
+            cv.putText(image, text, (10, y), cv.FONT_HERSHEY_SIMPLEX, 0.5,
+                       (0, 0, 0), 3, cv.LINE_AA)
+            cv.putText(image, text, (10, y), cv.FONT_HERSHEY_SIMPLEX, 0.5,
+                       (255, 255, 255), 1, cv.LINE_AA)
+            y += 18
+
     mode_string = ['Logging Key Point', 'Logging Point History']
     if 1 <= mode <= 2:
         cv.putText(image, "MODE:" + mode_string[mode - 1], (10, 90),
@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Headless batch scoring of recorded sessions.
+
+Streams frames from video files or image folders through
+GestureRecognizer and writes one row per detected hand and frame (frames
+without a hand get a single row with hand = -1) to JSONL, CSV or Parquet.
+
+    python batch_runner.py sessions/ --output results.jsonl --workers 8
+"""
+import os
+import sys
+import time
+import argparse
+
+from utils import FramePipeline
+from utils.worker_pool import RecognizerPool
+from utils.frame_source import FrameSource
+from utils.frame_source import expand_sources
+from utils.result_writer import RESULT_FORMATS
+from utils.result_writer import open_result_writer
+
+RESULT_FIELDS = [
+    'source', 'frame', 'timestamp_ms', 'hand', 'hand_id', 'handedness',
+    'hand_sign_id', 'rps_id', 'finger_gesture_id', 'gesture_id'
+]
+
+
+def get_args():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("inputs",
+                        nargs='+',
+                        help='video files, image folders or folders of videos')
+    parser.add_argument("--output", help='output file', required=True)
+    parser.add_argument("--format",
+                        help='output format (default: from extension)',
+                        choices=RESULT_FORMATS,
+                        default=None)
+    parser.add_argument("--workers",
+                        help='number of processes (one file per task)',
+                        type=int,
+                        default=1)
+    parser.add_argument("--chunk_size",
+                        help='split each file into chunks of N frames '
+                        'decoded here and sent to the workers via shared '
+                        'memory (default: whole files per worker)',
+                        type=int,
+                        default=None)
+    parser.add_argument('--no_flip',
+                        help='do not mirror frames before recognition',
+                        action='store_true')
+
+    parser.add_argument('--use_static_image_mode', action='store_true')
+    parser.add_argument("--max_num_hands", type=int, default=2)
+    parser.add_argument("--min_detection_confidence",
+                        help='min_detection_confidence',
+                        type=float,
+                        default=0.7)
+    parser.add_argument("--min_tracking_confidence",
+                        help='min_tracking_confidence',
+                        type=float,
+                        default=0.5)
+    parser.add_argument("--inference_width", type=int, default=None)
+    parser.add_argument("--inference_height", type=int, default=None)
+    parser.add_argument("--classifier_backend",
+                        help='tflite, numpy or onnx (no TensorFlow)',
+                        choices=['tflite', 'numpy', 'onnx'],
+                        default='tflite')
+    parser.add_argument("--rps_rules",
+                        help='pixel: 40px OK threshold, scaled: thresholds '
+                        'in hand sizes (independent of resolution)',
+                        choices=['pixel', 'scaled'],
+                        default='pixel')
+    parser.add_argument("--smoothing_alpha",
+                        help='EMA weight of the newest hand sign '
+                        'probabilities (1.0: raw per-frame hand signs)',
+                        type=float,
+                        default=1.0)
+    parser.add_argument("--min_dwell",
+                        help='frames a new gesture_id must persist '
+                        '(1: raw per-frame gestures)',
+                        type=int,
+                        default=1)
+
+    args = parser.parse_args()
+
+    return args
+
+
+def create_recognizer(options):
+    # 親プロセスではモデルを読み込まないよう、ここで import する
+    from app import GestureRecognizer
+
+    return GestureRecognizer(
+        static_image_mode=options['use_static_image_mode'],
+        max_num_hands=options['max_num_hands'],
+        min_detection_confidence=options['min_detection_confidence'],
+        min_tracking_confidence=options['min_tracking_confidence'],
+        inference_width=options['inference_width'],
+        inference_height=options['inference_height'],
+        classifier_backend=options['classifier_backend'],
+        smoothing_alpha=options['smoothing_alpha'],
+        min_dwell=options['min_dwell'],
+        rps_rules=options['rps_rules'],
+    )
+
+
+def score_source(recognizer, source, flip=True):
+    """
+    Run the recognizer over every frame of one source.
+    Decoding runs on its own thread, overlapping with inference.
+    :return: List of result rows
+    """
+    recognizer.reset()
+    frame_source = FrameSource(source)
+    if not frame_source.isOpened():
+        print(f"skip {source}: cannot open", file=sys.stderr)
+        return []
+
+    def read():
+        ret, frame = frame_source.read()
+        return ret, (frame_source.frame_index, frame_source.timestamp_ms,
+                     frame)
+
+    def process(item):
+        return recognizer.recognize(item[2], flip=flip)
+
+    rows = []
+    pipeline = FramePipeline(read, process, queue_size=4, drop_frames=False)
+    with pipeline:
+        for (frame_index, timestamp_ms, _), hands in pipeline:
+            rows.extend(hands_to_rows(source, frame_index, timestamp_ms, hands))
+    frame_source.release()
+    return rows
+
+
+def hands_to_rows(source, frame_index, timestamp_ms, hands):
+    if len(hands) == 0:
+        return [{
+            'source': source,
+            'frame': frame_index,
+            'timestamp_ms': timestamp_ms,
+            'hand': -1,
+            'hand_id': -1,
+            'handedness': '',
+            'hand_sign_id': -1,
+            'rps_id': -1,
+            'finger_gesture_id': -1,
+            'gesture_id': -1,
+        }]
+    return [{
+        'source': source,
+        'frame': frame_index,
+        'timestamp_ms': timestamp_ms,
+        'hand': hand_index,
+        'hand_id': hand.hand_id,
+        'handedness': hand.handedness,
+        'hand_sign_id': hand.hand_sign_id,
+        'rps_id': hand.rps_id,
+        'finger_gesture_id': hand.finger_gesture_id,
+        'gesture_id': hand.gesture_id,
+    } for hand_index, hand in enumerate(hands)]
+
+
+def score_source_task(recognizer, source, flip):
+    rows = score_source(recognizer, source, flip)
+    return len({row['frame'] for row in rows}), rows
+
+
+def score_source_chunked(pool, source, chunk_size):
+    """
+    Decode one source here and recognize its frames on the pool.
+    """
+    frame_source = FrameSource(source)
+    if not frame_source.isOpened():
+        print(f"skip {source}: cannot open", file=sys.stderr)
+        return []
+
+    timestamps = []
+
+    def frames():
+        for frame in frame_source:
+            timestamps.append(frame_source.timestamp_ms)
+            yield frame
+
+    rows = []
+    for frame_index, hands in enumerate(
+            pool.map_frames(frames(), chunk_size=chunk_size)):
+        rows.extend(
+            hands_to_rows(source, frame_index, timestamps[frame_index],
+                          hands))
+    frame_source.release()
+    return rows
+
+
+def main():
+    args = get_args()
+
+    sources = expand_sources(args.inputs)
+    if not sources:
+        print("no input sources", file=sys.stderr)
+        return
+
+    options = vars(args)
+    flip = not args.no_flip
+
+    writer = open_result_writer(args.output, RESULT_FIELDS, args.format)
+    start_time = time.perf_counter()
+    frame_count = 0
+    pool = None
+    try:
+        if args.workers <= 1 and args.chunk_size is None:
+            recognizer = create_recognizer(options)
+            results = (score_source(recognizer, source, flip)
+                       for source in sources)
+        else:
+            # ワーカープロセスごとに認識器を1つ保持する
+            pool = RecognizerPool(max(1, args.workers),
+                                  create_recognizer, (options, ),
+                                  flip=flip)
+            if args.chunk_size is None:
+                results = pool.map_files(sources, score_source_task, (flip, ))
+            else:
+                results = (score_source_chunked(pool, source,
+                                                args.chunk_size)
+                           for source in sources)
+
+        for source, rows in zip(sources, results):
+            writer.write_rows(rows)
+            frame_count += len({row['frame'] for row in rows})
+            print(f"{os.path.basename(source)}: {len(rows)} rows",
+                  file=sys.stderr)
+    finally:
+        writer.close()
+        if pool is not None:
+            for worker in pool.stats()['workers']:
+                print(f"worker {worker['worker']}: {worker['frames']} frames, "
+                      f"{worker['fps']:.1f} fps",
+                      file=sys.stderr)
+            pool.close()
+
+    elapsed = time.perf_counter() - start_time
+    print(f"{len(sources)} sources, {frame_count} frames in {elapsed:.1f}s "
+          f"({frame_count / max(elapsed, 1e-9):.1f} fps)",
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Latency/throughput of the classifier backends (tflite, numpy, onnx)
+per batch size and thread count:
+
+    python -m benchmark.backend_benchmark --threads 1 4 \
+        --batch_sizes 1 2 8 64 512 --output backends.json
+"""
+import json
+import time
+import argparse
+
+import numpy as np
+
+from model.mlp_backend import BACKENDS
+from model.mlp_backend import create_backend
+from utils import StageProfiler
+
+MODELS = [
+    ('keypoint_classifier', 42),
+    ('point_history_classifier', 32),
+]
+
+
+def get_args():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("--backends", nargs='+', default=list(BACKENDS))
+    parser.add_argument("--threads", nargs='+', type=int, default=[1])
+    parser.add_argument("--batch_sizes",
+                        nargs='+',
+                        type=int,
+                        default=[1, 2, 8, 64, 512])
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help='JSON output path', default=None)
+
+    args = parser.parse_args()
+
+    return args
+
+
+def main():
+    args = get_args()
+
+    rng = np.random.default_rng(args.seed)
+    rows = []
+    print(f"{'model':<26}{'backend':<8}{'thr':>4}{'batch':>6}{'load ms':>9}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'rows/s':>12}")
+    for name, num_features in MODELS:
+        model_path = 'model/%s/%s.tflite' % (name, name)
+        for backend in args.backends:
+            for num_threads in args.threads:
+                start_time = time.perf_counter()
+                try:
+                    model = create_backend(backend,
+                                           model_path,
+                                           num_threads=num_threads)
+                except ImportError as e:
+                    print(f"{name:<26}{backend:<8} skipped ({e})")
+                    break
+                load_ms = (time.perf_counter() - start_time) * 1000.0
+
+                profiler = StageProfiler()
+                for batch_size in args.batch_sizes:
+                    inputs = rng.uniform(
+                        -1.0, 1.0,
+                        (batch_size, num_features)).astype(np.float32)
+                    # ウォームアップ (TFLite はここでテンソルを再確保する)
+                    for _ in range(10):
+                        model(inputs)
+
+                    histogram = profiler.histogram(str(batch_size))
+                    iterations = max(10, args.iterations // max(
+                        1, batch_size // 8))
+                    total_start = time.perf_counter()
+                    for _ in range(iterations):
+                        call_start = time.perf_counter()
+                        model(inputs)
+                        histogram.record(
+                            (time.perf_counter() - call_start) * 1000.0)
+                    elapsed = time.perf_counter() - total_start
+
+                    row = {
+                        'model': name,
+                        'backend': backend,
+                        'threads': num_threads,
+                        'batch_size': batch_size,
+                        'load_ms': round(load_ms, 2),
+                        'p50_ms': round(histogram.percentile(50), 4),
+                        'p95_ms': round(histogram.percentile(95), 4),
+                        'rows_per_s':
+                        round(iterations * batch_size / elapsed, 1),
+                    }
+                    rows.append(row)
+                    print(f"{name:<26}{backend:<8}{num_threads:>4}"
+                          f"{batch_size:>6}{row['load_ms']:>9.2f}"
+                          f"{row['p50_ms']:>9.4f}{row['p95_ms']:>9.4f}"
+                          f"{row['rows_per_s']:>12.1f}")
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Numerical parity of the numpy/onnx classifier backends against TFLite.
+
+Runs every backend over the training CSVs, reports the largest
+probability difference and the argmax agreement against TFLite, and
+fails (exit 1) when they diverge. The Keras .hdf5 checkpoints, which
+can also be passed as weights_path, are compared as well; they are not
+generated from the .tflite, so a difference is flagged but does not fail
+the run. With --export, the .npz/.onnx weights used by the other
+backends are first re-extracted from the .tflite models:
+
+    python -m benchmark.backend_parity --export
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+from model.mlp_backend import NumpyMLP
+from model.mlp_backend import create_backend
+from model.mlp_backend import export_onnx
+
+MODELS = [
+    ('keypoint_classifier', 'model/keypoint_classifier/keypoint.csv', 42),
+    ('point_history_classifier',
+     'model/point_history_classifier/point_history.csv', 32),
+]
+
+
+def get_args():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--export',
+                        help='re-export .npz/.onnx weights from the .tflite '
+                        'models',
+                        action='store_true')
+    parser.add_argument("--backends",
+                        nargs='+',
+                        default=['numpy', 'onnx'],
+                        help='backends compared against tflite')
+    parser.add_argument("--atol", type=float, default=1e-5)
+
+    args = parser.parse_args()
+
+    return args
+
+
+def model_path(name, extension):
+    return 'model/%s/%s%s' % (name, name, extension)
+
+
+def main():
+    args = get_args()
+
+    if args.export:
+        for name, _, _ in MODELS:
+            mlp = NumpyMLP.from_file(model_path(name, '.tflite'))
+            mlp.save(model_path(name, '.npz'))
+            export_onnx(mlp.weights, model_path(name, '.onnx'))
+            print('exported', model_path(name, '.npz'),
+                  model_path(name, '.onnx'))
+
+    failed = False
+    for name, csv_path, num_features in MODELS:
+        features = np.loadtxt(csv_path,
+                              delimiter=',',
+                              dtype=np.float32,
+                              usecols=list(range(1, num_features + 1)))
+        reference = create_backend('tflite', model_path(name,
+                                                        '.tflite'))(features)
+
+        for backend in args.backends:
+            start_time = time.perf_counter()
+            try:
+                model = create_backend(backend, model_path(name, '.tflite'))
+            except ImportError as e:
+                print(f"{name:<26} {backend:<7} skipped ({e})")
+                continue
+            load_ms = (time.perf_counter() - start_time) * 1000.0
+            result = model(features)
+
+            max_diff = float(np.abs(result - reference).max())
+            agreement = float(
+                np.mean(result.argmax(axis=1) == reference.argmax(axis=1)))
+            ok = max_diff <= args.atol and agreement == 1.0
+            failed |= not ok
+            print(f"{name:<26} {backend:<7} rows={len(features):<6}"
+                  f" max_abs_diff={max_diff:.2e}"
+                  f" argmax_agreement={agreement:.4f} load={load_ms:.2f}ms"
+                  f" {'OK' if ok else 'MISMATCH'}")
+
+        # Keras チェックポイントは .tflite の変換元とは限らないので警告のみ
+        hdf5_path = model_path(name, '.hdf5')
+        if os.path.exists(hdf5_path):
+            try:
+                result = NumpyMLP.from_file(hdf5_path)(features)
+            except ImportError as e:
+                print(f"{name:<26} {'hdf5':<7} skipped ({e})")
+                continue
+            max_diff = float(np.abs(result - reference).max())
+            agreement = float(
+                np.mean(result.argmax(axis=1) == reference.argmax(axis=1)))
+            ok = max_diff <= args.atol and agreement == 1.0
+            status = 'OK' if ok else ('DIFFERS from .tflite (different '
+                                      'checkpoint, not a substitute)')
+            print(f"{name:<26} {'hdf5':<7} rows={len(features):<6}"
+                  f" max_abs_diff={max_diff:.2e}"
+                  f" argmax_agreement={agreement:.4f} {status}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
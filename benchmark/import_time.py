@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Cold-start cost of the entry points.
+
+Every target runs in a fresh interpreter, so nothing is cached between
+measurements. Reports wall time, whether MediaPipe/TensorFlow got
+loaded, and (with --top) the slowest imports from ``-X importtime``:
+
+    python -m benchmark.import_time --repeat 3 --top 5
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+TARGETS = [
+    ('import model', 'import model'),
+    ('import app', 'import app'),
+    ('import frame', 'import frame'),
+    ('KeyPointClassifier(numpy)',
+     "from model import KeyPointClassifier; KeyPointClassifier("
+     "backend='numpy')"),
+    ('KeyPointClassifier(tflite)',
+     "from model import KeyPointClassifier; KeyPointClassifier()"),
+    ('GestureRecognizer()',
+     "from app import GestureRecognizer; GestureRecognizer()"),
+]
+
+_PROBE = """
+import sys, time, json
+start_time = time.perf_counter()
+exec(%r)
+elapsed = time.perf_counter() - start_time
+print(json.dumps({
+    'seconds': elapsed,
+    'mediapipe': 'mediapipe' in sys.modules,
+    'tensorflow': 'tensorflow' in sys.modules,
+}))
+"""
+
+
+def get_args():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top",
+                        help='show the N slowest imports per target',
+                        type=int,
+                        default=0)
+
+    args = parser.parse_args()
+
+    return args
+
+
+def run_target(code, importtime=False):
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', _PROBE % code]
+    env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL='3')
+    completed = subprocess.run(command,
+                               capture_output=True,
+                               text=True,
+                               env=env,
+                               check=True)
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    return result, completed.stderr
+
+
+def slowest_imports(stderr, count, exclude=()):
+    """
+    :param exclude: Modules imported by the interpreter/probe itself
+    :return: [(cumulative_us, module)] of the top-level imports
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        # インデントのない行 = トップレベルの import
+        if (cumulative.strip().isdigit() and not module.startswith('  ')
+                and module.strip() not in exclude):
+            imports.append((int(cumulative), module.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+def main():
+    args = get_args()
+
+    baseline_modules = set()
+    if args.top > 0:
+        _, stderr = run_target('pass', importtime=True)
+        baseline_modules = {
+            module
+            for _, module in slowest_imports(stderr, len(stderr))
+        }
+
+    print(f"{'target':<28}{'best s':>9}{'mean s':>9}"
+          f"{'mediapipe':>11}{'tensorflow':>12}")
+    for name, code in TARGETS:
+        try:
+            results = [run_target(code)[0] for _ in range(args.repeat)]
+        except subprocess.CalledProcessError as e:
+            message = e.stderr.strip().splitlines()
+            print(f"{name:<28}  failed: {message[-1] if message else ''}")
+            continue
+        seconds = [result['seconds'] for result in results]
+        print(f"{name:<28}{min(seconds):>9.3f}"
+              f"{sum(seconds) / len(seconds):>9.3f}"
+              f"{str(results[0]['mediapipe']):>11}"
+              f"{str(results[0]['tensorflow']):>12}")
+
+        if args.top > 0:
+            _, stderr = run_target(code, importtime=True)
+            for cumulative, module in slowest_imports(
+                    stderr, args.top, baseline_modules):
+                print(f"    {cumulative / 1e6:>8.3f}s  {module}")
+
+
+if __name__ == '__main__':
+    main()
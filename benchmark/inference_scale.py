@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Accuracy vs. latency of running MediaPipe Hands on downscaled frames.
+
+Every clip is replayed once per scale. The full-resolution run is the
+reference; for the other scales the landmark error (pixels, in display
+coordinates) and the agreement of the reported gesture ID are measured.
+
+Run from the repository root:
+    python -m benchmark.inference_scale clip1.mp4 clip2.mp4 \
+        --scales 1.0 0.75 0.5 0.33 --output scale.json
+"""
+import json
+import time
+import argparse
+
+import cv2 as cv
+import numpy as np
+import mediapipe as mp
+
+from app import GESTURE_ID_NONE
+from app import calc_rps
+from app import resize_for_inference
+from model import KeyPointClassifier
+from utils.landmark import landmarks_to_array
+from utils.landmark import calc_landmark_points
+from utils.landmark import pre_process_landmark_points
+
+
+def get_args():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("clips", nargs='+', help='recorded video files')
+    parser.add_argument("--scales",
+                        type=float,
+                        nargs='+',
+                        default=[1.0, 0.75, 0.5, 0.33])
+    parser.add_argument("--width", help='display width', type=int, default=960)
+    parser.add_argument("--height", help='display height', type=int, default=540)
+    parser.add_argument("--max_frames", type=int, default=300)
+    parser.add_argument("--max_num_hands", type=int, default=1)
+    parser.add_argument("--output", help='JSON output path', default=None)
+
+    args = parser.parse_args()
+
+    return args
+
+
+def load_clip(path, width, height, max_frames):
+    cap = cv.VideoCapture(path)
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if (frame.shape[1], frame.shape[0]) != (width, height):
+            frame = cv.resize(frame, (width, height))
+        frames.append(cv.flip(frame, 1))
+    cap.release()
+    return frames
+
+
+def run_scale(frames, scale, keypoint_classifier, max_num_hands):
+    hands = mp.solutions.hands.Hands(
+        static_image_mode=False,
+        max_num_hands=max_num_hands,
+        min_detection_confidence=0.7,
+        min_tracking_confidence=0.5,
+    )
+
+    latencies = []
+    landmarks = []
+    gesture_ids = []
+    for image in frames:
+        image_width, image_height = image.shape[1], image.shape[0]
+
+        start_time = time.perf_counter()
+        inference_image = resize_for_inference(
+            image, max(1, round(image_width * scale)),
+            max(1, round(image_height * scale)))
+        image_rgb = cv.cvtColor(inference_image, cv.COLOR_BGR2RGB)
+        image_rgb.flags.writeable = False
+        results = hands.process(image_rgb)
+        latencies.append((time.perf_counter() - start_time) * 1000.0)
+
+        if results.multi_hand_landmarks is None:
+            landmarks.append(None)
+            gesture_ids.append(GESTURE_ID_NONE)
+            continue
+
+        landmark_points = calc_landmark_points(
+            landmarks_to_array(results.multi_hand_landmarks[0]), image_width,
+            image_height)
+        hand_sign_id = keypoint_classifier(
+            pre_process_landmark_points(landmark_points))
+        rps_result = calc_rps(landmark_points.tolist())
+
+        landmarks.append(landmark_points)
+        gesture_ids.append(
+            int(rps_result if rps_result != GESTURE_ID_NONE else hand_sign_id))
+
+    hands.close()
+    return latencies, landmarks, gesture_ids
+
+
+def compare(reference, candidate):
+    _, reference_landmarks, reference_ids = reference
+    latencies, landmarks, gesture_ids = candidate
+
+    errors = [
+        np.linalg.norm(points - reference_points, axis=1).mean()
+        for points, reference_points in zip(landmarks, reference_landmarks)
+        if points is not None and reference_points is not None
+    ]
+    agreement = np.mean(
+        [a == b for a, b in zip(gesture_ids, reference_ids)]) if gesture_ids else 0.0
+
+    latencies = np.array(latencies)
+    return {
+        'frames': len(latencies),
+        'latency_mean_ms': round(float(latencies.mean()), 3),
+        'latency_p50_ms': round(float(np.percentile(latencies, 50)), 3),
+        'latency_p95_ms': round(float(np.percentile(latencies, 95)), 3),
+        'detection_rate': round(
+            float(np.mean([points is not None for points in landmarks])), 4),
+        'landmark_error_px': round(float(np.mean(errors)), 3) if errors else None,
+        'gesture_agreement': round(float(agreement), 4),
+    }
+
+
+def main():
+    args = get_args()
+
+    keypoint_classifier = KeyPointClassifier()
+    scales = sorted(set(args.scales) | {1.0}, reverse=True)
+
+    report = {'width': args.width, 'height': args.height, 'clips': {}}
+    for clip in args.clips:
+        frames = load_clip(clip, args.width, args.height, args.max_frames)
+        if not frames:
+            print(f"skip {clip}: no frames")
+            continue
+
+        reference = run_scale(frames, 1.0, keypoint_classifier,
+                              args.max_num_hands)
+        report['clips'][clip] = {}
+        for scale in scales:
+            candidate = reference if scale == 1.0 else run_scale(
+                frames, scale, keypoint_classifier, args.max_num_hands)
+            report['clips'][clip][str(scale)] = compare(reference, candidate)
+
+    # 表示 #####################################################################
+    print(f"{'clip':<32}{'scale':>6}{'mean ms':>9}{'p95 ms':>9}"
+          f"{'detect':>8}{'err px':>8}{'agree':>7}")
+    for clip, results in report['clips'].items():
+        for scale, result in results.items():
+            error = result['landmark_error_px']
+            print(f"{clip[-32:]:<32}{scale:>6}{result['latency_mean_ms']:>9.2f}"
+                  f"{result['latency_p95_ms']:>9.2f}"
+                  f"{result['detection_rate']:>8.2f}"
+                  f"{(error if error is not None else float('nan')):>8.2f}"
+                  f"{result['gesture_agreement']:>7.2f}")
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
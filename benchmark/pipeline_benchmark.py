@@ -0,0 +1,387 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Headless benchmark of the recognition pipeline.
+
+Replays synthetic landmark sequences (hand shapes taken from
+keypoint.csv with random placement and jitter) through every stage, and
+recorded clips (if given) through GestureRecognizer. Reports throughput,
+latency percentiles and memory per stage and saves them as JSON so two
+commits can be compared. The rule-based RPS classifier is also checked
+against the original per-hand implementation and any disagreement fails
+the run; the resolution-independent rules (RPS_RULES_SCALED) are only
+measured (agreement with the original, false OK rate on keypoint.csv):
+
+    python -m benchmark.pipeline_benchmark --output before.json
+    python -m benchmark.pipeline_benchmark --output after.json \
+        --compare before.json
+"""
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import subprocess
+import tracemalloc
+
+import numpy as np
+import cv2 as cv
+from mediapipe.framework.formats import landmark_pb2
+
+import app
+from model import KeyPointClassifier
+from model import PointHistoryClassifier
+from utils import StageProfiler
+from utils import PointHistoryBuffer
+from utils.landmark import landmarks_to_array
+from utils.landmark_renderer import draw_hand_landmarks
+
+
+def get_args():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("--clips",
+                        nargs='*',
+                        default=[],
+                        help='recorded clips replayed through GestureRecognizer')
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--num_hands", type=int, default=2)
+    parser.add_argument("--width", type=int, default=960)
+    parser.add_argument("--height", type=int, default=540)
+    parser.add_argument("--max_frames", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help='JSON output path', default=None)
+    parser.add_argument("--compare", help='previous JSON result', default=None)
+
+    args = parser.parse_args()
+
+    return args
+
+
+def synthetic_hands(count, image_width, image_height, seed=0):
+    """
+    :return: (count, 21, 3) normalized landmarks of real hand shapes
+    """
+    rng = np.random.default_rng(seed)
+    features = np.loadtxt('model/keypoint_classifier/keypoint.csv',
+                          delimiter=',',
+                          dtype=np.float32,
+                          usecols=list(range(1, 43)))
+    shapes = features[rng.integers(0, len(features), count)].reshape(
+        count, 21, 2)
+
+    size = rng.uniform(0.1, 0.25, (count, 1, 1)) * image_height
+    center = np.stack([
+        rng.uniform(0.3, 0.7, count) * image_width,
+        rng.uniform(0.4, 0.8, count) * image_height
+    ], axis=1)[:, np.newaxis, :]
+    points = shapes * size + center + rng.normal(0, 1.0, shapes.shape)
+
+    landmarks = np.zeros((count, 21, 3), dtype=np.float32)
+    landmarks[..., 0] = points[..., 0] / image_width
+    landmarks[..., 1] = points[..., 1] / image_height
+    landmarks[..., 2] = rng.normal(0, 0.02, (count, 21))
+    return landmarks
+
+
+def to_landmark_message(landmark_array):
+    message = landmark_pb2.NormalizedLandmarkList()
+    for x, y, z in landmark_array.tolist():
+        landmark = message.landmark.add()
+        landmark.x, landmark.y, landmark.z = x, y, z
+    return message
+
+
+class _Handedness(object):
+    class _Classification(object):
+        label = 'Right'
+
+    classification = [_Classification()]
+
+
+def reference_calc_rps(landmark_list):
+    """
+    The original per-hand calc_rps, kept as the reference for
+    app.RPS_RULE_ENGINE.
+    """
+    wrist = np.array(landmark_list[0])
+    tips = np.array([landmark_list[i] for i in (4, 8, 12, 16, 20)])
+    joints = np.array([landmark_list[i] for i in (2, 6, 10, 14, 18)])
+    _, index_open, middle_open, ring_open, pinky_open = (
+        np.linalg.norm(tips - wrist, axis=1) >
+        np.linalg.norm(joints - wrist, axis=1))
+
+    thumb_index_dist = np.linalg.norm(tips[0] - tips[1])
+    if thumb_index_dist < 40 and middle_open and ring_open and pinky_open:
+        return app.GESTURE_ID_OK
+
+    if index_open and middle_open and ring_open and pinky_open:
+        return app.GESTURE_ID_PAPER
+    elif index_open and middle_open and not ring_open and not pinky_open:
+        return app.GESTURE_ID_SCISSORS
+    elif not index_open and not middle_open and not ring_open \
+            and not pinky_open:
+        return app.GESTURE_ID_ROCK
+    else:
+        return app.GESTURE_ID_NONE
+
+
+def check_rps_parity(landmark_lists):
+    """
+    :return: List of (index, expected, actual) where app.calc_rps or the
+        batched RPS_RULE_ENGINE disagree with reference_calc_rps
+    """
+    batch = app.RPS_RULE_ENGINE.classify(np.array(landmark_lists)).tolist()
+    mismatches = []
+    for index, (landmark_list, batch_result) in enumerate(
+            zip(landmark_lists, batch)):
+        expected = reference_calc_rps(landmark_list)
+        actual = app.calc_rps(landmark_list)
+        if actual != expected or batch_result != expected:
+            mismatches.append((index, expected, actual))
+    return mismatches
+
+
+def rps_scaled_agreement(landmark_lists):
+    """
+    :return: Fraction of hands where RPS_RULE_ENGINE_SCALED agrees with
+        reference_calc_rps
+    """
+    scaled = app.RPS_RULE_ENGINE_SCALED.classify(np.array(landmark_lists))
+    expected = [reference_calc_rps(ll) for ll in landmark_lists]
+    return float(np.mean(scaled == np.array(expected)))
+
+
+def rps_false_ok_rates(hand_size=55.0):
+    """
+    keypoint.csv has no OK signs, so every OK is a false positive. The
+    normalized shapes are scaled to ``hand_size`` pixels (about the median
+    wrist to middle finger MCP length at 960x540) for the pixel rules.
+    :return: {'pixel': rate, 'scaled': rate}
+    """
+    features = np.loadtxt('model/keypoint_classifier/keypoint.csv',
+                          delimiter=',',
+                          dtype=np.float64,
+                          usecols=list(range(1, 43)))
+    shapes = features.reshape(-1, 21, 2)
+    shapes *= hand_size / np.linalg.norm(shapes[:, 9], axis=1)[:, np.newaxis,
+                                                               np.newaxis]
+    return {
+        name: round(float(np.mean(
+            engine.classify(shapes) == app.GESTURE_ID_OK)), 4)
+        for name, engine in app.RPS_RULE_ENGINES.items()
+    }
+
+
+def run_stage(profiler, name, function, inputs):
+    histogram = profiler.histogram(name)
+    start_time = time.perf_counter()
+    for item in inputs:
+        call_start = time.perf_counter()
+        function(item)
+        histogram.record((time.perf_counter() - call_start) * 1000.0)
+    return time.perf_counter() - start_time
+
+
+def measure_allocations(function, inputs):
+    """
+    :return: Peak traced Python allocation (KiB) over the inputs
+    """
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    for item in inputs:
+        function(item)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return round(peak / 1024.0, 2)
+
+
+def build_stages(args, landmarks):
+    width, height = args.width, args.height
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    messages = [to_landmark_message(hand) for hand in landmarks]
+    landmark_lists = [app.calc_landmark_list(image, m) for m in messages]
+    pre_processed = [app.pre_process_landmark(ll) for ll in landmark_lists]
+    brects = [app.calc_bounding_rect(image, m) for m in messages]
+
+    keypoint_classifier = KeyPointClassifier()
+    point_history_classifier = PointHistoryClassifier()
+
+    point_history = PointHistoryBuffer(maxlen=16)
+    for landmark_list in landmark_lists[:16]:
+        point_history.append(landmark_list[8])
+    point_history_features = point_history.pre_process(width, height).copy()
+
+    num_hands = max(1, args.num_hands)
+    batches = [
+        np.array(pre_processed[i:i + num_hands], dtype=np.float32)
+        for i in range(0, len(pre_processed) - num_hands + 1, num_hands)
+    ]
+    landmark_batches = [
+        np.array(landmark_lists[i:i + num_hands])
+        for i in range(0, len(landmark_lists) - num_hands + 1, num_hands)
+    ]
+    canvas = image.copy()
+    handedness = _Handedness()
+
+    def append_and_pre_process(landmark_list):
+        point_history.append(landmark_list[8])
+        point_history.pre_process(width, height)
+
+    # (名前, 関数, 入力) ######################################################
+    return [
+        ('landmarks_to_array', landmarks_to_array, messages),
+        ('calc_landmark_list', lambda m: app.calc_landmark_list(image, m),
+         messages),
+        ('calc_bounding_rect', lambda m: app.calc_bounding_rect(image, m),
+         messages),
+        ('pre_process_landmark', app.pre_process_landmark, landmark_lists),
+        ('pre_process_point_history', append_and_pre_process, landmark_lists),
+        ('calc_rps', app.calc_rps, landmark_lists),
+        ('rps_rules_batch', app.RPS_RULE_ENGINE.classify, landmark_batches),
+        ('rps_rules_scaled_batch', app.RPS_RULE_ENGINE_SCALED.classify,
+         landmark_batches),
+        ('keypoint_classifier', keypoint_classifier, pre_processed),
+        ('keypoint_classifier_batch',
+         keypoint_classifier.classify_batch, batches),
+        ('point_history_classifier', point_history_classifier,
+         [point_history_features] * len(landmark_lists)),
+        ('draw_bounding_rect',
+         lambda b: app.draw_bounding_rect(True, canvas, b), brects),
+        ('draw_landmarks', lambda ll: app.draw_landmarks(canvas, ll),
+         landmark_lists),
+        ('draw_landmarks_batch',
+         lambda points: draw_hand_landmarks(canvas, points), landmark_batches),
+        ('draw_info_text',
+         lambda b: app.draw_info_text(canvas, b, handedness, 'Open:Paper',
+                                      'Stop'), brects),
+        ('draw_point_history',
+         lambda _: app.draw_point_history(canvas, point_history),
+         landmark_lists),
+        ('draw_info', lambda _: app.draw_info(canvas, 30.0, 1, 3),
+         landmark_lists),
+    ]
+
+
+def run_recognizer(profiler, args):
+    from benchmark.inference_scale import load_clip
+
+    clips = [
+        load_clip(clip, args.width, args.height, args.max_frames)
+        for clip in args.clips
+    ]
+    frames = [frame for clip in clips for frame in clip]
+    if not frames:
+        return None
+    recognizer = app.GestureRecognizer(max_num_hands=args.num_hands)
+    return run_stage(profiler, 'gesture_recognizer',
+                     lambda frame: recognizer.get_gesture(frame, flip=False),
+                     frames)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL,
+                                       text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    args = get_args()
+
+    profiler = StageProfiler()
+    landmarks = synthetic_hands(args.iterations, args.width, args.height,
+                                args.seed)
+
+    image = np.zeros((args.height, args.width, 3), dtype=np.uint8)
+    landmark_lists = [
+        app.calc_landmark_list(image, to_landmark_message(hand))
+        for hand in landmarks
+    ]
+    rps_mismatches = check_rps_parity(landmark_lists)
+    scaled_agreement = rps_scaled_agreement(landmark_lists)
+    false_ok_rates = rps_false_ok_rates()
+
+    stages = build_stages(args, landmarks)
+    elapsed = {}
+    allocations = {}
+    for name, function, inputs in stages:
+        # ウォームアップ後に計測
+        for item in inputs[:10]:
+            function(item)
+        elapsed[name] = run_stage(profiler, name, function, inputs)
+        allocations[name] = measure_allocations(function, inputs[:100])
+
+    if args.clips:
+        recognizer_elapsed = run_recognizer(profiler, args)
+        if recognizer_elapsed is not None:
+            elapsed['gesture_recognizer'] = recognizer_elapsed
+
+    summary = profiler.summary()
+    for name, values in summary.items():
+        values['throughput_per_s'] = round(
+            values['count'] / max(elapsed[name], 1e-9), 1)
+        values['peak_alloc_kib'] = allocations.get(name)
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'opencv': cv.__version__,
+            'iterations': args.iterations,
+            'num_hands': args.num_hands,
+            'resolution': [args.width, args.height],
+            'clips': args.clips,
+            'rps_mismatches': len(rps_mismatches),
+            'rps_scaled_agreement': round(scaled_agreement, 4),
+            'rps_false_ok_rate': false_ok_rates,
+            'max_rss_mb': round(
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+                1),
+        },
+        'stages': summary,
+    }
+
+    # 表示 #####################################################################
+    baseline = None
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)['stages']
+
+    print(f"{'stage':<28}{'per s':>11}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'p99 ms':>9}{'KiB':>8}" + ("  p50 vs base" if baseline else ""))
+    for name, values in summary.items():
+        line = (f"{name:<28}{values['throughput_per_s']:>11.1f}"
+                f"{values['p50_ms']:>9.4f}{values['p95_ms']:>9.4f}"
+                f"{values['p99_ms']:>9.4f}{values['peak_alloc_kib']!s:>8}")
+        if baseline and name in baseline and baseline[name]['p50_ms'] > 0:
+            change = values['p50_ms'] / baseline[name]['p50_ms'] - 1.0
+            line += f"  {change:+.1%}"
+        print(line)
+    print(f"max RSS: {report['meta']['max_rss_mb']} MB", file=sys.stderr)
+    print(f"RPS_RULES_SCALED agreement with calc_rps: {scaled_agreement:.1%}"
+          f", false OK on keypoint.csv: pixel "
+          f"{false_ok_rates['pixel']:.1%} / scaled "
+          f"{false_ok_rates['scaled']:.1%}", file=sys.stderr)
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    # RPS判定が元の実装と一致しない場合は失敗とする
+    if rps_mismatches:
+        for index, expected, actual in rps_mismatches[:10]:
+            print(f"calc_rps mismatch (hand {index}): expected {expected}, "
+                  f"got {actual}", file=sys.stderr)
+        print(f"calc_rps: {len(rps_mismatches)} / {len(landmarks)} hands "
+              f"differ from the reference", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
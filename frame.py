@@ -1,13 +1,14 @@
 import tkinter as tk
 import random
 import time
-import os
 import threading
-import sys
+import queue
 from datetime import datetime
 import cv2  # OpenCV for camera
-from PIL import Image, ImageTk # PIL
-from app import GestureRecognizer  # Import gesture recognition logic
+from utils.pipeline import DropOldestQueue, FramePipeline
+from utils.preview_renderer import PreviewRenderer
+from utils.temporal_filter import HysteresisFilter
+# app (MediaPipe / 分类器) 在首次需要手势模式时才于预热线程中导入，按钮模式不加载
 
 class RockPaperScissorsGame:
     def __init__(self):
@@ -31,9 +32,12 @@ class RockPaperScissorsGame:
         self.game_active = True
         
         # 手势识别相关
-        self.external_input_enabled = True  # 是否启用外部文件输入
-        self.gesture_input_file = "gesture_input.txt"
-        self.current_gesture_id = None  # 当前手势ID
+        self.external_input_enabled = True  # 是否订阅外部手势事件 (gesture_runner.py --serve)
+        self.gesture_event_address = None  # None: 默认本地套接字
+        self.subscriber_stop = threading.Event()
+        self.current_gesture_id = None  # 当前手势ID (已去抖)
+        # 新手势需稳定保持 0.3 秒才被采用，倒计时结束时读取的结果不会闪烁
+        self.gesture_filter = HysteresisFilter(min_dwell=1, min_dwell_time=0.3)
         self.last_gesture_time = 0  # 最后检测到手势的时间
         self.gesture_checking = False  # 是否正在检测手势
         self.gesture_countdown_active = False  # 倒计时是否激活
@@ -63,36 +67,79 @@ class RockPaperScissorsGame:
         }
         
         self.setup_ui()
-        # self.start_gesture_monitor()  # 移除旧的线程监控，改为按需调用
         
         # Ensure camera is released on close
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        if self.external_input_enabled:
+            self.root.after_idle(self.start_gesture_subscriber)
         self.root.mainloop()
 
     def init_camera_components(self):
-        """Initialize camera and gesture recognizer"""
+        """Prepare camera/recognizer slots; they are loaded by start_warm_up"""
+        self.cap = None
+        self.recognizer = None
+        self.recognizer_ready = threading.Event()
+        self.camera_requested = threading.Event()  # 进入手势模式后才打开摄像头
+        self.warm_up_thread = None
+        self.camera_pipeline = None  # 后台 采集+识别 流水线
+        self.gesture_results = DropOldestQueue(maxsize=4)  # 工作线程 -> Tk
+        self.drain_scheduled = threading.Event()
+        self.latest_preview = None  # 最新预览帧 (BGR, 已缩放)
+        self.shown_preview = None
+        self.preview_renderer = None  # 复用同一个 PhotoImage
+        self.preview_size = (213, 160)  # 4:3, fits the 160px high label
+        self.preview_interval_ms = 33  # UI 刷新间隔 (~30fps)
+
+    def start_warm_up(self, event=None):
+        """Load the gesture recognizer on a background thread (first hover or gesture mode)"""
+        if self.warm_up_thread is not None:
+            return
+        self.warm_up_thread = threading.Thread(target=self.warm_up, daemon=True)
+        self.warm_up_thread.start()
+
+    def request_camera(self):
+        """Entering gesture mode: load the model if needed and open the camera"""
+        self.start_warm_up()
+        self.camera_requested.set()
+
+    def warm_up(self):
+        """Background thread: import MediaPipe/classifiers, then open the camera once requested"""
         try:
-            # 延迟初始化摄像头，或者在这里初始化但暂停读取
-            self.cap = cv2.VideoCapture(0)
-            
-            # Reduce resolution for smoother UI integration
-            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640) 
-            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-            
+            start_time = time.perf_counter()
             print("Loading Gesture Recognition Model...")
-            self.recognizer = GestureRecognizer()
-            print("Model Loaded.")
+            from app import GestureRecognizer  # Import gesture recognition logic
+            # 手势类别做概率平滑; 去抖只在本窗口的 gesture_filter 中按时间进行
+            recognizer = GestureRecognizer(smoothing_alpha=0.5, min_dwell=1)
+            recognizer.warm_up(640, 480)
+            self.recognizer = recognizer
+            print(f"Model Loaded. ({time.perf_counter() - start_time:.1f}s)")
+
+            # 仅悬停预加载时摄像头保持关闭，直到进入手势模式
+            self.camera_requested.wait()
+            cap = cv2.VideoCapture(0)
+
+            # Reduce resolution for smoother UI integration
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+
+            self.cap = cap
+            if cap.isOpened():
+                self.start_gesture_monitor()
         except Exception as e:
             print(f"Error initializing camera/model: {e}")
             self.cap = None
             self.recognizer = None
+        finally:
+            self.recognizer_ready.set()
 
     def on_closing(self):
         """Clean up resources when closing"""
         self.camera_active = False # Stop loop
+        self.subscriber_stop.set()
+        if self.camera_pipeline is not None:
+            self.camera_pipeline.stop()
         if hasattr(self, 'cap') and self.cap is not None:
             self.cap.release()
-        cv2.destroyAllWindows()
         self.root.destroy()
     
     def setup_ui(self):
@@ -332,6 +379,8 @@ class RockPaperScissorsGame:
             command=self.toggle_game_mode
         )
         self.mode_button.place(x=50, y=10, width=180, height=35)
+        # 鼠标悬停在切换按钮上时提前加载模型
+        self.mode_button.bind("<Enter>", self.start_warm_up)
         
         # 手势开始按钮（初始隐藏）
         self.gesture_start_button = tk.Button(
@@ -509,80 +558,125 @@ class RockPaperScissorsGame:
     
     def start_camera_preview(self):
         """Start camera loop"""
+        self.request_camera()
         self.camera_active = True
+        # Expand player_display to fill more space in Gesture Mode
+        self.player_display.place(x=25, y=5, width=300, height=160)
+        if self.preview_renderer is None:
+            self.preview_renderer = PreviewRenderer(self.player_display,
+                                                    *self.preview_size)
         self.update_camera_frame()
 
     def stop_camera_preview(self):
         """Stop camera loop"""
         self.camera_active = False
         # Clear image from label
-        self.player_display.config(image="")
+        if self.preview_renderer is not None:
+            self.preview_renderer.clear()
 
     def update_camera_frame(self):
-        """Update the video frame in Tkinter UI"""
+        """Blit the latest preview from the camera worker (no capture/inference here)"""
         if not self.camera_active or self.game_mode != "gesture":
             return
 
-        if hasattr(self, 'cap') and self.cap is not None and self.cap.isOpened():
-            ret, frame = self.cap.read()
-            if ret:
-                # 1. Flip frame for mirror effect
-                frame = cv2.flip(frame, 1)
-                
-                # 2. Resize to fit the label (300x100 is original text size, 
-                # but frame is larger (350x210). Let's maximize fit.
-                # Target size: 300x180 approx to keep aspect ratio
-                # Current frame: 640x480 (4:3)
-                
-                # Let's crop center to make it look better in the box or just resize
-                # Resize to 240x180 (4:3) fits in 300 height? 
-                # player_display height is 100 in text mode. Wait.
-                # In create_buttons logic:
-                # self.player_display.place(x=25, y=20, width=300, height=100)
-                # The parent player_battle_frame is height 210.
-                # We should expand player_display to fill more space in Gesture Mode.
-                
-                # Dynamic resizing of label:
-                self.player_display.place(x=25, y=5, width=300, height=160) # Increase height
-                
-                target_w, target_h = 213, 160 # 4:3 ratio fitting height 160
-                
-                # Resize frame
-                frame_resized = cv2.resize(frame, (target_w, target_h))
-                
-                # 3. Detect Gesture (Optional: Only detect if checking or always?)
-                # If we detect always, user can see "Detected: Rock" before clicking Start.
-                # That is a good UX.
-                # But get_gesture expects raw frame?
-                # app.py's get_gesture does `if flip: image = cv.flip(image, 1)`.
-                # We already flipped it. So we pass `frame` (flipped) and `flip=False`.
-                
-                try:
-                    gesture_id = self.recognizer.get_gesture(frame, flip=False) # Pass already flipped frame
-                    
-                    if gesture_id in [4, 5, 6, -1]:
-                        self.current_gesture_id = gesture_id
-                        
-                        # Show recognized gesture on frame
-                        if gesture_id != -1:
-                            g_name = self.gesture_id_map.get(gesture_id, "")
-                            if g_name and g_name in self.gestures:
-                                info = self.gestures[g_name]
-                                cv2.putText(frame_resized, info["name"], (10, 30), 
-                                          cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-                except Exception as e:
-                    print(f"Recognition error: {e}")
-
-                # 4. Convert to Tkinter Image
-                cv2image = cv2.cvtColor(frame_resized, cv2.COLOR_BGR2RGB)
-                img = Image.fromarray(cv2image)
-                imgtk = ImageTk.PhotoImage(image=img)
-                
-                self.player_display.imgtk = imgtk # Keep reference
-                self.player_display.configure(image=imgtk)
-            
-        # Schedule next update
-        self.root.after(30, self.update_camera_frame) # ~30fps
+        if not self.recognizer_ready.is_set():
+            # 预热期间不阻塞界面，稍后重试
+            self.player_display.config(text="⏳", fg="gray", image="")
+            self.player_name_label.config(text="正在加载手势模型...", fg="gray")
+            self.root.after(100, self.update_camera_frame)
+            return
+        if self.player_name_label.cget("text") == "正在加载手势模型...":
+            self.player_name_label.config(text="等待手势...", fg="gray")
+
+        # 只显示最新的预览帧 (手势结果由 drain_gesture_results 处理)
+        preview = self.latest_preview
+        if preview is not None and preview is not self.shown_preview:
+            self.shown_preview = preview
+            # 写入同一个 PhotoImage (窗口不可见时跳过)
+            self.preview_renderer.render(preview)
+
+        # 固定间隔刷新，与推理耗时无关
+        self.root.after(self.preview_interval_ms, self.update_camera_frame)
+
+    def start_gesture_monitor(self):
+        """启动手势监控: 后台流水线是摄像头与识别器的唯一使用者"""
+        self.camera_pipeline = FramePipeline(self.cap.read,
+                                             self.process_preview_frame,
+                                             queue_size=1,
+                                             drop_frames=True)
+        self.camera_pipeline.start()
+        thread = threading.Thread(target=self.monitor_gesture, daemon=True)
+        thread.start()
+
+    def monitor_gesture(self):
+        """Worker thread: hand results over to Tk (blocks on the camera, never spins)"""
+        try:
+            for _, result in self.camera_pipeline:
+                if result is None:
+                    continue
+                gesture_id, preview = result
+                self.latest_preview = preview  # 单槽: 只保留最新预览
+                self.gesture_results.put(gesture_id)  # 满时丢弃最旧的结果
+                if not self.drain_scheduled.is_set():
+                    self.drain_scheduled.set()
+                    self.root.after_idle(self.drain_gesture_results)
+        except (RuntimeError, tk.TclError):
+            pass  # 窗口已关闭
+        except Exception as e:
+            print(f"Camera worker error: {e}")
+
+    def drain_gesture_results(self):
+        """Tk thread: apply every queued camera result"""
+        self.drain_scheduled.clear()
+        while True:
+            try:
+                gesture_id = self.gesture_results.get_nowait()
+            except queue.Empty:
+                break
+            self.apply_camera_gesture(gesture_id)
+
+    def apply_camera_gesture(self, gesture_id):
+        """应用摄像头识别结果 (只在 Tk 线程中调用)"""
+        # Only accept valid game gestures: 4 (Paper), 5 (Rock), 6 (Scissors), -1 (None)
+        if gesture_id not in [4, 5, 6, -1]:
+            return
+        previous_id = self.current_gesture_id
+        gesture_id = self.record_gesture(gesture_id)
+        self.last_gesture_time = time.time()
+
+        # 倒计时中稳定手势变化时更新提示
+        if self.gesture_checking and self.gesture_countdown_active and gesture_id != previous_id:
+            gesture_name = self.gesture_id_map.get(gesture_id)
+            if gesture_name:
+                gesture_info = self.gestures[gesture_name]
+                self.player_name_label.config(
+                    text=f"检测到: {gesture_info['name']}",
+                    fg=gesture_info["color"]
+                )
+
+    def process_preview_frame(self, frame):
+        """Worker thread: recognize and build the preview image (never touches Tk)"""
+        if not self.camera_active:
+            return None  # 不在预览时只读取帧，保持摄像头缓冲区最新
+
+        # 1. Flip frame for mirror effect
+        frame = cv2.flip(frame, 1)
+
+        # 2. Detect gesture on the already flipped frame
+        try:
+            gesture_id = self.recognizer.get_gesture(frame, flip=False)
+        except Exception as e:
+            print(f"Recognition error: {e}")
+            gesture_id = None
+
+        # 3. Resize to fit the label (640x480 -> 213x160, 4:3), cheapest interpolation
+        preview = cv2.resize(frame, self.preview_size,
+                             interpolation=cv2.INTER_NEAREST)
+        g_name = self.gesture_id_map.get(gesture_id)
+        if g_name:
+            cv2.putText(preview, self.gestures[g_name]["name"], (10, 30),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+        return gesture_id, preview
 
     def start_gesture_countdown(self):
         """开始手势模式倒计时"""
@@ -634,8 +728,9 @@ class RockPaperScissorsGame:
         if not self.gesture_checking:
             return
         
-        # 获取当前手势
-        gesture_id = self.current_gesture_id
+        # 获取当前手势 (稳定后的结果; 外部事件只在变化时推送，这里按时间确认)
+        gesture_id = self.gesture_filter.current(time.monotonic())
+        self.current_gesture_id = gesture_id
         gesture_name = self.gesture_id_map.get(gesture_id)
         
         if gesture_name:
@@ -708,102 +803,53 @@ class RockPaperScissorsGame:
             if not self.gesture_checking:
                 self.result_label.config(text="点击开始按钮进行手势猜拳", fg="#9D4EDD")
     
-    def start_gesture_monitor(self):
-        """启动手势监控线程"""
-        def monitor_gesture():
-            while True:
-                if self.game_mode == "gesture":
-                    # Priority: Camera > File
-                    if hasattr(self, 'cap') and self.cap is not None and self.cap.isOpened():
-                         self.process_camera_gesture()
-                    elif self.external_input_enabled:
-                         self.read_gesture_from_file()
-                else:
-                    # If not in gesture mode, still read frame to keep buffer clear or close preview
-                    # For now just sleep
-                    pass
-                
-                time.sleep(0.05)  
-        
-        thread = threading.Thread(target=monitor_gesture, daemon=True)
+    def record_gesture(self, gesture_id):
+        """记录一次识别结果，返回去抖后的稳定手势ID"""
+        self.current_gesture_id = self.gesture_filter.update(
+            gesture_id, timestamp=time.monotonic())
+        return self.current_gesture_id
+
+    def start_gesture_subscriber(self):
+        """启动外部手势事件订阅线程"""
+        thread = threading.Thread(target=self.subscribe_gesture_events, daemon=True)
         thread.start()
 
-    def process_camera_gesture(self):
-        """Read from camera and recognize gesture"""
-        try:
-            ret, frame = self.cap.read()
-            if not ret:
-                return
+    def subscribe_gesture_events(self):
+        """订阅 gesture_runner.py --serve 推送的手势变化事件 (替代轮询 gesture_input.txt)"""
+        from utils.gesture_events import iter_gesture_events
 
-            # Display preview window (optional but good for UX)
-            display_frame = cv2.flip(frame, 1)
-            
-            # Recognize
-            gesture_id = self.recognizer.get_gesture(frame, flip=True)
-            
-            # --- Update Logic copied from read_gesture_from_file ---
-            # Only accept valid game gestures: 4 (Paper), 5 (Rock), 6 (Scissors), -1 (None)
-            # Actually app.py defines 0-6. But game only cares about 4,5,6.
-            # We can also map others if we want, but let's stick to strict rules first over
-            
-            if gesture_id in [4, 5, 6, -1]:
-                 self.current_gesture_id = gesture_id
-                 self.last_gesture_time = time.time() # This variable doesn't seem to be used logic-wise but good to update
-                 
-                 # Draw ID on preview
-                 gesture_name = self.gesture_id_map.get(gesture_id, "")
-                 if gesture_name:
-                     text = f"{self.gestures[gesture_name]['name']} ({self.gestures[gesture_name]['emoji']})"
-                     cv2.putText(display_frame, text, (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-                 
-                 # --- Safely update UI if checking ---
-                 # Note: Updating Tkinter from thread is risky, but this codebase does it.
-                 # Ideally use self.root.after_idle or specific queue.
-                 if self.gesture_checking and self.gesture_countdown_active:
-                     if gesture_name:
-                         # Use after_idle to be thread-safe(r)
-                         gesture_info = self.gestures[gesture_name]
-                         def update_label():
-                             self.player_name_label.config(
-                                text=f"检测到: {gesture_info['name']}",
-                                fg=gesture_info["color"]
-                             )
-                         self.root.after_idle(update_label)
-
-            cv2.imshow("Gesture Preview", display_frame)
-            cv2.waitKey(1)
+        while not self.subscriber_stop.is_set():
+            try:
+                for event in iter_gesture_events(self.gesture_event_address,
+                                                 timeout=0.5,
+                                                 stop_event=self.subscriber_stop):
+                    if event.get('type') == 'gesture':
+                        self.root.after_idle(self.apply_external_gesture, event['id'])
+            except (RuntimeError, tk.TclError):
+                return  # 窗口已关闭
+            except (OSError, ValueError):
+                pass  # 服务器未启动
+            self.subscriber_stop.wait(1.0)  # 断开后每秒重连
 
-        except Exception as e:
-            print(f"Camera process error: {e}")
+    def apply_external_gesture(self, gesture_id):
+        """应用外部推送的手势 (本地摄像头可用时以摄像头为准)"""
+        if self.camera_pipeline is not None:
+            return
+        # 只接受有效的手势ID
+        if gesture_id in [4, 5, 6, -1]:
+            gesture_id = self.record_gesture(gesture_id)
+            self.last_gesture_time = time.time()
+
+            # 如果在检测手势中，更新显示
+            if self.gesture_checking and self.gesture_countdown_active:
+                gesture_name = self.gesture_id_map.get(gesture_id)
+                if gesture_name:
+                    gesture_info = self.gestures[gesture_name]
+                    self.player_name_label.config(
+                        text=f"检测到: {gesture_info['name']}",
+                        fg=gesture_info["color"]
+                    )
 
-    def read_gesture_from_file(self):
-        """从文件读取手势"""
-        try:
-            if os.path.exists(self.gesture_input_file):
-                with open(self.gesture_input_file, 'r') as f:
-                    content = f.read().strip()
-                    if content:
-                        try:
-                            gesture_id = int(content)
-                            # 只接受有效的手势ID
-                            if gesture_id in [4, 5, 6, -1]:
-                                self.current_gesture_id = gesture_id
-                                self.last_gesture_time = time.time()
-                                
-                                # 如果在检测手势中，更新显示
-                                if self.gesture_checking and self.gesture_countdown_active:
-                                    gesture_name = self.gesture_id_map.get(gesture_id)
-                                    if gesture_name:
-                                        gesture_info = self.gestures[gesture_name]
-                                        self.player_name_label.config(
-                                            text=f"检测到: {gesture_info['name']}",
-                                            fg=gesture_info["color"]
-                                        )
-                        except ValueError:
-                            pass
-        except Exception as e:
-            print(f"读取手势文件错误: {e}")
-    
     def immediate_play(self, gesture):
         """按钮模式：立即出拳"""
         if not self.game_active or self.game_mode != "button":
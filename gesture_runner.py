@@ -3,20 +3,81 @@
 import cv2 as cv
 import sys
 import os
+import queue
+import argparse
 
 # 导入 app.py 中的 GestureRecognizer 类
 # 确保当前目录在 PYTHON PATH 中
 sys.path.append(os.getcwd())
 try:
     from app import GestureRecognizer
+    from app import GESTURE_LABELS
+    from utils import AdaptiveScheduler
+    from utils.gesture_events import GestureEventServer
+    from utils.gesture_events import GestureChangeDetector
 except ImportError as e:
     print(f"无法导入 app.py. 请确保此脚本与 app.py 在同一目录下。\n错误信息: {e}")
     sys.exit(1)
 
+def get_args():
+    parser = argparse.ArgumentParser()
+
+    # 如果有多个摄像头，尝试更改索引 0, 1...
+    parser.add_argument("--device", type=int, default=0)
+
+    # 自适应推理调度：手静止时跳过 MediaPipe，复用上一次结果
+    parser.add_argument('--adaptive', action='store_true')
+    parser.add_argument("--max_interval",
+                        help='max frames between two detections',
+                        type=int,
+                        default=5)
+    parser.add_argument("--motion_threshold",
+                        help='mean abs frame difference treated as motion',
+                        type=float,
+                        default=6.0)
+    parser.add_argument("--target_fps",
+                        help='max detections per second',
+                        type=float,
+                        default=None)
+    parser.add_argument("--cpu_budget",
+                        help='fraction of time detection may use (0-1]',
+                        type=float,
+                        default=None)
+
+    # 手势需连续保持多少帧才切换 (抑制闪烁，默认 1: 不去抖)
+    parser.add_argument("--min_dwell",
+                        help='frames a new gesture must persist',
+                        type=int,
+                        default=1)
+
+    # RPS 判定规则: pixel (40px 阈值) 或 scaled (以手的大小为单位，与分辨率无关)
+    parser.add_argument("--rps_rules",
+                        choices=['pixel', 'scaled'],
+                        default='pixel')
+
+    # 手势变化事件推送 (订阅者无需轮询文件)
+    parser.add_argument("--serve",
+                        nargs='*',
+                        default=None,
+                        metavar='ADDRESS',
+                        help='publish gesture change events as JSON lines '
+                        '(unix:/path.sock, tcp://host:port, ws://host:port; '
+                        'no value: default local socket)')
+    parser.add_argument("--client_queue_size",
+                        help='events buffered per subscriber',
+                        type=int,
+                        default=64)
+
+    args = parser.parse_args()
+
+    return args
+
+
 def main():
+    args = get_args()
+
     # 1. 初始化摄像头
-    # 如果有多个摄像头，尝试更改索引 0, 1...
-    cap_device = 0
+    cap_device = args.device
     cap = cv.VideoCapture(cap_device)
     
     if not cap.isOpened():
@@ -30,11 +91,35 @@ def main():
     # 2. 初始化手势识别器
     print("正在初始化手势识别模型...")
     try:
-        recognizer = GestureRecognizer()
+        scheduler = None
+        if args.adaptive:
+            scheduler = AdaptiveScheduler(
+                max_interval=args.max_interval,
+                motion_threshold=args.motion_threshold,
+                target_fps=args.target_fps,
+                cpu_budget=args.cpu_budget,
+            )
+        recognizer = GestureRecognizer(scheduler=scheduler,
+                                       min_dwell=args.min_dwell,
+                                       rps_rules=args.rps_rules)
     except Exception as e:
         print(f"模型初始化失败: {e}")
         return
         
+    # 事件服务器 (可选)
+    server = None
+    detector = None
+    if args.serve is not None:
+        try:
+            server = GestureEventServer(args.serve or None,
+                                        client_queue_size=args.client_queue_size)
+            server.start()
+        except Exception as e:
+            print(f"事件服务器启动失败: {e}")
+            return
+        detector = GestureChangeDetector(GESTURE_LABELS)
+        print(f"手势事件发布于: {', '.join(server.addresses)}")
+
     print("初始化完成。按 'ESC' 键退出程序。")
 
     # 手势ID名称映射 (参考 app.py 的定义)
@@ -49,17 +134,34 @@ def main():
         -1: "None (未识别)"
     }
 
+    # 3. 启动 采集线程 -> 推理线程 的流水线，主线程只负责打印与显示
+    pipeline = recognizer.create_pipeline(cap.read, flip=True,
+                                          method='recognize')
+    pipeline.start()
+
     try:
         while True:
-            # 3. 读取帧
-            ret, frame = cap.read()
-            if not ret:
+            # 4. 获取最新一帧及其手势ID
+            # flip=True 表示会对图像进行镜像翻转，符合一般摄像头自拍习惯
+            try:
+                item = pipeline.get(timeout=0.1)
+            except queue.Empty:
+                # 摄像头卡顿时仍处理按键，窗口不冻结 (工作线程退出则结束)
+                if not pipeline.running:
+                    print("\n无法读取视频帧")
+                    break
+                if cv.waitKey(1) == 27:
+                    break
+                continue
+            if item is None:
                 print("\n无法读取视频帧")
                 break
+            frame, hands = item
+            gesture_id = hands[0].gesture_id if hands else -1
 
-            # 4. 获取手势ID
-            # flip=True 表示会对图像进行镜像翻转，符合一般摄像头自拍习惯
-            gesture_id = recognizer.get_gesture(frame, flip=True)
+            # 仅在手势变化时推送事件
+            if server is not None:
+                server.publish_many(detector.update(hands))
 
             # 5. 打印到命令行
             # 使用 \r 和 end='' 来在同一行刷新输出，避免大量刷屏
@@ -77,7 +179,7 @@ def main():
             cv.imshow('Gesture ID Runner', display_image)
 
             # 按 ESC 退出
-            key = cv.waitKey(10)
+            key = cv.waitKey(1)
             if key == 27:
                 break
 
@@ -85,6 +187,9 @@ def main():
         pass
     finally:
         print("\n\n程序已退出。")
+        pipeline.stop()
+        if server is not None:
+            server.stop()
         cap.release()
         cv.destroyAllWindows()
 
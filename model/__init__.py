@@ -1,2 +1,24 @@
-from model.keypoint_classifier.keypoint_classifier import KeyPointClassifier
-from model.point_history_classifier.point_history_classifier import PointHistoryClassifier
\ No newline at end of file
+# 分類器は初回参照時に import する (PEP 562)
+_LAZY_IMPORTS = {
+    'KeyPointClassifier':
+    'model.keypoint_classifier.keypoint_classifier',
+    'PointHistoryClassifier':
+    'model.point_history_classifier.point_history_classifier',
+}
+
+__all__ = list(_LAZY_IMPORTS)
+
+
+def __getattr__(name):
+    module_name = _LAZY_IMPORTS.get(name)
+    if module_name is None:
+        raise AttributeError("module 'model' has no attribute %r" % name)
+    import importlib
+
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -1,7 +1,9 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 import numpy as np
-import tensorflow as tf
+
+from model.mlp_backend import create_backend
+from model.mlp_backend import make_classification
 
 
 class KeyPointClassifier(object):
@@ -9,28 +11,58 @@ class KeyPointClassifier(object):
         self,
         model_path='model/keypoint_classifier/keypoint_classifier.tflite',
         num_threads=1,
+        backend='tflite',
+        weights_path=None,
     ):
-        self.interpreter = tf.lite.Interpreter(model_path=model_path,
-                                               num_threads=num_threads)
-
-        self.interpreter.allocate_tensors()
-        self.input_details = self.interpreter.get_input_details()
-        self.output_details = self.interpreter.get_output_details()
+        """
+        :param num_threads: Interpreter threads (tflite) or intra-op
+            threads (onnx)
+        :param backend: 'tflite' (tf.lite.Interpreter), 'numpy' (plain
+            matmuls, no TensorFlow) or 'onnx' (ONNX Runtime); the numpy and
+            onnx weights are exported from the .tflite
+        :param weights_path: .npz/.onnx/.tflite/.hdf5 weights for the numpy
+            or onnx backend (.hdf5 is the Keras checkpoint as saved and
+            may not match the .tflite)
+        """
+        self.backend = backend
+        self.model = create_backend(backend,
+                                    model_path,
+                                    num_threads=num_threads,
+                                    weights_path=weights_path)
 
     def __call__(
         self,
         landmark_list,
+        return_probs=False,
+        top_k=None,
     ):
-        input_details_tensor_index = self.input_details[0]['index']
-        self.interpreter.set_tensor(
-            input_details_tensor_index,
+        """
+        :param return_probs: Return a Classification (index, probs, top_k)
+            instead of the bare class index
+        :param top_k: Also fill Classification.top_k with the k best
+            (class, probability) pairs (implies return_probs)
+        """
+        result_index, result = self.classify_batch(
             np.array([landmark_list], dtype=np.float32))
-        self.interpreter.invoke()
 
-        output_details_tensor_index = self.output_details[0]['index']
+        if return_probs or top_k is not None:
+            return make_classification(int(result_index[0]), result[0], top_k)
+        return result_index[0]
+
+    def classify_batch(self, landmark_array):
+        """
+        Classify several hands (or CSV rows) with a single invoke.
+        :param landmark_array: (N, 42) float32 array of pre-processed landmarks
+        :return: (N,) class indices and (N, num_classes) probabilities
+        """
+        landmark_array = np.asarray(landmark_array, dtype=np.float32)
+        if landmark_array.ndim == 1:
+            landmark_array = landmark_array[np.newaxis, :]
 
-        result = self.interpreter.get_tensor(output_details_tensor_index)
+        if landmark_array.shape[0] == 0:
+            return (np.empty((0, ), dtype=np.int64),
+                    np.empty((0, self.model.num_classes), dtype=np.float32))
 
-        result_index = np.argmax(np.squeeze(result))
+        result = self.model(landmark_array)
 
-        return result_index
+        return np.argmax(result, axis=1), result
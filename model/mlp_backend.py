@@ -0,0 +1,326 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+from collections import namedtuple
+
+import numpy as np
+
+BACKENDS = ('tflite', 'numpy', 'onnx')
+
+# 分類結果 (index: クラス, probs: 確率ベクトル, top_k: ((クラス, 確率), ...))
+Classification = namedtuple('Classification', ['index', 'probs', 'top_k'])
+
+
+def top_k(probabilities, k):
+    """
+    :param probabilities: (num_classes, ) or (N, num_classes)
+    :return: (indices, scores) of the k most likely classes, best first
+    """
+    probabilities = np.asarray(probabilities)
+    k = min(k, probabilities.shape[-1])
+    indices = np.argsort(-probabilities, axis=-1, kind='stable')[..., :k]
+    return indices, np.take_along_axis(probabilities, indices, axis=-1)
+
+
+def make_classification(index, probabilities, k=None):
+    """
+    Classification for one row; top_k is None unless k is given.
+    """
+    top = None
+    if k is not None:
+        indices, scores = top_k(probabilities, k)
+        top = tuple(zip(indices.tolist(), scores.tolist()))
+    return Classification(index, probabilities, top)
+
+
+class TFLiteBackend(object):
+    """
+    Runs a .tflite model with tf.lite.Interpreter. TensorFlow is only
+    imported here, so the numpy/onnx backends never load it.
+    """
+
+    def __init__(self, model_path, num_threads=1):
+        import tensorflow as tf
+
+        self.interpreter = tf.lite.Interpreter(model_path=model_path,
+                                               num_threads=num_threads)
+
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()
+        self.output_details = self.interpreter.get_output_details()
+        self._batch_size = self.input_details[0]['shape'][0]
+        self.num_classes = int(self.output_details[0]['shape'][-1])
+
+    def __call__(self, input_array):
+        """
+        :param input_array: (N, num_features) float32 array, N > 0
+        :return: (N, num_classes) probabilities
+        """
+        input_details_tensor_index = self.input_details[0]['index']
+        batch_size = input_array.shape[0]
+
+        # 入力サイズはバッチサイズが変わった時だけ再確保する
+        if batch_size != self._batch_size:
+            self.interpreter.resize_tensor_input(
+                input_details_tensor_index,
+                [batch_size, input_array.shape[1]])
+            self.interpreter.allocate_tensors()
+            self._batch_size = batch_size
+
+        self.interpreter.set_tensor(input_details_tensor_index,
+                                   np.ascontiguousarray(input_array))
+        self.interpreter.invoke()
+
+        output_details_tensor_index = self.output_details[0]['index']
+
+        return self.interpreter.get_tensor(output_details_tensor_index)
+
+
+class NumpyMLP(object):
+    """
+    Forward pass of a Dense-ReLU-...-Dense-softmax network as plain
+    matmuls. Dropout layers are identity at inference time.
+
+    :param weights: [(kernel (in, out), bias (out,)), ...] in layer order
+    """
+
+    def __init__(self, weights):
+        self.weights = [(np.ascontiguousarray(kernel, dtype=np.float32),
+                         np.ascontiguousarray(bias, dtype=np.float32))
+                        for kernel, bias in weights]
+        self.num_classes = int(self.weights[-1][1].shape[0])
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Load weights from .npz (exported), .tflite or .hdf5 (Keras).
+
+        A .hdf5 file is read as the Keras checkpoint it is, which is not
+        necessarily the model the .tflite was converted from (the
+        checked-in point_history_classifier.hdf5 is not); only .npz/.onnx
+        exported from the .tflite are guaranteed to match it, see
+        benchmark/backend_parity.py.
+        """
+        extension = os.path.splitext(path)[1].lower()
+        if extension == '.npz':
+            return cls(load_npz_weights(path))
+        if extension == '.tflite':
+            return cls(load_tflite_weights(path))
+        if extension in ('.hdf5', '.h5'):
+            return cls(load_hdf5_weights(path))
+        raise ValueError('unsupported weight file: ' + path)
+
+    def save(self, path):
+        arrays = {}
+        for index, (kernel, bias) in enumerate(self.weights):
+            arrays['kernel_%d' % index] = kernel
+            arrays['bias_%d' % index] = bias
+        np.savez(path, **arrays)
+
+    def __call__(self, input_array):
+        """
+        :param input_array: (N, num_features) float32 array
+        :return: (N, num_classes) probabilities
+        """
+        hidden = input_array
+        last_index = len(self.weights) - 1
+        for index, (kernel, bias) in enumerate(self.weights):
+            hidden = hidden @ kernel
+            hidden += bias
+            if index < last_index:
+                np.maximum(hidden, 0.0, out=hidden)
+
+        # softmax
+        hidden -= hidden.max(axis=1, keepdims=True)
+        np.exp(hidden, out=hidden)
+        hidden /= hidden.sum(axis=1, keepdims=True)
+        return hidden
+
+
+class OnnxBackend(object):
+    """
+    Runs the MLP with ONNX Runtime. A .onnx file is used as is; any other
+    weight file (.npz/.tflite/.hdf5) is converted in memory first, which
+    needs the onnx package.
+
+    :param num_threads: intra_op_num_threads of the session
+    """
+
+    def __init__(self, model_path, num_threads=1):
+        import onnxruntime as ort
+
+        if os.path.splitext(model_path)[1].lower() == '.onnx':
+            model = model_path
+        else:
+            model = export_onnx(NumpyMLP.from_file(model_path).weights)
+            model = model.SerializeToString()
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        self.session = ort.InferenceSession(
+            model, sess_options=options, providers=['CPUExecutionProvider'])
+        self._input_name = self.session.get_inputs()[0].name
+        self._output_names = [self.session.get_outputs()[0].name]
+        self.num_classes = int(self.session.get_outputs()[0].shape[-1])
+
+    def __call__(self, input_array):
+        """
+        :param input_array: (N, num_features) float32 array
+        :return: (N, num_classes) probabilities
+        """
+        return self.session.run(
+            self._output_names,
+            {self._input_name: np.ascontiguousarray(input_array)})[0]
+
+
+def export_onnx(weights, path=None, opset=13):
+    """
+    Build an ONNX graph (MatMul/Add/Relu, Softmax) with a dynamic batch
+    dimension from [(kernel, bias), ...].
+    :param path: Also save the model there when given
+    :return: onnx.ModelProto
+    """
+    import onnx
+    from onnx import helper
+    from onnx import numpy_helper
+    from onnx import TensorProto
+
+    nodes = []
+    initializers = []
+    hidden = 'input'
+    last_index = len(weights) - 1
+    for index, (kernel, bias) in enumerate(weights):
+        kernel_name, bias_name = 'kernel_%d' % index, 'bias_%d' % index
+        initializers.append(
+            numpy_helper.from_array(np.asarray(kernel, dtype=np.float32),
+                                    kernel_name))
+        initializers.append(
+            numpy_helper.from_array(np.asarray(bias, dtype=np.float32),
+                                    bias_name))
+        nodes.append(
+            helper.make_node('MatMul', [hidden, kernel_name],
+                             ['matmul_%d' % index]))
+        nodes.append(
+            helper.make_node('Add', ['matmul_%d' % index, bias_name],
+                             ['dense_%d' % index]))
+        hidden = 'dense_%d' % index
+        if index < last_index:
+            nodes.append(
+                helper.make_node('Relu', [hidden], ['relu_%d' % index]))
+            hidden = 'relu_%d' % index
+    nodes.append(helper.make_node('Softmax', [hidden], ['output'], axis=-1))
+
+    num_features = int(np.shape(weights[0][0])[0])
+    num_classes = int(np.shape(weights[-1][1])[0])
+    graph = helper.make_graph(
+        nodes,
+        'mlp',
+        [
+            helper.make_tensor_value_info('input', TensorProto.FLOAT,
+                                          ['batch', num_features])
+        ],
+        [
+            helper.make_tensor_value_info('output', TensorProto.FLOAT,
+                                          ['batch', num_classes])
+        ],
+        initializer=initializers,
+    )
+    model = helper.make_model(graph,
+                              opset_imports=[helper.make_opsetid('', opset)])
+    model.ir_version = min(model.ir_version, 8)
+    onnx.checker.check_model(model)
+    if path is not None:
+        onnx.save(model, path)
+    return model
+
+
+def load_npz_weights(path):
+    with np.load(path) as data:
+        num_layers = len([key for key in data.files if key.startswith('bias_')])
+        return [(data['kernel_%d' % index], data['bias_%d' % index])
+                for index in range(num_layers)]
+
+
+def load_hdf5_weights(path):
+    """
+    Read Dense kernels/biases from a Keras .hdf5 model (needs h5py), as
+    saved; may differ from the .tflite model of the same name.
+    """
+    import h5py
+
+    weights = []
+    with h5py.File(path, 'r') as f:
+        model_weights = f['model_weights']
+        layer_names = [
+            name.decode('utf8') if isinstance(name, bytes) else name
+            for name in model_weights.attrs['layer_names']
+        ]
+        for layer_name in layer_names:
+            group = model_weights[layer_name]
+            if layer_name not in group:
+                # Dropout 等の重みを持たない層
+                continue
+            layer = group[layer_name]
+            if 'kernel:0' in layer:
+                weights.append((layer['kernel:0'][()], layer['bias:0'][()]))
+    return weights
+
+
+def load_tflite_weights(path):
+    """
+    Read the constant tensors of a float .tflite MLP (needs TensorFlow).
+    FullyConnected stores kernels as (out, in), so they are transposed.
+    """
+    import tensorflow as tf
+
+    interpreter = tf.lite.Interpreter(model_path=path)
+    interpreter.allocate_tensors()
+
+    kernels = {}
+    biases = {}
+    for detail in interpreter.get_tensor_details():
+        name = detail['name']
+        layer_name = name.split('/')[1] if '/' in name else None
+        if layer_name is None:
+            continue
+        if name.endswith('/MatMul') and len(detail['shape']) == 2:
+            kernels[layer_name] = interpreter.get_tensor(detail['index']).T
+        elif 'ReadVariableOp' in name and len(detail['shape']) == 1:
+            biases[layer_name] = interpreter.get_tensor(detail['index'])
+
+    def layer_order(layer_name):
+        # dense, dense_1, dense_2, ...
+        suffix = layer_name.rsplit('_', 1)[-1]
+        return int(suffix) if suffix.isdigit() else 0
+
+    return [(kernels[name], biases[name])
+            for name in sorted(kernels, key=layer_order)]
+
+
+def _sibling(model_path, extension):
+    path = os.path.splitext(model_path)[0] + extension
+    return path if os.path.exists(path) else model_path
+
+
+def create_backend(backend, model_path, num_threads=1, weights_path=None):
+    """
+    :param backend: 'tflite', 'numpy' or 'onnx'
+    :param weights_path: Weights for the numpy/onnx backend (default: the
+        .npz/.onnx next to model_path)
+    """
+    if backend == 'tflite':
+        return TFLiteBackend(model_path, num_threads=num_threads)
+    if backend == 'numpy':
+        if weights_path is None:
+            weights_path = _sibling(model_path, '.npz')
+        return NumpyMLP.from_file(weights_path)
+    if backend == 'onnx':
+        if weights_path is None:
+            weights_path = _sibling(model_path, '.onnx')
+            if weights_path == model_path:
+                weights_path = _sibling(model_path, '.npz')
+        return OnnxBackend(weights_path, num_threads=num_threads)
+    raise ValueError('unknown backend: %r (choose from %s)' %
+                     (backend, ', '.join(BACKENDS)))
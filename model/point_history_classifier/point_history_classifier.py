@@ -1,7 +1,9 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 import numpy as np
-import tensorflow as tf
+
+from model.mlp_backend import create_backend
+from model.mlp_backend import make_classification
 
 
 class PointHistoryClassifier(object):
@@ -11,13 +13,24 @@ class PointHistoryClassifier(object):
         score_th=0.5,
         invalid_value=0,
         num_threads=1,
+        backend='tflite',
+        weights_path=None,
     ):
-        self.interpreter = tf.lite.Interpreter(model_path=model_path,
-                                               num_threads=num_threads)
-
-        self.interpreter.allocate_tensors()
-        self.input_details = self.interpreter.get_input_details()
-        self.output_details = self.interpreter.get_output_details()
+        """
+        :param num_threads: Interpreter threads (tflite) or intra-op
+            threads (onnx)
+        :param backend: 'tflite' (tf.lite.Interpreter), 'numpy' (plain
+            matmuls, no TensorFlow) or 'onnx' (ONNX Runtime); the numpy and
+            onnx weights are exported from the .tflite
+        :param weights_path: .npz/.onnx/.tflite/.hdf5 weights for the numpy
+            or onnx backend (.hdf5 is the Keras checkpoint as saved and
+            may not match the .tflite)
+        """
+        self.backend = backend
+        self.model = create_backend(backend,
+                                    model_path,
+                                    num_threads=num_threads,
+                                    weights_path=weights_path)
 
         self.score_th = score_th
         self.invalid_value = invalid_value
@@ -25,20 +38,43 @@ class PointHistoryClassifier(object):
     def __call__(
         self,
         point_history,
+        return_probs=False,
+        top_k=None,
     ):
-        input_details_tensor_index = self.input_details[0]['index']
-        self.interpreter.set_tensor(
-            input_details_tensor_index,
+        """
+        :param return_probs: Return a Classification (index, probs, top_k)
+            instead of the bare class index
+        :param top_k: Also fill Classification.top_k with the k best
+            (class, probability) pairs (implies return_probs)
+        """
+        result_index, result = self.classify_batch(
             np.array([point_history], dtype=np.float32))
-        self.interpreter.invoke()
 
-        output_details_tensor_index = self.output_details[0]['index']
+        if return_probs or top_k is not None:
+            return make_classification(int(result_index[0]), result[0], top_k)
+        return result_index[0]
+
+    def classify_batch(self, point_history_array):
+        """
+        Classify several point histories with a single invoke.
+        :param point_history_array: (N, 32) float32 array
+        :return: (N,) class indices (invalid_value below score_th) and
+                 (N, num_classes) probabilities
+        """
+        point_history_array = np.asarray(point_history_array,
+                                         dtype=np.float32)
+        if point_history_array.ndim == 1:
+            point_history_array = point_history_array[np.newaxis, :]
 
-        result = self.interpreter.get_tensor(output_details_tensor_index)
+        batch_size = point_history_array.shape[0]
+        if batch_size == 0:
+            return (np.empty((0, ), dtype=np.int64),
+                    np.empty((0, self.model.num_classes), dtype=np.float32))
 
-        result_index = np.argmax(np.squeeze(result))
+        result = self.model(point_history_array)
 
-        if np.squeeze(result)[result_index] < self.score_th:
-            result_index = self.invalid_value
+        result_index = np.argmax(result, axis=1)
+        result_score = result[np.arange(batch_size), result_index]
+        result_index[result_score < self.score_th] = self.invalid_value
 
-        return result_index
+        return result_index, result
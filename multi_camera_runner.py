@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Gesture recognition on several cameras at once.
+
+Each source (camera index, video file or image folder) runs its own
+GestureRecognizer; results are multiplexed into one stream keyed by
+source. Video files can stand in for cameras:
+
+    python multi_camera_runner.py 0 1 --output live.jsonl
+    python multi_camera_runner.py cam_a.mp4 cam_b.mp4 --show
+"""
+import sys
+import time
+import argparse
+
+import cv2 as cv
+
+from utils.camera_service import MultiCameraService
+from utils.result_writer import RESULT_FORMATS
+from utils.result_writer import open_result_writer
+
+
+def get_args():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("sources",
+                        nargs='+',
+                        help='camera indices, video files or image folders')
+    parser.add_argument("--width", help='cap width', type=int, default=None)
+    parser.add_argument("--height", help='cap height', type=int, default=None)
+    parser.add_argument("--output", help='result file', default=None)
+    parser.add_argument("--format",
+                        choices=RESULT_FORMATS,
+                        default=None,
+                        help='default: from the output extension')
+    parser.add_argument("--queue_size",
+                        help='shared result queue size (backpressure)',
+                        type=int,
+                        default=8)
+    parser.add_argument('--show',
+                        help='show one window per source',
+                        action='store_true')
+    parser.add_argument("--stats_interval",
+                        help='seconds between per-source FPS reports',
+                        type=float,
+                        default=5.0)
+
+    parser.add_argument('--no_flip',
+                        help='do not mirror frames before recognition',
+                        action='store_true')
+    parser.add_argument("--max_num_hands", type=int, default=2)
+    parser.add_argument("--min_detection_confidence",
+                        help='min_detection_confidence',
+                        type=float,
+                        default=0.7)
+    parser.add_argument("--min_tracking_confidence",
+                        help='min_tracking_confidence',
+                        type=float,
+                        default=0.5)
+    parser.add_argument("--inference_width", type=int, default=None)
+    parser.add_argument("--inference_height", type=int, default=None)
+    parser.add_argument("--classifier_backend",
+                        help='tflite, numpy or onnx (no TensorFlow)',
+                        choices=['tflite', 'numpy', 'onnx'],
+                        default='tflite')
+    parser.add_argument("--rps_rules",
+                        help='pixel: 40px OK threshold, scaled: thresholds '
+                        'in hand sizes (independent of resolution)',
+                        choices=['pixel', 'scaled'],
+                        default='pixel')
+
+    args = parser.parse_args()
+
+    return args
+
+
+def print_stats(service):
+    for source, stats in service.stats().items():
+        state = 'done' if stats['finished'] else 'live'
+        if stats['error'] is not None:
+            state = stats['error']
+        print(f"[{source}] {stats['frames']} frames, {stats['fps']:.1f} fps, "
+              f"{stats['dropped']} dropped, "
+              f"inference p50 {stats['inference_p50_ms']:.1f} ms ({state})",
+              file=sys.stderr)
+
+
+def main():
+    args = get_args()
+
+    from batch_runner import RESULT_FIELDS
+    from batch_runner import hands_to_rows
+
+    service = MultiCameraService(
+        args.sources,
+        factory_kwargs=dict(
+            max_num_hands=args.max_num_hands,
+            min_detection_confidence=args.min_detection_confidence,
+            min_tracking_confidence=args.min_tracking_confidence,
+            inference_width=args.inference_width,
+            inference_height=args.inference_height,
+            classifier_backend=args.classifier_backend,
+            rps_rules=args.rps_rules,
+        ),
+        flip=not args.no_flip,
+        queue_size=args.queue_size,
+        width=args.width,
+        height=args.height,
+    )
+    writer = None
+    if args.output is not None:
+        writer = open_result_writer(args.output, RESULT_FIELDS, args.format)
+
+    last_gestures = {}
+    last_report = time.perf_counter()
+    service.start()
+    try:
+        for source, frame_index, timestamp_ms, frame, hands in service:
+            if writer is not None:
+                writer.write_rows(
+                    hands_to_rows(source, frame_index, timestamp_ms, hands))
+
+            # ジェスチャーが変わった時だけ表示
+            gestures = [hand.gesture_id for hand in hands]
+            if gestures != last_gestures.get(source):
+                last_gestures[source] = gestures
+                print(f"[{source}] frame {frame_index}: gesture {gestures}")
+
+            if args.show:
+                display_image = frame if args.no_flip else cv.flip(frame, 1)
+                cv.putText(display_image, f"ID: {gestures}", (10, 50),
+                           cv.FONT_HERSHEY_SIMPLEX, 1.0, (0, 255, 0), 2,
+                           cv.LINE_AA)
+                cv.imshow(f"Gesture [{source}]", display_image)
+                if cv.waitKey(1) == 27:  # ESC
+                    break
+
+            if time.perf_counter() - last_report >= args.stats_interval:
+                last_report = time.perf_counter()
+                print_stats(service)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+        if writer is not None:
+            writer.close()
+        if args.show:
+            cv.destroyAllWindows()
+        print_stats(service)
+
+
+if __name__ == '__main__':
+    main()
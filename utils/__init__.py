@@ -1 +1,14 @@
-from utils.cvfpscalc import CvFpsCalc
\ No newline at end of file
+from utils.cvfpscalc import CvFpsCalc
+from utils.pipeline import DropOldestQueue, FramePipeline
+from utils.profiler import StageProfiler
+from utils.point_history import PointHistoryBuffer
+from utils.hand_tracker import HandTracker
+from utils.temporal_filter import MajorityVote, EmaFilter, HysteresisFilter
+from utils.gesture_rules import GestureRule, GestureRuleEngine
+from utils.scheduler import AdaptiveScheduler
+from utils.frame_source import FrameSource
+from utils.worker_pool import RecognizerPool
+from utils.shared_frames import SharedFrameRing, RecognizerProcess
+from utils.camera_service import MultiCameraService
+from utils.gesture_events import GestureEventServer
+from utils.async_recognizer import AsyncGestureRecognizer
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+_END = object()
+
+
+def _create_gesture_recognizer(*args, **kwargs):
+    from app import GestureRecognizer
+
+    return GestureRecognizer(*args, **kwargs)
+
+
+class AsyncGestureRecognizer(object):
+    """
+    asyncio front end of GestureRecognizer. MediaPipe and the classifiers
+    run on one dedicated worker thread (their graphs are not thread
+    safe), so the event loop is never blocked.
+
+        async with AsyncGestureRecognizer(max_num_hands=2) as recognizer:
+            hands = await recognizer.recognize(frame, timeout=0.5)
+            async for frame, hands in recognizer.stream(cap):
+                ...
+
+    Cancelling an await (or hitting its timeout) returns immediately; a
+    recognition that already started finishes on the worker and its
+    result is discarded.
+
+    :param recognizer: Existing recognizer; otherwise one is created by
+        factory (default: app.GestureRecognizer) on the worker thread
+    """
+
+    def __init__(self, recognizer=None, factory=None, factory_args=(),
+                 **factory_kwargs):
+        self.recognizer = recognizer
+        self._factory = factory or _create_gesture_recognizer
+        self._factory_args = factory_args
+        self._factory_kwargs = factory_kwargs
+        self._executor = ThreadPoolExecutor(max_workers=1,
+                                            thread_name_prefix='recognizer')
+        self.coalesced = 0
+
+    async def start(self):
+        """
+        Create (and warm up) the recognizer on the worker thread.
+        """
+        if self.recognizer is None:
+            self.recognizer = await self._run(self._create)
+        return self
+
+    def _create(self):
+        recognizer = self._factory(*self._factory_args,
+                                   **self._factory_kwargs)
+        if hasattr(recognizer, 'warm_up'):
+            recognizer.warm_up()
+        return recognizer
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._executor.shutdown)
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _run(self, function, *args):
+        return asyncio.get_running_loop().run_in_executor(
+            self._executor, function, *args)
+
+    async def _call(self, method, image, flip, timeout):
+        if self.recognizer is None:
+            await self.start()
+        future = self._run(
+            lambda: getattr(self.recognizer, method)(image, flip=flip))
+        if timeout is None:
+            return await future
+        return await asyncio.wait_for(future, timeout)
+
+    async def recognize(self, image, flip=True, timeout=None):
+        """
+        :raises asyncio.TimeoutError: when no result within timeout
+        :return: GestureRecognizer.recognize() result
+        """
+        return await self._call('recognize', image, flip, timeout)
+
+    async def get_gesture(self, image, flip=True, timeout=None):
+        """
+        :raises asyncio.TimeoutError: when no result within timeout
+        :return: Gesture ID
+        """
+        return await self._call('get_gesture', image, flip, timeout)
+
+    async def stream(self,
+                     source,
+                     flip=True,
+                     method='recognize',
+                     coalesce=True,
+                     timeout=None):
+        """
+        Async iterator of ``(frame, result)`` over a frame source.
+
+        Frames are read on their own thread. With coalesce=True only the
+        most recent unprocessed frame is kept, so a slow consumer skips
+        stale frames (counted in ``coalesced``) instead of falling
+        behind; with coalesce=False every frame is processed and reading
+        pauses while the consumer is busy (recorded files).
+
+        :param source: cap.read-style callable or an object with read()
+            (cv.VideoCapture, FrameSource)
+        :param timeout: Per-frame recognition timeout (raises
+            asyncio.TimeoutError)
+        """
+        if self.recognizer is None:
+            await self.start()
+        read = source.read if hasattr(source, 'read') else source
+        loop = asyncio.get_running_loop()
+        stop_event = threading.Event()
+        # coalesce 時は最新フレーム1枚だけを保持するスロット
+        slot = asyncio.Queue(maxsize=1)
+        errors = []
+
+        def offer(frame):
+            if slot.full():
+                slot.get_nowait()
+                self.coalesced += 1
+            slot.put_nowait(frame)
+
+        def put(item):
+            # バックプレッシャー: 消費されるまで待つ (停止時は諦める)
+            future = asyncio.run_coroutine_threadsafe(slot.put(item), loop)
+            while not stop_event.is_set():
+                try:
+                    return future.result(timeout=0.1)
+                except FutureTimeoutError:
+                    continue
+            future.cancel()
+
+        def capture():
+            try:
+                while not stop_event.is_set():
+                    ret, frame = read()
+                    if not ret:
+                        break
+                    if coalesce:
+                        loop.call_soon_threadsafe(offer, frame)
+                    else:
+                        put(frame)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                # 最後のフレームを上書きしないよう終端マーカーは待って入れる
+                if not stop_event.is_set() and not loop.is_closed():
+                    put(_END)
+
+        capture_thread = threading.Thread(target=capture, daemon=True)
+        capture_thread.start()
+        try:
+            while True:
+                frame = await slot.get()
+                if frame is _END:
+                    if errors:
+                        raise errors[0]
+                    return
+                result = await self._call(method, frame, flip, timeout)
+                yield frame, result
+        finally:
+            stop_event.set()
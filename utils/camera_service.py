@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import queue
+import threading
+import time
+
+from utils.pipeline import FramePipeline
+from utils.profiler import StageProfiler
+from utils.frame_source import FrameSource
+
+_END = object()
+
+
+def _create_gesture_recognizer(*args, **kwargs):
+    from app import GestureRecognizer
+
+    return GestureRecognizer(*args, **kwargs)
+
+
+class _SourceWorker(object):
+    """
+    One source: its FrameSource, its own recognizer and the
+    capture -> inference pipeline, plus a forwarder thread that moves
+    results into the shared output queue.
+    """
+
+    def __init__(self, key, source, recognizer, flip, method, width, height,
+                 drop_frames):
+        self.key = key
+        self.frame_source = FrameSource(source, width, height)
+        self.recognizer = recognizer
+        self.profiler = StageProfiler(fps_buffer_len=30)
+        self.frames = 0
+        self.finished = False
+        self.error = None
+
+        if drop_frames is None:
+            # カメラは最新フレーム優先、ファイルは全フレーム処理
+            drop_frames = self.frame_source.is_camera
+        self.drop_frames = drop_frames
+        process = getattr(recognizer, method)
+
+        def read():
+            ret, frame = self.frame_source.read()
+            if not ret:
+                return False, None
+            return True, (self.frame_source.frame_index,
+                          self.frame_source.timestamp_ms, frame)
+
+        def inference(packet):
+            return process(packet[2], flip=flip)
+
+        self.pipeline = FramePipeline(read,
+                                      inference,
+                                      queue_size=1,
+                                      drop_frames=drop_frames,
+                                      profiler=self.profiler)
+        self.thread = None
+
+
+class MultiCameraService(object):
+    """
+    Concurrent recognition over several cameras (or video files / image
+    folders standing in for them). Every source gets its own recognizer
+    and capture/inference threads; results from all sources are
+    multiplexed into one bounded queue and read with get() as
+    ``(source, frame_index, timestamp_ms, frame, result)``.
+
+    Backpressure: when the consumer falls behind, the output queue fills
+    up and the per-source forwarders block. Camera pipelines then drop
+    their oldest frames (so each camera stays live), file pipelines
+    block so that no frame is skipped.
+
+    :param sources: Camera indices, video paths or image folders
+    :param factory: Callable creating one recognizer per source
+        (default: app.GestureRecognizer)
+    :param method: Recognizer method called per frame
+    :param queue_size: Capacity of the shared output queue
+    :param drop_frames: Force frame dropping on/off for every source
+        (None: drop for cameras only)
+    """
+
+    def __init__(self,
+                 sources,
+                 factory=None,
+                 factory_args=(),
+                 factory_kwargs=None,
+                 method='recognize',
+                 flip=True,
+                 queue_size=8,
+                 drop_frames=None,
+                 width=None,
+                 height=None):
+        if factory is None:
+            factory = _create_gesture_recognizer
+        factory_kwargs = factory_kwargs or {}
+
+        self._output_queue = queue.Queue(maxsize=queue_size)
+        self._stop_event = threading.Event()
+        self._remaining = 0
+        self.workers = {}
+        for source in sources:
+            key = str(source)
+            if key in self.workers:
+                raise ValueError('duplicate source: ' + key)
+            self.workers[key] = _SourceWorker(
+                key, source, factory(*factory_args, **factory_kwargs), flip,
+                method, width, height, drop_frames)
+
+    def start(self):
+        self._stop_event.clear()
+        self._remaining = len(self.workers)
+        for worker in self.workers.values():
+            if not worker.frame_source.isOpened():
+                worker.error = IOError('cannot open source: ' + worker.key)
+                worker.finished = True
+                self._remaining -= 1
+                continue
+            worker.pipeline.start()
+            worker.thread = threading.Thread(target=self._forward,
+                                             args=(worker, ),
+                                             daemon=True)
+            worker.thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        self._stop_event.set()
+        for worker in self.workers.values():
+            worker.pipeline.stop(timeout)
+            if worker.thread is not None:
+                worker.thread.join(timeout)
+                worker.thread = None
+            worker.frame_source.release()
+
+    @property
+    def running(self):
+        return self._remaining > 0
+
+    def get(self, timeout=None):
+        """
+        Return the next result of any source.
+        :return: (source, frame_index, timestamp_ms, frame, result), or None
+            once every source is exhausted
+        :raises queue.Empty: when nothing arrived within timeout
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while self._remaining > 0:
+            wait = 0.1
+            if deadline is not None:
+                wait = min(wait, deadline - time.perf_counter())
+                if wait <= 0:
+                    raise queue.Empty
+            try:
+                item = self._output_queue.get(timeout=wait)
+            except queue.Empty:
+                if self._stop_event.is_set():
+                    return None
+                continue
+            if item[1] is _END:
+                self._remaining -= 1
+                continue
+            return item
+        return None
+
+    def __iter__(self):
+        while True:
+            item = self.get()
+            if item is None:
+                return
+            yield item
+
+    def stats(self):
+        """
+        :return: {source: {frames, fps, dropped, inference_p50_ms,
+            finished, error}}
+        """
+        stats = {}
+        for key, worker in self.workers.items():
+            inference = worker.profiler.histogram('inference')
+            stats[key] = {
+                'frames': worker.frames,
+                'fps': worker.profiler.fps,
+                'dropped': worker.pipeline.dropped,
+                'inference_p50_ms': round(inference.percentile(50), 3),
+                'finished': worker.finished,
+                'error': None if worker.error is None else str(worker.error),
+            }
+        return stats
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _put(self, item):
+        while not self._stop_event.is_set():
+            try:
+                self._output_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _forward(self, worker):
+        try:
+            for (frame_index, timestamp_ms, frame), result in worker.pipeline:
+                worker.frames += 1
+                worker.profiler.tick()
+                if not self._put((worker.key, frame_index, timestamp_ms,
+                                  frame, result)):
+                    break
+        except Exception as e:
+            worker.error = e
+        finally:
+            worker.finished = True
+            # 終端マーカー (停止中でなければ必ず届ける)
+            self._put((worker.key, _END, None, None, None))
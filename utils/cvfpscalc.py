@@ -7,15 +7,20 @@ class CvFpsCalc(object):
         self._start_tick = cv.getTickCount()
         self._freq = 1000.0 / cv.getTickFrequency()
         self._difftimes = deque(maxlen=buffer_len)
+        self._difftime_total = 0.0
 
     def get(self):
         current_tick = cv.getTickCount()
         different_time = (current_tick - self._start_tick) * self._freq
         self._start_tick = current_tick
 
+        # 合計は差分更新し、毎回 sum() しない
+        if len(self._difftimes) == self._difftimes.maxlen:
+            self._difftime_total -= self._difftimes[0]
         self._difftimes.append(different_time)
+        self._difftime_total += different_time
 
-        fps = 1000.0 / (sum(self._difftimes) / len(self._difftimes))
+        fps = 1000.0 / (self._difftime_total / len(self._difftimes))
         fps_rounded = round(fps, 2)
 
         return fps_rounded
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+import cv2 as cv
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm', '.m4v', '.mpg')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')
+
+
+def expand_sources(paths):
+    """
+    Expand input paths into frame sources: a video file is one source, a
+    folder of images is one source (frames in file name order) and a
+    folder of videos yields each video.
+    """
+    sources = []
+    for path in paths:
+        if not os.path.isdir(path):
+            sources.append(path)
+            continue
+        names = sorted(os.listdir(path))
+        videos = [
+            os.path.join(path, name) for name in names
+            if name.lower().endswith(VIDEO_EXTENSIONS)
+        ]
+        if videos:
+            sources.extend(videos)
+        else:
+            sources.append(path)
+    return sources
+
+
+class FrameSource(object):
+    """
+    cap.read()-compatible reader over a camera device, a video file or a
+    folder of images. Unreadable images in a folder are skipped (listed in
+    ``skipped``) instead of ending the stream.
+
+    :param source: Camera index (int or digit string), video path or
+        image folder path
+    """
+
+    def __init__(self, source, width=None, height=None):
+        self.source = source
+        self.frame_index = -1
+        self.timestamp_ms = None
+        self._cap = None
+        self._images = None
+        self.skipped = []  # 読み込めなかった画像のパス
+
+        if isinstance(source, int) or (isinstance(source, str)
+                                       and source.isdigit()):
+            self._cap = cv.VideoCapture(int(source))
+            if width is not None:
+                self._cap.set(cv.CAP_PROP_FRAME_WIDTH, width)
+            if height is not None:
+                self._cap.set(cv.CAP_PROP_FRAME_HEIGHT, height)
+        elif os.path.isdir(source):
+            self._images = [
+                os.path.join(source, name)
+                for name in sorted(os.listdir(source))
+                if name.lower().endswith(IMAGE_EXTENSIONS)
+            ]
+        else:
+            self._cap = cv.VideoCapture(source)
+
+    @property
+    def is_camera(self):
+        return isinstance(self.source, int) or (isinstance(
+            self.source, str) and self.source.isdigit())
+
+    @property
+    def fps(self):
+        if self._cap is None:
+            return 0.0
+        return self._cap.get(cv.CAP_PROP_FPS)
+
+    def isOpened(self):
+        if self._images is not None:
+            return True
+        return self._cap.isOpened()
+
+    def read(self, image=None):
+        """
+        :param image: Optional preallocated output array (as cap.read())
+        """
+        if self._images is not None:
+            # 読み込めない画像は飛ばし、一覧の終わりでのみ False を返す
+            while self.frame_index + 1 < len(self._images):
+                self.frame_index += 1
+                path = self._images[self.frame_index]
+                frame = cv.imread(path)
+                if frame is not None:
+                    return True, frame
+                self.skipped.append(path)
+                print(f"skipping unreadable image: {path}", file=sys.stderr)
+            return False, None
+
+        if image is None:
+            ret, frame = self._cap.read()
+        else:
+            ret, frame = self._cap.read(image)
+        if ret:
+            self.frame_index += 1
+            if not self.is_camera:
+                self.timestamp_ms = self._cap.get(cv.CAP_PROP_POS_MSEC)
+        return ret, frame
+
+    def release(self):
+        if self._cap is not None:
+            self._cap.release()
+
+    def __iter__(self):
+        while True:
+            ret, frame = self.read()
+            if not ret:
+                return
+            yield frame
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
@@ -0,0 +1,390 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import json
+import stat
+import errno
+import time
+import socket
+import asyncio
+import tempfile
+import threading
+
+DEFAULT_SOCKET_PATH = os.path.join(tempfile.gettempdir(),
+                                   'gesture_events.sock')
+DEFAULT_TCP_ADDRESS = 'tcp://127.0.0.1:8765'
+
+
+def default_address():
+    """
+    :return: Unix socket address where available, local TCP otherwise
+        (Windows)
+    """
+    if hasattr(socket, 'AF_UNIX'):
+        return 'unix:' + DEFAULT_SOCKET_PATH
+    return DEFAULT_TCP_ADDRESS
+
+
+def parse_address(address):
+    """
+    :param address: 'unix:/path.sock', 'tcp://host:port' or
+        'ws://host:port'
+    :return: (scheme, path) or (scheme, (host, port))
+    """
+    if address.startswith('unix:'):
+        return 'unix', address[len('unix:'):]
+    for scheme in ('tcp', 'ws'):
+        prefix = scheme + '://'
+        if address.startswith(prefix):
+            host, _, port = address[len(prefix):].rstrip('/').rpartition(':')
+            return scheme, (host or '127.0.0.1', int(port))
+    raise ValueError('unsupported address: ' + address)
+
+
+class GestureChangeDetector(object):
+    """
+    Turns per-frame recognize() results into change events: one event
+    when a hand's gesture changes, and a gesture_id -1 event when a hand
+    disappears.
+
+    :param labels: {gesture_id: label} (e.g. app.GESTURE_LABELS)
+    """
+
+    def __init__(self, labels=None, source=None):
+        self.labels = labels or {}
+        self.source = source
+        self._last = {}
+
+    def reset(self):
+        self._last = {}
+
+    def update(self, hands, timestamp=None):
+        """
+        :param hands: GestureRecognizer.recognize() output (HandResult list)
+        :return: List of event dicts (empty when nothing changed)
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        events = []
+        seen = set()
+        for hand in hands:
+            hand_id = hand.hand_id
+            seen.add(hand_id)
+            gesture_id = hand.gesture_id
+            if self._last.get(hand_id) == gesture_id:
+                continue
+            self._last[hand_id] = gesture_id
+            events.append(
+                self._event(gesture_id, hand.confidence, hand_id,
+                            hand.handedness, timestamp))
+
+        for hand_id in [key for key in self._last if key not in seen]:
+            del self._last[hand_id]
+            events.append(self._event(-1, None, hand_id, None, timestamp))
+        return events
+
+    def _event(self, gesture_id, confidence, hand_id, handedness, timestamp):
+        event = {
+            'type': 'gesture',
+            'id': gesture_id,
+            'label': self.labels.get(gesture_id, ''),
+            'confidence': None if confidence is None else round(
+                float(confidence), 4),
+            'hand': hand_id,
+            'handedness': handedness,
+            'timestamp': timestamp,
+        }
+        if self.source is not None:
+            event['source'] = self.source
+        return event
+
+
+def _remove_stale_socket(path):
+    """
+    Remove a Unix socket file left behind by a server that is no longer
+    running.
+    :raises OSError: EADDRINUSE when a server still answers on ``path``,
+        or when ``path`` is not a socket
+    """
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise OSError(errno.EADDRINUSE, 'address in use (not a socket)',
+                      path)
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except ConnectionRefusedError:
+        # 応答が無いソケットファイルは前回の残骸なので削除する
+        os.unlink(path)
+        return
+    finally:
+        sock.close()
+    raise OSError(errno.EADDRINUSE, 'address in use', path)
+
+
+class _Subscriber(object):
+    __slots__ = ('queue', 'dropped')
+
+    def __init__(self, maxsize):
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def push(self, line):
+        # 遅いクライアントは古いイベントから捨てる (他のクライアントは待たせない)
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(line)
+
+
+class GestureEventServer(object):
+    """
+    asyncio server publishing gesture events as JSON lines to any number
+    of subscribers over a Unix socket, local TCP, or WebSocket (needs the
+    websockets package). Runs its event loop on a background thread, so
+    publish() can be called from a synchronous capture loop.
+
+    Every subscriber has its own bounded queue; a slow subscriber loses
+    its oldest events instead of delaying the others. New subscribers
+    first receive the last published event.
+
+    :param addresses: List of addresses (see parse_address), default
+        default_address()
+    :param client_queue_size: Events buffered per subscriber
+    """
+
+    def __init__(self, addresses=None, client_queue_size=64):
+        self.addresses = list(addresses or [default_address()])
+        self.client_queue_size = client_queue_size
+        self._subscribers = set()
+        self._last_line = None
+        self._loop = None
+        self._closing = None
+        self._handlers = set()
+        self._servers = []
+        self._thread = None
+        self._ready = threading.Event()
+        self._error = None
+        self.published = 0
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    @property
+    def dropped(self):
+        return sum(subscriber.dropped for subscriber in self._subscribers)
+
+    def start(self, timeout=10.0):
+        self._ready.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._ready.wait(timeout)
+        if self._error is not None:
+            raise self._error
+        return self
+
+    def stop(self, timeout=2.0):
+        if self._loop is not None and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def publish(self, event):
+        """
+        Thread-safe: queue an event (dict) for every subscriber.
+        """
+        line = json.dumps(event, ensure_ascii=False) + '\n'
+        if self._loop is not None and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._broadcast, line)
+
+    def publish_many(self, events):
+        for event in events:
+            self.publish(event)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    # イベントループ (バックグラウンドスレッド) ###############################
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._start_servers())
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+            self._loop.close()
+            return
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.run_until_complete(self._close_servers())
+            self._loop.close()
+
+    async def _start_servers(self):
+        self._closing = asyncio.Event()
+        for address in self.addresses:
+            scheme, target = parse_address(address)
+            if scheme == 'unix':
+                _remove_stale_socket(target)
+                server = await asyncio.start_unix_server(
+                    self._handle_stream, path=target)
+            elif scheme == 'tcp':
+                server = await asyncio.start_server(self._handle_stream,
+                                                    *target)
+            else:
+                import websockets
+
+                server = await websockets.serve(self._handle_websocket,
+                                                *target)
+            self._servers.append((scheme, target, server))
+
+    async def _close_servers(self):
+        for _, _, server in self._servers:
+            server.close()
+        # 接続中のクライアントの処理を終わらせてからサーバーを閉じる
+        self._closing.set()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        for scheme, target, server in self._servers:
+            await server.wait_closed()
+            if scheme == 'unix' and os.path.exists(target):
+                os.unlink(target)
+        self._servers = []
+
+    def _broadcast(self, line):
+        self._last_line = line
+        self.published += 1
+        for subscriber in self._subscribers:
+            subscriber.push(line)
+
+    def _subscribe(self):
+        subscriber = _Subscriber(self.client_queue_size)
+        if self._last_line is not None:
+            subscriber.push(self._last_line)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    async def _serve_subscriber(self, send_loop, closed):
+        """
+        Send until the client goes away (``closed`` completes) or the
+        server shuts down.
+        """
+        self._handlers.add(asyncio.current_task())
+        subscriber = self._subscribe()
+        tasks = [
+            asyncio.ensure_future(send_loop(subscriber)),
+            asyncio.ensure_future(closed),
+            asyncio.ensure_future(self._closing.wait()),
+        ]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self._subscribers.discard(subscriber)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._handlers.discard(asyncio.current_task())
+
+    async def _handle_stream(self, reader, writer):
+
+        async def send_loop(subscriber):
+            while True:
+                line = await subscriber.queue.get()
+                writer.write(line.encode('utf-8'))
+                await writer.drain()
+
+        async def wait_closed():
+            # クライアントからの入力は溜めずに捨て、EOF で終了する
+            while await reader.read(4096):
+                pass
+
+        # クライアントの切断 (EOF) を検知するまで送り続ける
+        try:
+            await self._serve_subscriber(send_loop, wait_closed())
+        finally:
+            writer.close()
+
+    async def _handle_websocket(self, websocket, *args):
+        async def send_loop(subscriber):
+            while True:
+                line = await subscriber.queue.get()
+                await websocket.send(line.rstrip('\n'))
+
+        await self._serve_subscriber(send_loop, websocket.wait_closed())
+
+
+def _connect(address, timeout):
+    scheme, target = parse_address(address)
+    if scheme == 'unix':
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(target)
+        return sock
+    if scheme == 'tcp':
+        return socket.create_connection(target, timeout=timeout)
+    raise ValueError('iter_gesture_events supports unix/tcp only: ' + address)
+
+
+def iter_gesture_events(address=None, timeout=None, stop_event=None):
+    """
+    Blocking subscriber (for threads, e.g. the Tk game).
+    :param timeout: Socket timeout in seconds; with stop_event set the
+        generator returns after the next timeout
+    :return: Generator of event dicts, ending when the server closes
+    :raises OSError: when the server cannot be reached
+    """
+    sock = _connect(address or default_address(), timeout)
+    try:
+        buffer = b''
+        while stop_event is None or not stop_event.is_set():
+            try:
+                data = sock.recv(4096)
+            except socket.timeout:
+                continue
+            if not data:
+                return
+            buffer += data
+            *lines, buffer = buffer.split(b'\n')
+            for line in lines:
+                if line:
+                    yield json.loads(line.decode('utf-8'))
+    finally:
+        sock.close()
+
+
+async def subscribe(address=None):
+    """
+    asyncio subscriber.
+    :return: Async generator of event dicts
+    """
+    scheme, target = parse_address(address or default_address())
+    if scheme == 'unix':
+        reader, writer = await asyncio.open_unix_connection(target)
+    elif scheme == 'tcp':
+        reader, writer = await asyncio.open_connection(*target)
+    else:
+        import websockets
+
+        async with websockets.connect('ws://%s:%d' % target) as websocket:
+            async for message in websocket:
+                yield json.loads(message)
+        return
+
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            yield json.loads(line.decode('utf-8'))
+    finally:
+        writer.close()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from collections import namedtuple
+
+import numpy as np
+
+# 親指・人差指・中指・薬指・小指の 指先 / 比較対象の関節 (親指は MCP)
+FINGER_NAMES = ('thumb', 'index', 'middle', 'ring', 'pinky')
+FINGER_TIPS = np.array([4, 8, 12, 16, 20])
+FINGER_JOINTS = np.array([2, 6, 10, 14, 18])
+
+WRIST = 0
+MIDDLE_MCP = 9
+
+GestureRule = namedtuple('GestureRule',
+                         ['gesture_id', 'fingers', 'max_distances'])
+GestureRule.__doc__ = """
+Rule matching a hand pose.
+
+:param gesture_id: ID returned when the rule matches
+:param fingers: One entry per finger (FINGER_NAMES order): True
+    (extended), False (folded) or None (either)
+:param max_distances: ((landmark_a, landmark_b), max_distance) pairs; the
+    distance is measured in hand scales (see hand_scale), or in input
+    coordinates when the engine is built with scale_distances=False
+"""
+
+
+def hand_scale(landmark_points):
+    """
+    Size of the hand independent of camera resolution and distance: the
+    wrist to middle finger MCP length.
+    :param landmark_points: (..., 21, 2) coordinates
+    :return: (...) array
+    """
+    landmark_points = np.asarray(landmark_points, dtype=np.float64)
+    return np.linalg.norm(landmark_points[..., MIDDLE_MCP, :] -
+                          landmark_points[..., WRIST, :],
+                          axis=-1)
+
+
+def finger_extension_ratios(landmark_points):
+    """
+    Distance wrist -> fingertip divided by distance wrist -> joint for
+    every finger; > 1 means the finger is extended.
+    :param landmark_points: (..., 21, 2) coordinates
+    :return: (..., 5) array
+    """
+    landmark_points = np.asarray(landmark_points, dtype=np.float64)
+    wrist = landmark_points[..., WRIST:WRIST + 1, :]
+    tip_distance = np.linalg.norm(landmark_points[..., FINGER_TIPS, :] - wrist,
+                                  axis=-1)
+    joint_distance = np.linalg.norm(
+        landmark_points[..., FINGER_JOINTS, :] - wrist, axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return tip_distance / joint_distance
+
+
+class GestureRuleEngine(object):
+    """
+    Classifies hand poses with a list of GestureRule, vectorized over any
+    number of hands. The rules are compiled into arrays once, so adding a
+    gesture means adding a rule, not per-frame Python code.
+
+    Rules are tried in order and the first matching one wins.
+
+    :param rules: Sequence of GestureRule
+    :param extension_threshold: Extension ratio above which a finger
+        counts as extended
+    :param default_id: ID returned when no rule matches
+    :param scale_distances: Measure max_distances in hand scales (False:
+        in the coordinates passed to match/classify, e.g. pixels)
+    """
+
+    def __init__(self,
+                 rules,
+                 extension_threshold=1.0,
+                 default_id=-1,
+                 scale_distances=True):
+        self.rules = tuple(rules)
+        self.extension_threshold = extension_threshold
+        self.default_id = default_id
+        self.scale_distances = scale_distances
+
+        self._gesture_ids = np.array([rule.gesture_id for rule in self.rules])
+        # 指の条件: 判定対象のマスクと期待値
+        self._finger_mask = np.array(
+            [[state is not None for state in rule.fingers]
+             for rule in self.rules],
+            dtype=bool).reshape(len(self.rules), len(FINGER_NAMES))
+        self._finger_expected = np.array(
+            [[bool(state) for state in rule.fingers] for rule in self.rules],
+            dtype=bool).reshape(len(self.rules), len(FINGER_NAMES))
+
+        # 距離の条件: 全ルールで使うランドマーク対と、ルール毎の上限
+        pairs = []
+        for rule in self.rules:
+            for pair, _ in rule.max_distances:
+                if tuple(pair) not in pairs:
+                    pairs.append(tuple(pair))
+        self._pairs = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+        self._max_distances = np.zeros((len(self.rules), len(pairs)))
+        self._distance_unused = np.ones((len(self.rules), len(pairs)),
+                                        dtype=bool)
+        for rule_index, rule in enumerate(self.rules):
+            for pair, max_distance in rule.max_distances:
+                pair_index = pairs.index(tuple(pair))
+                self._max_distances[rule_index, pair_index] = max_distance
+                self._distance_unused[rule_index, pair_index] = False
+
+        # 必要な距離を1回の添字参照でまとめて求める:
+        # [指先 5, 関節 5, 手のサイズ 1, ルールの対 P] の (始点, 終点)
+        num_fingers = len(FINGER_NAMES)
+        self._from = np.concatenate(
+            (FINGER_TIPS, FINGER_JOINTS, [MIDDLE_MCP], self._pairs[:, 0]))
+        self._to = np.concatenate(
+            (np.full(num_fingers * 2 + 1, WRIST), self._pairs[:, 1]))
+        self._tips = slice(0, num_fingers)
+        self._joints = slice(num_fingers, num_fingers * 2)
+        self._scale = num_fingers * 2
+        self._pair_distances = slice(num_fingers * 2 + 1, None)
+
+    def match(self, landmark_points):
+        """
+        :param landmark_points: (N, 21, 2) coordinates (pixels or
+            normalized; with scale_distances=False in the unit of
+            max_distances)
+        :return: (N, R) bool array, True where rule r matches hand n
+        """
+        landmark_points = np.asarray(landmark_points, dtype=np.float64)
+        vectors = landmark_points[:, self._from] - landmark_points[:, self._to]
+        distances = np.sqrt(np.einsum('nij,nij->ni', vectors, vectors))
+
+        # 比は割り算せずに比較する (長さ 0 の場合も判定が変わらない)
+        extended = distances[:, self._tips] > (distances[:, self._joints] *
+                                               self.extension_threshold)
+        fingers_ok = np.all(
+            (extended[:, np.newaxis, :] == self._finger_expected)
+            | ~self._finger_mask,
+            axis=-1)
+
+        if len(self._pairs) == 0:
+            return fingers_ok
+        if self.scale_distances:
+            limits = self._max_distances * distances[:, self._scale,
+                                                     np.newaxis, np.newaxis]
+        else:
+            limits = self._max_distances
+        distances_ok = np.all(
+            (distances[:, np.newaxis, self._pair_distances] < limits)
+            | self._distance_unused,
+            axis=-1)
+        return fingers_ok & distances_ok
+
+    def classify(self, landmark_points):
+        """
+        :param landmark_points: (N, 21, 2) or (21, 2) coordinates
+        :return: (N, ) int array of gesture IDs (default_id where no rule
+            matches), or an int for a single hand
+        """
+        landmark_points = np.asarray(landmark_points)
+        if landmark_points.ndim == 2:
+            return int(self.classify(landmark_points[np.newaxis])[0])
+        if len(landmark_points) == 0 or len(self.rules) == 0:
+            return np.full(len(landmark_points), self.default_id,
+                           dtype=np.int64)
+
+        matches = self.match(landmark_points)
+        first_match = np.argmax(matches, axis=1)
+        return np.where(matches.any(axis=1), self._gesture_ids[first_match],
+                        self.default_id)
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from utils.point_history import PointHistoryBuffer
+from utils.temporal_filter import EmaFilter
+from utils.temporal_filter import HysteresisFilter
+from utils.temporal_filter import MajorityVote
+
+
+class TrackedHand(object):
+    """
+    State kept for one hand across frames: its fingertip history and the
+    temporal filters smoothing its hand sign, finger gesture and final
+    gesture.
+    """
+
+    __slots__ = ('hand_id', 'handedness', 'brect', 'point_history',
+                 'finger_gesture_vote', 'hand_sign_filter', 'gesture_filter',
+                 'missed', 'age')
+
+    def __init__(self,
+                 hand_id,
+                 handedness,
+                 brect,
+                 history_length=16,
+                 smoothing_alpha=1.0,
+                 min_dwell=1):
+        self.hand_id = hand_id
+        self.handedness = handedness
+        self.brect = brect
+        self.point_history = PointHistoryBuffer(maxlen=history_length)
+        self.finger_gesture_vote = MajorityVote(window=history_length)
+        self.hand_sign_filter = EmaFilter(alpha=smoothing_alpha)
+        self.gesture_filter = HysteresisFilter(min_dwell=min_dwell)
+        self.missed = 0
+        self.age = 0
+
+
+def _iou(brects_a, brects_b):
+    """
+    :param brects_a: (A, 4) [x1, y1, x2, y2]
+    :param brects_b: (B, 4)
+    :return: (A, B) intersection over union
+    """
+    top_left = np.maximum(brects_a[:, np.newaxis, :2], brects_b[:, :2])
+    bottom_right = np.minimum(brects_a[:, np.newaxis, 2:], brects_b[:, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(brects_a[:, 2:] - brects_a[:, :2], axis=1)
+    area_b = np.prod(brects_b[:, 2:] - brects_b[:, :2], axis=1)
+    union = area_a[:, np.newaxis] + area_b - intersection
+    return intersection / np.maximum(union, 1e-9)
+
+
+class HandTracker(object):
+    """
+    Assigns stable IDs to the hands MediaPipe reports every frame, so that
+    each hand keeps its own point history and gesture votes instead of
+    all hands writing into one shared deque.
+
+    Detections are matched to tracks greedily by a score combining box
+    IoU, centroid distance and handedness. A track that goes unmatched
+    gets a [0, 0] point (as the single-hand code did when no hand was
+    seen) and is evicted after ``max_missed`` frames.
+
+    :param history_length: Length of every per-hand history
+    :param max_missed: Frames a hand may be missing before it is evicted
+    :param iou_threshold: Minimum IoU for a match ...
+    :param max_distance: ... or maximum centroid distance, as a fraction of
+        the image diagonal
+    :param smoothing_alpha: EMA weight of the newest hand sign probabilities
+        (1.0: no smoothing)
+    :param min_dwell: Frames a new gesture must persist before it is
+        reported (1: no debouncing)
+    """
+
+    def __init__(self,
+                 history_length=16,
+                 max_missed=5,
+                 iou_threshold=0.1,
+                 max_distance=0.15,
+                 smoothing_alpha=1.0,
+                 min_dwell=1):
+        self.history_length = history_length
+        self.smoothing_alpha = smoothing_alpha
+        self.min_dwell = min_dwell
+        self.max_missed = max_missed
+        self.iou_threshold = iou_threshold
+        self.max_distance = max_distance
+        self.tracks = []
+        self._next_id = 0
+
+    def __len__(self):
+        return len(self.tracks)
+
+    def __iter__(self):
+        return iter(self.tracks)
+
+    def reset(self):
+        self.tracks = []
+        self._next_id = 0
+
+    def update(self, handedness_labels, brects, image_width, image_height):
+        """
+        :param handedness_labels: 'Left'/'Right' per detected hand
+        :param brects: [x1, y1, x2, y2] per detected hand
+        :return: TrackedHand per detected hand, in detection order
+        """
+        num_detections = len(brects)
+        assigned = [None] * num_detections
+        matched_tracks = set()
+
+        if self.tracks and num_detections > 0:
+            track_brects = np.array([track.brect for track in self.tracks],
+                                    dtype=np.float64)
+            detection_brects = np.array(brects, dtype=np.float64)
+
+            iou = _iou(track_brects, detection_brects)
+            track_centers = (track_brects[:, :2] + track_brects[:, 2:]) / 2
+            detection_centers = (detection_brects[:, :2] +
+                                 detection_brects[:, 2:]) / 2
+            distance = np.linalg.norm(
+                track_centers[:, np.newaxis] - detection_centers,
+                axis=2) / np.hypot(image_width, image_height)
+            same_hand = np.array([[
+                track.handedness == label for label in handedness_labels
+            ] for track in self.tracks])
+
+            # 手の左右が一致するものを優先し、その中で IoU・距離で選ぶ
+            score = same_hand + iou - distance
+            candidate = (iou >= self.iou_threshold) | (distance <=
+                                                       self.max_distance)
+            score[~candidate] = -np.inf
+
+            for flat_index in np.argsort(score, axis=None)[::-1]:
+                track_index, detection_index = np.unravel_index(
+                    flat_index, score.shape)
+                if not np.isfinite(score[track_index, detection_index]):
+                    break
+                if (track_index in matched_tracks
+                        or assigned[detection_index] is not None):
+                    continue
+                matched_tracks.add(track_index)
+                assigned[detection_index] = self.tracks[track_index]
+
+        # 見失った手は履歴を詰め、一定フレーム後に破棄する
+        surviving = []
+        for index, track in enumerate(self.tracks):
+            if index in matched_tracks:
+                surviving.append(track)
+                continue
+            track.missed += 1
+            track.point_history.append([0, 0])
+            if track.missed <= self.max_missed:
+                surviving.append(track)
+        self.tracks = surviving
+
+        for detection_index, track in enumerate(assigned):
+            if track is None:
+                track = TrackedHand(self._next_id,
+                                    handedness_labels[detection_index],
+                                    brects[detection_index],
+                                    self.history_length,
+                                    self.smoothing_alpha, self.min_dwell)
+                self._next_id += 1
+                self.tracks.append(track)
+                assigned[detection_index] = track
+            track.handedness = handedness_labels[detection_index]
+            track.brect = brects[detection_index]
+            track.missed = 0
+            track.age += 1
+
+        return assigned
+
+    def point_histories(self):
+        """
+        :return: Point history (list of points) of every live track
+        """
+        return [track.point_history.points().tolist() for track in self.tracks]
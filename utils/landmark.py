@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import numpy as np
+
+NUM_LANDMARKS = 21
+
+
+def landmarks_to_array(landmarks):
+    """
+    Convert a MediaPipe hand_landmarks message to a (21, 3) float32 array.
+    The message fields are float32, so the conversion is lossless.
+    :param landmarks: NormalizedLandmarkList (results.multi_hand_landmarks[i])
+    :return: (21, 3) array of normalized x, y, z
+    """
+    return np.array([(landmark.x, landmark.y, landmark.z)
+                     for landmark in landmarks.landmark],
+                    dtype=np.float32)
+
+
+def calc_landmark_points(landmark_array, image_width, image_height):
+    """
+    Pixel coordinates of the landmarks, identical to calc_landmark_list().
+    :param landmark_array: (..., 21, 2+) normalized landmarks
+    :return: (..., 21, 2) int64 array
+    """
+    # float64 で乗算しないと int(landmark.x * image_width) と一致しない
+    normalized = np.asarray(landmark_array)[..., :2].astype(np.float64)
+    landmark_points = (normalized * (image_width, image_height)).astype(
+        np.int64)
+    return np.minimum(landmark_points, (image_width - 1, image_height - 1))
+
+
+def calc_bounding_rect_points(landmark_points):
+    """
+    Bounding rect [x1, y1, x2, y2] of the landmark points, identical to
+    cv.boundingRect() as used in calc_bounding_rect().
+    :param landmark_points: (..., 21, 2) pixel coordinates
+    :return: (..., 4) int64 array
+    """
+    landmark_points = np.asarray(landmark_points)
+    return np.concatenate((landmark_points.min(axis=-2),
+                           landmark_points.max(axis=-2) + 1),
+                          axis=-1)
+
+
+def pre_process_landmark_points(landmark_points):
+    """
+    Wrist-relative, max-abs normalized features, identical to
+    pre_process_landmark() so existing keypoint.csv data stays valid.
+    :param landmark_points: (..., 21, 2) pixel coordinates
+    :return: (..., 42) float64 array
+    """
+    landmark_points = np.asarray(landmark_points)
+
+    # 相対座標に変換
+    relative_points = landmark_points - landmark_points[..., :1, :]
+
+    # 1次元に変換
+    features = relative_points.reshape(
+        relative_points.shape[:-2] + (relative_points.shape[-2] * 2, ))
+
+    # 正規化
+    max_value = np.abs(features).max(axis=-1, keepdims=True)
+    return features / max_value
+
+
+def calc_landmark_z(landmark_array):
+    """
+    Depth of each landmark relative to the wrist (MediaPipe's z is
+    already wrist-relative, in roughly the same scale as x).
+    :return: (..., 21) float32 array
+    """
+    return np.asarray(landmark_array)[..., 2].copy()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import cv2 as cv
+import numpy as np
+
+# 骨格の連結 (手の平は閉じた多角形、各指は付け根から指先への折れ線)
+HAND_CHAINS = (
+    (0, 1, 2, 5, 9, 13, 17, 0),  # 手の平
+    (2, 3, 4),  # 親指
+    (5, 6, 7, 8),  # 人差指
+    (9, 10, 11, 12),  # 中指
+    (13, 14, 15, 16),  # 薬指
+    (17, 18, 19, 20),  # 小指
+)
+HAND_EDGES = tuple((chain[i], chain[i + 1]) for chain in HAND_CHAINS
+                   for i in range(len(chain) - 1))
+_CHAIN_INDICES = [np.array(chain) for chain in HAND_CHAINS]
+
+# キーポイントの半径 (指先は大きく)
+JOINT_RADII = np.array(
+    [5, 5, 5, 5, 8, 5, 5, 5, 8, 5, 5, 5, 8, 5, 5, 5, 8, 5, 5, 5, 8])
+
+# 4チャンネル目は重ね合わせ用レイヤーのアルファ (BGR 画像では無視される)
+OUTLINE_COLOR = (0, 0, 0, 255)
+FILL_COLOR = (255, 255, 255, 255)
+OUTLINE_THICKNESS = 6
+LINE_THICKNESS = 2
+
+# 描画がはみ出し得る範囲 (外接矩形の余白)
+_MARGIN = int(JOINT_RADII.max()) + OUTLINE_THICKNESS
+
+
+def draw_hand_landmarks(image, landmark_points):
+    """
+    Draw the skeleton of any number of hands: two cv.polylines calls for
+    all bones (black outline, then white) and one loop over the joints.
+    :param image: BGR (or BGRA) image, drawn in place
+    :param landmark_points: (N, 21, 2) or (21, 2) pixel coordinates
+    :return: image
+    """
+    points = np.asarray(landmark_points, dtype=np.int32).reshape(-1, 21, 2)
+    if len(points) == 0:
+        return image
+
+    chains = [hand[chain] for hand in points for chain in _CHAIN_INDICES]
+    cv.polylines(image, chains, False, OUTLINE_COLOR, OUTLINE_THICKNESS)
+    cv.polylines(image, chains, False, FILL_COLOR, LINE_THICKNESS)
+
+    for (x, y), radius in zip(points.reshape(-1, 2).tolist(),
+                              np.tile(JOINT_RADII, len(points)).tolist()):
+        cv.circle(image, (x, y), radius, FILL_COLOR, -1)
+        cv.circle(image, (x, y), radius, OUTLINE_COLOR, 1)
+    return image
+
+
+class LandmarkRenderer(object):
+    """
+    Hand skeleton renderer.
+
+    With cache=True the skeleton is drawn onto a transparent BGRA layer
+    that is kept between frames and only redrawn when the landmarks
+    change (e.g. when AdaptiveScheduler reuses the previous result);
+    each frame then only composites the hands' bounding box.
+
+    :param cache: Use the cached overlay layer
+    """
+
+    def __init__(self, cache=False):
+        self.cache = cache
+        self._overlay = None
+        self._last_points = None
+        self._roi = None
+        self._layer = None
+        self._mask = None
+        self.redrawn = 0
+        self.reused = 0
+
+    def reset(self):
+        self._overlay = None
+        self._last_points = None
+        self._roi = None
+
+    def draw(self, image, landmark_points):
+        """
+        :param image: BGR image, drawn in place
+        :param landmark_points: (N, 21, 2) or (21, 2) pixel coordinates
+        :return: image
+        """
+        if not self.cache:
+            return draw_hand_landmarks(image, landmark_points)
+
+        points = np.asarray(landmark_points, dtype=np.int32).reshape(-1, 21, 2)
+        height, width = image.shape[:2]
+        if self._overlay is None or self._overlay.shape[:2] != (height,
+                                                                 width):
+            self._overlay = np.zeros((height, width, 4), dtype=np.uint8)
+            self._last_points = None
+            self._roi = None
+
+        if self._last_points is None or not np.array_equal(
+                points, self._last_points):
+            self._redraw(points, width, height)
+            self.redrawn += 1
+        else:
+            self.reused += 1
+
+        if self._roi is not None:
+            x1, y1, x2, y2 = self._roi
+            cv.copyTo(self._layer, self._mask, image[y1:y2, x1:x2])
+        return image
+
+    def _redraw(self, points, width, height):
+        # 前回描画した範囲だけを透明に戻す
+        if self._roi is not None:
+            x1, y1, x2, y2 = self._roi
+            self._overlay[y1:y2, x1:x2] = 0
+        self._last_points = points.copy()
+        if len(points) == 0:
+            self._roi = None
+            return
+
+        top_left = np.maximum(
+            points.reshape(-1, 2).min(axis=0) - _MARGIN, 0)
+        bottom_right = np.minimum(
+            points.reshape(-1, 2).max(axis=0) + _MARGIN + 1, (width, height))
+        if np.any(bottom_right <= top_left):
+            self._roi = None
+            return
+        self._roi = tuple(top_left.tolist()) + tuple(bottom_right.tolist())
+        draw_hand_landmarks(self._overlay, points)
+
+        # 合成用に外接矩形内の色とアルファを連続した配列で保持する
+        x1, y1, x2, y2 = self._roi
+        layer = self._overlay[y1:y2, x1:x2]
+        self._layer = cv.cvtColor(layer, cv.COLOR_BGRA2BGR)
+        self._mask = cv.extractChannel(layer, 3)
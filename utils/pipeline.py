@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import queue
+import threading
+import time
+
+from utils.profiler import StageProfiler
+
+
+class DropOldestQueue(queue.Queue):
+    """
+    Bounded queue whose put() never blocks: when full, the oldest item is
+    discarded so consumers always see the most recent frames.
+    """
+
+    def __init__(self, maxsize=1):
+        super().__init__(maxsize=maxsize)
+        self.dropped = 0
+
+    def put(self, item, block=True, timeout=None):
+        with self.not_full:
+            if 0 < self.maxsize <= self._qsize():
+                self._get()
+                self.unfinished_tasks -= 1
+                self.dropped += 1
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+
+_END = object()
+
+
+class FramePipeline(object):
+    """
+    Staged capture -> inference -> render pipeline.
+
+    A capture thread calls ``read`` (e.g. ``cap.read``) and an inference
+    worker calls ``process`` on every captured frame. The stages are
+    connected by bounded queues, so the end-to-end rate is bounded by the
+    slowest stage instead of the sum of all stages. Rendering/display is
+    left to the caller, which pulls ``(frame, result)`` pairs with get();
+    OpenCV GUI calls must stay on the main thread.
+
+    :param read: Callable returning ``(ret, frame)``
+    :param process: Callable ``frame -> result`` run on the inference worker
+    :param queue_size: Capacity of each inter-stage queue
+    :param drop_frames: Drop the oldest queued frame when a stage falls
+        behind (live cameras). When False, stages block instead (files).
+    :param profiler: StageProfiler receiving 'capture' and 'inference'
+        timings (a new one is created when None)
+    """
+
+    def __init__(self, read, process, queue_size=1, drop_frames=True,
+                 profiler=None):
+        self._read = read
+        self._process = process
+        self._drop_frames = drop_frames
+        if drop_frames:
+            self._frame_queue = DropOldestQueue(maxsize=queue_size)
+            self._result_queue = DropOldestQueue(maxsize=queue_size)
+        else:
+            self._frame_queue = queue.Queue(maxsize=queue_size)
+            self._result_queue = queue.Queue(maxsize=queue_size)
+
+        self.profiler = profiler if profiler is not None else StageProfiler()
+
+        self._stop_event = threading.Event()
+        self._threads = []
+        self._error = None
+        self._finished = False
+
+    def start(self):
+        self._stop_event.clear()
+        self._threads = [
+            threading.Thread(target=self._capture_loop, daemon=True),
+            threading.Thread(target=self._inference_loop, daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    @property
+    def running(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    @property
+    def dropped(self):
+        return (getattr(self._frame_queue, 'dropped', 0) +
+                getattr(self._result_queue, 'dropped', 0))
+
+    def get(self, timeout=None):
+        """
+        Return the next ``(frame, result)`` pair.
+        :return: None once the source is exhausted or the pipeline stopped
+        """
+        if self._finished:
+            return None
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            wait = 0.1
+            if deadline is not None:
+                wait = min(wait, deadline - time.perf_counter())
+                if wait <= 0:
+                    raise queue.Empty
+            try:
+                item = self._result_queue.get(timeout=wait)
+                break
+            except queue.Empty:
+                if self._stop_event.is_set() and not self.running:
+                    self._finished = True
+                    return None
+
+        if item is _END:
+            self._finished = True
+            if self._error is not None:
+                raise self._error
+            return None
+        return item
+
+    def poll(self):
+        """
+        Non-blocking get() for UI event loops.
+        :return: The next ``(frame, result)`` pair, or None when nothing new
+            has arrived (check ``running`` to tell a finished pipeline apart)
+        """
+        if self._finished:
+            return None
+        try:
+            item = self._result_queue.get_nowait()
+        except queue.Empty:
+            return None
+
+        if item is _END:
+            self._finished = True
+            if self._error is not None:
+                raise self._error
+            return None
+        return item
+
+    def __iter__(self):
+        while True:
+            item = self.get()
+            if item is None:
+                return
+            yield item
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _put(self, target_queue, item):
+        if self._drop_frames:
+            target_queue.put(item)
+            return True
+        while not self._stop_event.is_set():
+            try:
+                target_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _capture_loop(self):
+        try:
+            while not self._stop_event.is_set():
+                start_time = time.perf_counter()
+                ret, frame = self._read()
+                if not ret:
+                    break
+                self.profiler.record(
+                    'capture', (time.perf_counter() - start_time) * 1000.0)
+                if not self._put(self._frame_queue, frame):
+                    break
+        except Exception as e:
+            self._error = e
+        finally:
+            self._put_end(self._frame_queue)
+
+    def _inference_loop(self):
+        try:
+            while True:
+                try:
+                    frame = self._frame_queue.get(timeout=0.1)
+                except queue.Empty:
+                    if self._stop_event.is_set():
+                        break
+                    continue
+                if frame is _END:
+                    break
+
+                with self.profiler.stage('inference'):
+                    result = self._process(frame)
+                if not self._put(self._result_queue, (frame, result)):
+                    break
+        except Exception as e:
+            self._error = e
+        finally:
+            self._put_end(self._result_queue)
+
+    def _put_end(self, target_queue):
+        # 終端マーカーは取りこぼさないよう、満杯でも必ず投入する
+        if isinstance(target_queue, DropOldestQueue):
+            target_queue.put(_END)
+            return
+        while True:
+            try:
+                target_queue.put(_END, timeout=0.1)
+                return
+            except queue.Full:
+                if self._stop_event.is_set():
+                    try:
+                        target_queue.get_nowait()
+                    except queue.Empty:
+                        pass
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import numpy as np
+
+
+def pre_process_point_history_points(points, image_width, image_height,
+                                     out=None):
+    """
+    Oldest-point-relative, image-size normalized coordinates, identical to
+    pre_process_point_history() so existing point_history.csv stays valid.
+    :param points: (L, 2) pixel coordinates, oldest first
+    :param out: Optional preallocated (L, 2) float64 array
+    :return: (L * 2, ) float64 array (a view of ``out`` when given)
+    """
+    points = np.asarray(points)
+    if out is None:
+        out = np.empty(points.shape, dtype=np.float64)
+    if len(points) > 0:
+        # 相対座標に変換
+        np.subtract(points, points[0], out=out)
+        np.divide(out, (image_width, image_height), out=out)
+    return out.reshape(-1)
+
+
+class PointHistoryBuffer(object):
+    """
+    Fixed-size ring buffer of fingertip coordinates for one hand.
+
+    Each point is written twice (at ``i`` and ``i + maxlen``) so that the
+    history, oldest first, is always available as a contiguous view
+    without copying. append() is O(1).
+    """
+
+    def __init__(self, maxlen=16):
+        self.maxlen = maxlen
+        self._buffer = np.zeros((maxlen * 2, 2), dtype=np.int64)
+        self._features = np.empty((maxlen, 2), dtype=np.float64)
+        self._next = 0
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        return iter(self.points().tolist())
+
+    @property
+    def is_full(self):
+        return self._length == self.maxlen
+
+    def append(self, point):
+        self._buffer[self._next] = point
+        self._buffer[self._next + self.maxlen] = point
+        self._next = (self._next + 1) % self.maxlen
+        if self._length < self.maxlen:
+            self._length += 1
+
+    def clear(self):
+        self._next = 0
+        self._length = 0
+
+    def points(self):
+        """
+        :return: (len, 2) view of the history, oldest first
+        """
+        start = (self._next - self._length) % self.maxlen
+        return self._buffer[start:start + self._length]
+
+    def pre_process(self, image_width, image_height):
+        """
+        Normalized feature window for PointHistoryClassifier.
+        The returned array is a view of a buffer reused on every call;
+        copy it if it must outlive the next call.
+        :return: (len * 2, ) float64 array
+        """
+        return pre_process_point_history_points(
+            self.points(), image_width, image_height,
+            out=self._features[:self._length])
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import cv2 as cv
+import numpy as np
+from PIL import Image
+from PIL import ImageTk
+
+
+class PreviewRenderer(object):
+    """
+    Shows OpenCV frames in a Tk widget without allocating per frame.
+
+    One RGBA buffer, one PIL image sharing that buffer's memory and one
+    PhotoImage are created up front; every frame is converted into the
+    buffer in place and pasted into the same PhotoImage. Frames of a
+    different size are resized with nearest-neighbour interpolation (the
+    preview is small, so quality does not matter). Nothing is done while
+    the widget is not viewable.
+
+    Tk calls must come from the Tk thread.
+
+    :param widget: Label (or any widget with an ``image`` option)
+    :param width: Preview width in pixels
+    :param height: Preview height in pixels
+    """
+
+    def __init__(self, widget, width, height):
+        self.widget = widget
+        self.size = (width, height)
+        self._resized = np.empty((height, width, 3), dtype=np.uint8)
+        self._rgba = np.empty((height, width, 4), dtype=np.uint8)
+        # バッファとメモリを共有する PIL 画像 (コピー無しで PhotoImage へ渡す)
+        self._image = Image.frombuffer('RGBA', self.size, self._rgba, 'raw',
+                                       'RGBA', 0, 1)
+        self._photo = None
+        self.rendered = 0
+        self.skipped = 0
+
+    def render(self, image):
+        """
+        :param image: BGR image (any size)
+        :return: False when skipped because the widget is hidden
+        """
+        if not self.widget.winfo_viewable():
+            self.skipped += 1
+            return False
+
+        if image.shape[1::-1] != self.size:
+            image = cv.resize(image,
+                              self.size,
+                              dst=self._resized,
+                              interpolation=cv.INTER_NEAREST)
+        cv.cvtColor(image, cv.COLOR_BGR2RGBA, dst=self._rgba)
+
+        if self._photo is None:
+            self._photo = ImageTk.PhotoImage(image=self._image)
+        else:
+            self._photo.paste(self._image)
+        # 他の処理で画像が外された場合は付け直す
+        if str(self.widget.cget('image')) != str(self._photo):
+            self.widget.configure(image=self._photo)
+        self.rendered += 1
+        return True
+
+    def clear(self):
+        """
+        Detach the image from the widget (the buffers are kept for reuse).
+        """
+        self.widget.configure(image='')
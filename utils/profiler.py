@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import csv
+import json
+import math
+import time
+from collections import deque
+
+import numpy as np
+
+
+class LatencyHistogram(object):
+    """
+    Log-spaced latency histogram (``bins_per_decade`` bins per decade from
+    ``min_ms`` to ``max_ms``). record() is O(1) and takes no lock: each
+    histogram is meant to be written by a single thread, readers only
+    see slightly stale counts.
+    """
+
+    def __init__(self, min_ms=0.001, max_ms=100000.0, bins_per_decade=20):
+        self._log_min = math.log10(min_ms)
+        self._bins_per_decade = bins_per_decade
+        num_bins = int(
+            math.ceil((math.log10(max_ms) - self._log_min) * bins_per_decade))
+        # 両端はアンダーフロー・オーバーフロー用
+        self._counts = np.zeros(num_bins + 2, dtype=np.int64)
+        self._edges = 10.0**(self._log_min +
+                             np.arange(num_bins + 1) / bins_per_decade)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_ms = 0.0
+
+    def record(self, elapsed_ms):
+        if elapsed_ms > 0.0:
+            index = int((math.log10(elapsed_ms) - self._log_min) *
+                        self._bins_per_decade) + 1
+            index = min(max(index, 0), len(self._counts) - 1)
+        else:
+            index = 0
+        self._counts[index] += 1
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.last_ms = elapsed_ms
+        if elapsed_ms > self.max_ms:
+            self.max_ms = elapsed_ms
+
+    @property
+    def mean_ms(self):
+        return self.total_ms / self.count if self.count > 0 else 0.0
+
+    def percentile(self, q):
+        """
+        :param q: Percentile in [0, 100]
+        :return: Geometric center of the bin holding the q-th percentile
+        """
+        counts = self._counts.copy()
+        total = counts.sum()
+        if total == 0:
+            return 0.0
+        index = int(np.searchsorted(np.cumsum(counts), total * q / 100.0))
+        if index == 0:
+            return float(self._edges[0])
+        if index >= len(counts) - 1:
+            return float(self.max_ms)
+        center = math.sqrt(self._edges[index - 1] * self._edges[index])
+        return float(min(center, self.max_ms))
+
+
+class _StageTimer(object):
+    __slots__ = ('_histogram', '_start')
+
+    def __init__(self, histogram):
+        self._histogram = histogram
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._histogram.record((time.perf_counter() - self._start) * 1000.0)
+
+
+class StageProfiler(object):
+    """
+    Per-stage latency histograms with p50/p95/p99 (capture, hands.process,
+    classify, draw, ...), plus a rolling FPS counter.
+
+        with profiler.stage('hands'):
+            results = hands.process(image)
+
+    Every stage must be recorded from a single thread; different stages
+    may be recorded from different threads.
+    """
+
+    def __init__(self, fps_buffer_len=10):
+        self._histograms = {}
+        self._timers = {}
+        self._frame_times = deque(maxlen=fps_buffer_len)
+        self._frame_total = 0.0
+        self._last_tick = None
+
+    def histogram(self, name):
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            histogram = self._histograms.setdefault(name, LatencyHistogram())
+        return histogram
+
+    def record(self, name, elapsed_ms):
+        self.histogram(name).record(elapsed_ms)
+
+    def stage(self, name):
+        timer = self._timers.get(name)
+        if timer is None:
+            timer = self._timers.setdefault(name,
+                                            _StageTimer(self.histogram(name)))
+        return timer
+
+    def tick(self):
+        """
+        Mark the end of a frame.
+        :return: Rolling FPS over the last fps_buffer_len frames
+        """
+        now = time.perf_counter()
+        if self._last_tick is not None:
+            frame_ms = (now - self._last_tick) * 1000.0
+            # 合計は差分更新し、毎回 sum() しない
+            if len(self._frame_times) == self._frame_times.maxlen:
+                self._frame_total -= self._frame_times[0]
+            self._frame_times.append(frame_ms)
+            self._frame_total += frame_ms
+            self.record('frame', frame_ms)
+        self._last_tick = now
+        return self.fps
+
+    @property
+    def fps(self):
+        if self._frame_total <= 0.0:
+            return 0.0
+        return round(1000.0 / (self._frame_total / len(self._frame_times)), 2)
+
+    def summary(self):
+        """
+        :return: {stage: {count, mean_ms, p50_ms, p95_ms, p99_ms, max_ms}}
+        """
+        return {
+            name: {
+                'count': histogram.count,
+                'mean_ms': round(histogram.mean_ms, 3),
+                'p50_ms': round(histogram.percentile(50), 3),
+                'p95_ms': round(histogram.percentile(95), 3),
+                'p99_ms': round(histogram.percentile(99), 3),
+                'max_ms': round(histogram.max_ms, 3),
+            }
+            for name, histogram in list(self._histograms.items())
+        }
+
+    def dump(self, path):
+        """
+        Write summary() as JSON or CSV (chosen by the file extension).
+        """
+        summary = self.summary()
+        if path.lower().endswith('.csv'):
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow([
+                    'stage', 'count', 'mean_ms', 'p50_ms', 'p95_ms',
+                    'p99_ms', 'max_ms'
+                ])
+                for name, values in summary.items():
+                    writer.writerow([name, *values.values()])
+        else:
+            with open(path, 'w') as f:
+                json.dump(summary, f, indent=2)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import csv
+import json
+
+RESULT_FORMATS = ('jsonl', 'csv', 'parquet')
+
+
+class JsonlResultWriter(object):
+    def __init__(self, path, fieldnames):
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def write_rows(self, rows):
+        self._file.writelines(
+            json.dumps(row, ensure_ascii=False) + '\n' for row in rows)
+
+    def close(self):
+        self._file.close()
+
+
+class CsvResultWriter(object):
+    def __init__(self, path, fieldnames):
+        self._file = open(path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._file, fieldnames=fieldnames)
+        self._writer.writeheader()
+
+    def write_rows(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetResultWriter(object):
+    """Buffers rows and writes them as Parquet row groups (needs pyarrow)."""
+
+    def __init__(self, path, fieldnames, row_group_size=65536):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError(
+                'Parquet output requires pyarrow (pip install pyarrow)')
+        self._pa = pa
+        self._path = path
+        self._pq = pq
+        self._fieldnames = fieldnames
+        self._row_group_size = row_group_size
+        self._rows = []
+        self._writer = None
+
+    def write_rows(self, rows):
+        self._rows.extend(rows)
+        if len(self._rows) >= self._row_group_size:
+            self._flush()
+
+    def close(self):
+        self._flush()
+        if self._writer is not None:
+            self._writer.close()
+
+    def _flush(self):
+        if not self._rows:
+            return
+        table = self._pa.Table.from_pylist(self._rows)
+        table = table.select(self._fieldnames)
+        if self._writer is None:
+            self._writer = self._pq.ParquetWriter(self._path, table.schema)
+        self._writer.write_table(table)
+        self._rows = []
+
+
+def open_result_writer(path, fieldnames, result_format=None):
+    """
+    :param result_format: 'jsonl', 'csv' or 'parquet' (None: from extension)
+    """
+    if result_format is None:
+        result_format = os.path.splitext(path)[1].lstrip('.').lower()
+        if result_format == 'json':
+            result_format = 'jsonl'
+    if result_format == 'jsonl':
+        return JsonlResultWriter(path, fieldnames)
+    if result_format == 'csv':
+        return CsvResultWriter(path, fieldnames)
+    if result_format == 'parquet':
+        return ParquetResultWriter(path, fieldnames)
+    raise ValueError('unknown result format: {}'.format(result_format))
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import time
+
+import cv2 as cv
+
+
+class AdaptiveScheduler(object):
+    """
+    Decides per frame whether hand detection has to run again or whether
+    the previous result can be reused.
+
+    Detection runs when there is no previous result, when
+    ``max_interval`` frames have passed since the last detection, or when
+    the mean absolute difference between a small grayscale thumbnail of
+    the frame and the thumbnail of the last detected frame exceeds
+    ``motion_threshold``.
+
+    :param max_interval: Upper bound on frames between two detections
+    :param motion_threshold: Mean abs. pixel difference (0-255) that counts
+        as motion
+    :param motion_size: Thumbnail size used for the frame difference
+    :param target_fps: Upper bound on detections per second (None: no cap)
+    :param cpu_budget: Fraction of wall time (0-1] detection may use for
+        motion-triggered runs (None: unlimited)
+    """
+
+    def __init__(self,
+                 max_interval=5,
+                 motion_threshold=6.0,
+                 motion_size=(64, 48),
+                 target_fps=None,
+                 cpu_budget=None):
+        self.max_interval = max_interval
+        self.motion_threshold = motion_threshold
+        self.motion_size = motion_size
+        self.target_fps = target_fps
+        self.cpu_budget = cpu_budget
+
+        self._reference = None
+        self._frames_since_detect = 0
+        self._last_detect_time = None
+        self._budget = 0.0
+        self._budget_time = time.perf_counter()
+
+        self.frame_count = 0
+        self.detect_count = 0
+        self.detect_time_ms = 0.0
+
+    def reset(self):
+        self._reference = None
+        self._frames_since_detect = 0
+        self._last_detect_time = None
+
+    @property
+    def detect_ratio(self):
+        if self.frame_count == 0:
+            return 0.0
+        return self.detect_count / self.frame_count
+
+    def should_detect(self, image):
+        """
+        :param image: OpenCV BGR (or grayscale) image
+        :return: True if detection must run on this frame
+        """
+        self.frame_count += 1
+        now = time.perf_counter()
+        self._refill_budget(now)
+
+        thumbnail = self._thumbnail(image)
+
+        detect = False
+        if self._reference is None:
+            detect = True
+        elif self._frames_since_detect + 1 >= self.max_interval:
+            detect = True
+        elif self._motion(thumbnail) > self.motion_threshold:
+            detect = self._budget_allows(now)
+
+        if detect:
+            self._reference = thumbnail
+            self._frames_since_detect = 0
+            self._last_detect_time = now
+            self.detect_count += 1
+        else:
+            self._frames_since_detect += 1
+        return detect
+
+    def record(self, elapsed):
+        """
+        Charge the time (seconds) the last detection took to the budget.
+        """
+        self.detect_time_ms = elapsed * 1000.0
+        if self.cpu_budget is not None:
+            self._budget -= elapsed
+
+    def _thumbnail(self, image):
+        thumbnail = cv.resize(image, self.motion_size,
+                              interpolation=cv.INTER_AREA)
+        if thumbnail.ndim == 3:
+            thumbnail = cv.cvtColor(thumbnail, cv.COLOR_BGR2GRAY)
+        return thumbnail
+
+    def _motion(self, thumbnail):
+        return cv.mean(cv.absdiff(thumbnail, self._reference))[0]
+
+    def _budget_allows(self, now):
+        if self.target_fps is not None and self._last_detect_time is not None:
+            if now - self._last_detect_time < 1.0 / self.target_fps:
+                return False
+        if self.cpu_budget is not None and self._budget <= 0.0:
+            return False
+        return True
+
+    def _refill_budget(self, now):
+        if self.cpu_budget is None:
+            return
+        # 最大1秒分までCPU時間を貯められるトークンバケット
+        self._budget = min(
+            self._budget + (now - self._budget_time) * self.cpu_budget,
+            self.cpu_budget)
+        self._budget_time = now
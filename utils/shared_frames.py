@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import time
+import queue
+import traceback
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class SharedFrameRing(object):
+    """
+    Ring of preallocated frame slots in one shared memory block.
+
+    Only slot indices travel through the (small) queues: the producer
+    acquires a free slot, writes the frame into it once and publishes the
+    index; a consumer in another process reads the slot as a zero-copy
+    view and releases it afterwards. Instances can be passed to child
+    processes as Process arguments; processes started earlier (e.g. pool
+    workers) can map the slots with attach(descriptor()) and receive slot
+    indices through their own queues.
+
+    :param num_slots: Number of frame slots
+    :param frame_shape: Shape of every frame, e.g. (540, 960, 3)
+    :param context: multiprocessing context used for the queues
+    """
+
+    def __init__(self, num_slots, frame_shape, dtype=np.uint8, context=None):
+        if context is None:
+            context = multiprocessing.get_context('spawn')
+        self.num_slots = num_slots
+        self.frame_shape = tuple(frame_shape)
+        self.dtype = np.dtype(dtype)
+
+        frame_size = int(np.prod(self.frame_shape)) * self.dtype.itemsize
+        self._shm = shared_memory.SharedMemory(create=True,
+                                               size=frame_size * num_slots)
+        self._owner = True
+        self._free_queue = context.Queue()
+        self._ready_queue = context.Queue()
+        for slot in range(num_slots):
+            self._free_queue.put(slot)
+        self._frames = self._map_frames()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_frames']
+        state['_owner'] = False
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._frames = self._map_frames()
+
+    @classmethod
+    def attach(cls, descriptor):
+        """
+        Map the slots of an existing ring by name, without its slot queues
+        (acquire/publish/get are unavailable; use frame() by index).
+        :param descriptor: SharedFrameRing.descriptor() of the ring
+        """
+        name, num_slots, frame_shape, dtype = descriptor
+        ring = cls.__new__(cls)
+        ring.num_slots = num_slots
+        ring.frame_shape = tuple(frame_shape)
+        ring.dtype = np.dtype(dtype)
+        ring._shm = shared_memory.SharedMemory(name=name)
+        ring._owner = False
+        ring._free_queue = None
+        ring._ready_queue = None
+        ring._frames = ring._map_frames()
+        return ring
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def descriptor(self):
+        """
+        :return: Picklable (name, num_slots, frame_shape, dtype) for attach()
+        """
+        return self.name, self.num_slots, self.frame_shape, self.dtype.str
+
+    def _map_frames(self):
+        return np.ndarray((self.num_slots, ) + self.frame_shape,
+                          dtype=self.dtype,
+                          buffer=self._shm.buf)
+
+    # 書き込み側 ###############################################################
+    def acquire(self, timeout=None):
+        """
+        :param timeout: 0 returns immediately, None waits for a free slot
+        :return: Free slot index, or None when no slot became free
+        """
+        try:
+            if timeout == 0:
+                return self._free_queue.get_nowait()
+            return self._free_queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def frame(self, slot):
+        """
+        :return: Writable zero-copy view of a slot
+        """
+        return self._frames[slot]
+
+    def publish(self, slot, meta=None):
+        self._ready_queue.put((slot, meta))
+
+    def write(self, frame, meta=None, timeout=0):
+        """
+        Copy a frame into a free slot and publish it.
+        :return: False if no slot was free (the frame is dropped)
+        """
+        slot = self.acquire(timeout)
+        if slot is None:
+            return False
+        np.copyto(self._frames[slot], frame)
+        self.publish(slot, meta)
+        return True
+
+    def capture(self, cap, meta=None, timeout=0):
+        """
+        Let cap.read() decode straight into a free slot.
+        :return: (ret, published) - published is False when no slot was
+            free and the frame was read but dropped
+        """
+        slot = self.acquire(timeout)
+        if slot is None:
+            ret, _ = cap.read()
+            return ret, False
+
+        view = self._frames[slot]
+        ret, frame = cap.read(view)
+        if not ret:
+            self.release(slot)
+            return False, False
+        if frame is not None and frame.ctypes.data != view.ctypes.data:
+            # サイズが異なる場合はOpenCVが新しい配列を返すのでコピーする
+            np.copyto(view, frame)
+        self.publish(slot, meta)
+        return True, True
+
+    # 読み込み側 ###############################################################
+    def get(self, timeout=None):
+        """
+        :return: (slot, meta) of the next published frame
+        :raises queue.Empty: when nothing was published within timeout
+        """
+        return self._ready_queue.get(timeout=timeout)
+
+    def release(self, slot):
+        self._free_queue.put(slot)
+
+    def close(self):
+        self._frames = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+def _recognizer_main(ring, result_queue, stop_event, factory, factory_args,
+                     method, flip):
+    if factory is None:
+        from app import GestureRecognizer
+        factory = GestureRecognizer
+    recognizer = factory(*factory_args)
+    process = getattr(recognizer, method)
+
+    while not stop_event.is_set():
+        try:
+            slot, meta = ring.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        try:
+            result = process(ring.frame(slot), flip=flip)
+        except Exception:
+            result_queue.put((meta, None, traceback.format_exc()))
+            continue
+        finally:
+            ring.release(slot)
+        result_queue.put((meta, result, None))
+    ring.close()
+
+
+class RecognizerProcess(object):
+    """
+    Runs a GestureRecognizer in a child process, fed through a
+    SharedFrameRing, so that the caller (e.g. the Tk UI) never blocks on
+    MediaPipe. When every slot is in use, new frames are dropped.
+
+    :param frame_shape: Shape of the frames that will be submitted
+    :param factory: Picklable callable creating the recognizer in the child
+        (default: app.GestureRecognizer)
+    :param method: Recognizer method called per frame
+    """
+
+    def __init__(self,
+                 frame_shape,
+                 factory=None,
+                 factory_args=(),
+                 method='get_gesture',
+                 flip=True,
+                 num_slots=2):
+        context = multiprocessing.get_context('spawn')
+        self.ring = SharedFrameRing(num_slots, frame_shape, context=context)
+        self._result_queue = context.Queue()
+        self._stop_event = context.Event()
+        self._sequence = 0
+        self._process = context.Process(
+            target=_recognizer_main,
+            args=(self.ring, self._result_queue, self._stop_event, factory,
+                  factory_args, method, flip),
+            daemon=True,
+        )
+        self._process.start()
+
+    @property
+    def alive(self):
+        return self._process.is_alive()
+
+    def submit(self, frame):
+        """
+        :return: Sequence number of the frame, or None if it was dropped
+        """
+        meta = (self._sequence, time.time())
+        if not self.ring.write(frame, meta):
+            return None
+        self._sequence += 1
+        return meta[0]
+
+    def submit_from(self, cap):
+        """
+        Read the next frame from cap directly into shared memory.
+        :return: (ret, sequence number or None if dropped)
+        """
+        meta = (self._sequence, time.time())
+        ret, published = self.ring.capture(cap, meta)
+        if not published:
+            return ret, None
+        self._sequence += 1
+        return ret, meta[0]
+
+    def get_result(self, timeout=None):
+        """
+        :return: ((sequence, submit_time), result)
+        :raises queue.Empty: when no result arrived within timeout
+        :raises RuntimeError: when recognition failed in the child
+        """
+        meta, result, error = self._result_queue.get(timeout=timeout)
+        if error is not None:
+            raise RuntimeError(error)
+        return meta, result
+
+    def close(self):
+        self._stop_event.set()
+        self._process.join(5.0)
+        if self._process.is_alive():
+            self._process.terminate()
+        self.ring.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import time
+from collections import deque
+
+import numpy as np
+
+
+class MajorityVote(object):
+    """
+    Most frequent label over the last ``window`` updates, replacing
+    ``Counter(history).most_common()`` per frame.
+
+    Counts are kept per label together with a count -> labels index, so
+    update() is O(1) and allocates nothing once every label was seen.
+    On a tie the current winner is kept.
+
+    :param window: Number of recent labels voting
+    """
+
+    def __init__(self, window=16):
+        self.window = window
+        self._history = deque(maxlen=window)
+        self._counts = {}
+        self._labels_by_count = {}
+        self._max_count = 0
+        self.value = None
+
+    def __len__(self):
+        return len(self._history)
+
+    def reset(self):
+        self._history.clear()
+        self._counts = {}
+        self._labels_by_count = {}
+        self._max_count = 0
+        self.value = None
+
+    def _move(self, label, delta):
+        count = self._counts.get(label, 0)
+        if count > 0:
+            self._labels_by_count[count].discard(label)
+        count += delta
+        self._counts[label] = count
+        if count > 0:
+            if count not in self._labels_by_count:
+                self._labels_by_count[count] = set()
+            self._labels_by_count[count].add(label)
+        return count
+
+    def update(self, label):
+        """
+        :param label: Label of the current frame
+        :return: Majority label of the window
+        """
+        if len(self._history) == self.window:
+            evicted = self._history[0]
+            self._move(evicted, -1)
+            # 最多票のラベルが1票減った場合のみ最大値が下がり得る
+            if not self._labels_by_count.get(self._max_count):
+                self._max_count -= 1
+        self._history.append(label)
+        count = self._move(label, 1)
+        if count > self._max_count:
+            self._max_count = count
+
+        winners = self._labels_by_count[self._max_count]
+        if self.value not in winners:
+            self.value = label if label in winners else next(iter(winners))
+        return self.value
+
+
+class EmaFilter(object):
+    """
+    Exponential moving average over class probability vectors.
+
+    :param alpha: Weight of the newest vector (1.0: no smoothing)
+    """
+
+    def __init__(self, alpha=0.5):
+        self.alpha = alpha
+        self.value = None
+        self._delta = None
+
+    def reset(self):
+        self.value = None
+
+    def update(self, probabilities):
+        """
+        :param probabilities: (num_classes, ) vector of the current frame
+        :return: Smoothed vector (an internal buffer, overwritten by the
+            next update)
+        """
+        if self.value is None or self.value.shape != np.shape(probabilities):
+            self.value = np.array(probabilities, dtype=np.float64)
+            self._delta = np.empty_like(self.value)
+            return self.value
+        if self.alpha >= 1.0:
+            # 平滑無し: 丸め誤差無しでそのまま返す
+            np.copyto(self.value, probabilities)
+            return self.value
+        # value += alpha * (probabilities - value) をバッファ上で計算
+        np.subtract(probabilities, self.value, out=self._delta)
+        self._delta *= self.alpha
+        self.value += self._delta
+        return self.value
+
+
+class HysteresisFilter(object):
+    """
+    Holds a label until a different one has been observed for
+    ``min_dwell`` consecutive updates and at least ``min_dwell_time``
+    seconds, each time with a confidence of at least ``enter_threshold``.
+    Short flickers between labels therefore never reach the output.
+
+    :param min_dwell: Consecutive updates a new label needs
+    :param min_dwell_time: Seconds a new label needs (0: frames only)
+    :param enter_threshold: Minimum confidence for a new label to count
+    :param initial: Label reported before the first switch
+    """
+
+    def __init__(self,
+                 min_dwell=3,
+                 min_dwell_time=0.0,
+                 enter_threshold=0.0,
+                 initial=-1):
+        self.min_dwell = min_dwell
+        self.min_dwell_time = min_dwell_time
+        self.enter_threshold = enter_threshold
+        self.initial = initial
+        self.reset()
+
+    def reset(self):
+        self.value = self.initial
+        self._candidate = None
+        self._candidate_count = 0
+        self._candidate_since = None
+
+    @property
+    def pending(self):
+        """
+        Label waiting to replace the current one (None if there is none).
+        """
+        return self._candidate
+
+    def update(self, label, confidence=None, timestamp=None):
+        """
+        :param label: Label of the current frame
+        :param confidence: Its confidence (None: always counts)
+        :param timestamp: Seconds (default: time.monotonic())
+        :return: Stable label
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        if label == self.value or (confidence is not None
+                                   and confidence < self.enter_threshold):
+            self._candidate = None
+            return self.value
+
+        if label != self._candidate:
+            self._candidate = label
+            self._candidate_count = 0
+            self._candidate_since = timestamp
+        self._candidate_count += 1
+        return self.current(timestamp)
+
+    def current(self, timestamp=None):
+        """
+        Stable label at ``timestamp``. A pending label that has already
+        been seen often enough is accepted once its dwell time has passed
+        even without a new update, so event streams that only report
+        changes settle as well.
+        """
+        if self._candidate is not None and \
+                self._candidate_count >= self.min_dwell:
+            if timestamp is None:
+                timestamp = time.monotonic()
+            if timestamp - self._candidate_since >= self.min_dwell_time:
+                self.value = self._candidate
+                self._candidate = None
+        return self.value
@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import time
+import queue
+import traceback
+import multiprocessing
+
+from utils.shared_frames import SharedFrameRing
+
+
+def _worker_main(worker_id, factory, factory_args, flip, task_queue,
+                 result_queue):
+    # MediaPipe / TFLite はスレッド・プロセス間で共有できないため、
+    # ワーカープロセスごとに認識器を1つ生成する
+    recognizer = factory(*factory_args)
+    ring = None  # 現在の map_frames 呼び出しのフレームリング
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        kind, task_id, payload = task
+
+        start_time = time.perf_counter()
+        try:
+            if kind == 'frames':
+                descriptor, slot, frame_count = payload
+                if ring is None or ring.name != descriptor[0]:
+                    if ring is not None:
+                        ring.close()
+                        ring = None
+                    ring = SharedFrameRing.attach(descriptor)
+                frames = ring.frame(slot)[:frame_count]
+                # チャンク毎に MediaPipe の追跡状態も含めて初期化する
+                # (直前に処理した別チャンクの結果に依存しないように)
+                recognizer.reset(tracking=True)
+                result = [
+                    recognizer.recognize(frame, flip=flip) for frame in frames
+                ]
+                del frames
+            else:
+                function, args = payload
+                frame_count, result = function(recognizer, *args)
+        except Exception:
+            result_queue.put(
+                ('error', task_id, worker_id, traceback.format_exc()))
+            continue
+
+        elapsed = time.perf_counter() - start_time
+        result_queue.put(
+            ('done', task_id, worker_id, (frame_count, elapsed, result)))
+
+
+class RecognizerPool(object):
+    """
+    Pool of worker processes, each holding its own recognizer.
+
+    Whole files are distributed with map_files(). Frames decoded in this
+    process are distributed in chunks with map_frames(); each chunk is
+    copied once into a slot of a SharedFrameRing that the workers map
+    zero-copy, and only slot indices go through the task queue. Results
+    are yielded in input order.
+
+    :param num_workers: Number of worker processes
+    :param factory: Picklable module-level callable creating a recognizer
+        in each worker, e.g. batch_runner.create_recognizer
+    :param factory_args: Arguments for factory
+    :param flip: Passed to recognizer.recognize() for frame chunks
+    """
+
+    def __init__(self, num_workers, factory, factory_args=(), flip=True):
+        # TensorFlow/MediaPipe are not fork-safe, so always spawn
+        context = multiprocessing.get_context('spawn')
+        self.num_workers = num_workers
+        self._task_queue = context.Queue()
+        self._result_queue = context.Queue()
+        self._processes = [
+            context.Process(
+                target=_worker_main,
+                args=(worker_id, factory, factory_args, flip,
+                      self._task_queue, self._result_queue),
+                daemon=True,
+            ) for worker_id in range(num_workers)
+        ]
+        for process in self._processes:
+            process.start()
+
+        self._next_task_id = 0
+        self._worker_frames = [0] * num_workers
+        self._worker_busy = [0.0] * num_workers
+        self._start_time = time.perf_counter()
+
+    def map_files(self, paths, function, args=()):
+        """
+        Run ``function(recognizer, path, *args) -> (frame_count, result)``
+        on the workers, one task per path.
+        :return: Iterator of results in the order of paths
+        """
+        tasks = (('call', (function, (path, ) + tuple(args)), None)
+                 for path in paths)
+        for result, _ in self._run(tasks):
+            yield result
+
+    def map_frames(self, frames, chunk_size=32, max_in_flight=None):
+        """
+        Recognize a stream of equally sized frames on the workers.
+        Chunks are independent: histories and MediaPipe's tracking state
+        are reset at every chunk, so results do not depend on which worker
+        ran which chunk, and finger gestures are only continuous within a
+        chunk.
+        :param frames: Iterable of BGR images
+        :return: Iterator of recognize() results, one per frame, in order
+        """
+        if max_in_flight is None:
+            max_in_flight = self.num_workers * 2
+        # リングは最初のフレームのサイズで作る (スロット数 = 同時処理数)
+        rings = []
+
+        def release(slot):
+            rings[0].release(slot)
+
+        tasks = self._frame_chunks(frames, chunk_size, max_in_flight, rings)
+        chunks = self._run(tasks, max_in_flight, release)
+        try:
+            for result, slot in chunks:
+                release(slot)
+                yield from result
+        finally:
+            chunks.close()
+            if rings:
+                rings[0].close()
+
+    def stats(self):
+        """
+        :return: Per-worker frames, busy seconds and frames per busy second
+            plus the overall throughput since the pool started
+        """
+        elapsed = time.perf_counter() - self._start_time
+        workers = [{
+            'worker': worker_id,
+            'frames': frames,
+            'busy_s': round(busy, 3),
+            'fps': round(frames / busy, 2) if busy > 0 else 0.0,
+        } for worker_id, (frames, busy) in enumerate(
+            zip(self._worker_frames, self._worker_busy))]
+        total = sum(self._worker_frames)
+        return {
+            'workers': workers,
+            'frames': total,
+            'elapsed_s': round(elapsed, 3),
+            'fps': round(total / elapsed, 2) if elapsed > 0 else 0.0,
+        }
+
+    def close(self):
+        for _ in self._processes:
+            self._task_queue.put(None)
+        for process in self._processes:
+            process.join(5.0)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _frame_chunks(self, frames, chunk_size, num_slots, rings):
+        ring = None
+        slot = None
+        count = 0
+        for frame in frames:
+            if ring is None:
+                ring = SharedFrameRing(num_slots, (chunk_size, ) + frame.shape,
+                                       frame.dtype)
+                rings.append(ring)
+            if slot is None:
+                # _run が使用中のスロットを num_slots 個以内に抑えるので必ず空く
+                slot = ring.acquire()
+                count = 0
+            # デコード済みフレームをスロットへ1回だけコピー
+            ring.frame(slot)[count] = frame
+            count += 1
+            if count == chunk_size:
+                yield 'frames', (ring.descriptor(), slot, count), slot
+                slot = None
+        if slot is not None:
+            yield 'frames', (ring.descriptor(), slot, count), slot
+
+    def _run(self, tasks, max_in_flight=None, release=None):
+        """
+        :param release: Called with the handle of every task whose result
+            is not handed to the caller (error, abandoned call)
+        """
+        if max_in_flight is None:
+            max_in_flight = self.num_workers * 2
+
+        def release_handle(handle):
+            if handle is not None and release is not None:
+                release(handle)
+
+        pending = {}
+        results = {}
+        next_yield = self._next_task_id
+        exhausted = False
+        try:
+            while True:
+                # 投入数 (未取得の結果を含む) を制限して共有メモリの使用量を抑える
+                while not exhausted and len(pending) + len(
+                        results) < max_in_flight:
+                    try:
+                        kind, payload, handle = next(tasks)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    task_id = self._next_task_id
+                    self._next_task_id += 1
+                    pending[task_id] = handle
+                    self._task_queue.put((kind, task_id, payload))
+
+                if not pending and next_yield not in results:
+                    return
+
+                while next_yield in results:
+                    yield results.pop(next_yield)
+                    next_yield += 1
+                if not pending:
+                    continue
+
+                status, task_id, worker_id, payload = self._get_result()
+                if task_id not in pending:
+                    # 途中で破棄された以前の呼び出しの結果 (共有メモリは解放済み)
+                    continue
+                handle = pending.pop(task_id)
+                if status == 'error':
+                    release_handle(handle)
+                    raise RuntimeError(
+                        'worker {} failed:\n{}'.format(worker_id, payload))
+                frame_count, elapsed, result = payload
+                self._worker_frames[worker_id] += frame_count
+                self._worker_busy[worker_id] += elapsed
+                results[task_id] = (result, handle)
+        finally:
+            for handle in pending.values():
+                release_handle(handle)
+            for _, handle in results.values():
+                release_handle(handle)
+
+    def _get_result(self):
+        while True:
+            try:
+                return self._result_queue.get(timeout=1.0)
+            except queue.Empty:
+                if not any(process.is_alive()
+                           for process in self._processes):
+                    raise RuntimeError('all pool workers exited')